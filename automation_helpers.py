@@ -1,20 +1,66 @@
-import pyautogui
+import pyperclip
 import time
 import os
+import sys
 import json
 import logging
-from datetime import datetime
+import importlib
+from collections import namedtuple
 from config import (
     GLOBAL_PAUSE, ENABLE_FAILSAFE, DEFAULT_CONFIDENCE, 
     DEFAULT_WAIT_TIMEOUT, CLICK_HISTORY_DIR, ENABLE_CLICK_HISTORY,
-    CLICK_CAPTURE_PADDING, COORDINATE_MAP_FILE, LOG_FILE, LOG_LEVEL,
-    LOG_DIR, IMAGE_DIR, DEFAULT_GRAYSCALE, ERROR_DIR, DEFAULT_DISAPPEAR_STABILITY
+    CLICK_CAPTURE_PADDING, COORDINATE_MAP_FILE,
+    LOG_DIR, IMAGE_DIR, DEFAULT_GRAYSCALE, ERROR_DIR, DEFAULT_DISAPPEAR_STABILITY,
+    DEFAULT_MATCH_MODE, ENABLE_LOCATION_INDEX, DEFAULT_TYPE_MODE, TYPE_INTERVAL,
+    DEFAULT_TYPE_VERIFY, TYPE_PASTE_SETTLE, WORKER_ID, WORKER_DISPLAY,
+    DISAPPEAR_LOCAL_CHECK, DISAPPEAR_BOX_MARGIN
 )
+from image_matching import (
+    template_cache, preparar_frame, localizar_template, niveis_piramide,
+    localizar_todas_no_frame, ordenar_ocorrencias
+)
+from polling import AdaptivePoller, registrar_acao
+from location_index import location_index
+from screen_capture import capturar_tela, get_backend, CaptureError
+from click_history import click_history_writer
+from pacing import pausar_apos_acao, pausa_pelo_helper, instalar_pausa_pyautogui
+from tracing import rastreado, medir, somar
+from log_pipeline import configurar_logging
+
+class _ImportTardio:
+    """
+    Importa o módulo só no primeiro uso. O pyautogui se liga ao display já na
+    importação (sem X, KeyError 'DISPLAY'); assim as esperas, que capturam
+    pelo screen_capture, rodam sem tela (backend 'fake', benchmark.py) e só
+    as ações (clique, teclado) exigem o display.
+    """
+    def __init__(self, nome: str):
+        object.__setattr__(self, "_nome", nome)
+
+    def __getattr__(self, atributo):
+        return getattr(importlib.import_module(self._nome), atributo)
+
+    def __setattr__(self, atributo, valor):
+        setattr(importlib.import_module(self._nome), atributo, valor)
+
+pyautogui = _ImportTardio("pyautogui")
+
+# Mesmo formato do pyautogui.Point (namedtuple x, y), sem precisar importá-lo
+Point = namedtuple("Point", "x y")
 
 # --- 1. Setup Inicial e "Base de Logging" ---
-def setup_automation():
-    """Configura PyAutoGUI, Logging e cria todas as pastas necessárias."""
+def setup_automation(coordenadas_necessarias: list = None):
+    """
+    Configura PyAutoGUI, Logging e cria todas as pastas necessárias.
+    
+    Também valida o mapa de coordenadas já no início: se 'coordenadas_necessarias'
+    for informada (ex: ['campo_usuario', 'botao_salvar']), um nome ausente ou
+    mal formatado encerra a automação aqui, e não no meio da execução.
+    """
+    # No pacing por estabilidade, a espera após cada ação (dos helpers e das
+    # chamadas diretas ao pyautogui) é feita por pausar_apos_acao()
     pyautogui.PAUSE = GLOBAL_PAUSE
+    instalar_pausa_pyautogui(pyautogui)
     pyautogui.FAILSAFE = ENABLE_FAILSAFE
     
     # Criar diretórios necessários
@@ -26,26 +72,55 @@ def setup_automation():
                 logging.critical(f"Erro fatal ao criar diretório {dir_path}: {e}")
                 exit(1)
     
-    # Configurar logging (para arquivo E console)
-    logging.basicConfig(
-        level=LOG_LEVEL,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(LOG_FILE),
-            logging.StreamHandler()
-        ]
-    )
+    # Configurar logging (para arquivo E console, via fila; ver log_pipeline.py)
+    configurar_logging()
     logging.info("--- Base de Logging Iniciada. Automação Pronta. ---")
+    
+    # Execução paralela: cada worker precisa estar ligado ao SEU display virtual.
+    # O pyautogui abre o display na importação, por isso o DISPLAY já deve vir
+    # definido no ambiente do processo (o parallel_runner.py cuida disso).
+    if WORKER_DISPLAY:
+        if os.environ.get('DISPLAY') != WORKER_DISPLAY:
+            logging.critical(f"Worker {WORKER_ID}: DISPLAY='{os.environ.get('DISPLAY')}', esperado '{WORKER_DISPLAY}'.")
+            exit(1)
+        logging.info(f"Worker {WORKER_ID} rodando no display {WORKER_DISPLAY}.")
+    
+    try:
+        validar_coordenadas(coordenadas_necessarias)
+    except ValueError as e:
+        logging.critical(f"Erro fatal no mapa de coordenadas: {e}")
+        exit(1)
 
 # --- 2. Funções do "Mapa" de Coordenadas ---
-def get_coords(name):
-    """Busca uma coordenada nomeada do 'mapa' (coordinates.json)."""
-    try:
+# Cache em memória do coordinates.json: (mtime do arquivo, dados).
+# Recarregado só quando o arquivo muda (ex: coordinate_finder.py salvou algo novo).
+_mapa_coordenadas = (None, {})
+
+def _carregar_mapa_coordenadas() -> dict:
+    """Retorna o mapa de coordenadas, relendo o JSON apenas se o arquivo mudou (mtime/tamanho)."""
+    global _mapa_coordenadas
+    stat = os.stat(COORDINATE_MAP_FILE)  # Lança FileNotFoundError
+    mtime = (stat.st_mtime_ns, stat.st_size)
+    if _mapa_coordenadas[0] != mtime:
         with open(COORDINATE_MAP_FILE, 'r') as f:
             data = json.load(f)
+        if not isinstance(data, dict):
+            raise json.JSONDecodeError("O mapa deve ser um objeto JSON {nome: [x, y]}", "", 0)
+        _mapa_coordenadas = (mtime, data)
+        logging.debug(f"Mapa de coordenadas (re)carregado: {len(data)} nomes.")
+    return _mapa_coordenadas[1]
+
+def _coordenada_valida(coords) -> bool:
+    return (isinstance(coords, list) and len(coords) == 2 
+            and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in coords))
+
+def get_coords(name):
+    """Busca uma coordenada nomeada do 'mapa' (coordinates.json, em cache na memória)."""
+    try:
+        data = _carregar_mapa_coordenadas()
         coords = data.get(name)
-        if coords and isinstance(coords, list) and len(coords) == 2:
-            logging.debug(f"Coordenada '{name}' encontrada: {tuple(coords)}")
+        if coords and _coordenada_valida(coords):
+            logging.debug("Coordenada '%s' encontrada: %s", name, tuple(coords))
             return tuple(coords)
         else:
             logging.error(f"Coordenada '{name}' NÃO encontrada ou mal formatada no mapa.")
@@ -57,9 +132,47 @@ def get_coords(name):
         logging.error(f"Erro ao decodificar JSON em '{COORDINATE_MAP_FILE}'.")
         return None
 
+def validar_coordenadas(nomes: list = None):
+    """
+    Valida o coordinates.json de uma vez.
+    
+    Cada nome de 'nomes' precisa existir e ser um [x, y] numérico; senão,
+    lança ValueError com todos os problemas. As demais entradas mal
+    formatadas (que esta execução pode nem usar) só geram um aviso no log.
+    Sem 'nomes', nada é obrigatório: o arquivo nem precisa existir.
+    """
+    try:
+        data = _carregar_mapa_coordenadas()
+    except FileNotFoundError:
+        if nomes:
+            raise ValueError(f"Arquivo de mapa '{COORDINATE_MAP_FILE}' não encontrado.")
+        return
+    except json.JSONDecodeError as e:
+        if nomes:
+            raise ValueError(f"Erro ao decodificar JSON em '{COORDINATE_MAP_FILE}': {e}")
+        logging.warning(f"Erro ao decodificar JSON em '{COORDINATE_MAP_FILE}': {e}")
+        return
+    
+    necessarios = set(nomes or [])
+    problemas = [f"'{nome}' não encontrada" if nome not in data else f"'{nome}' mal formatada: {data[nome]}"
+                 for nome in (nomes or []) if not _coordenada_valida(data.get(nome))]
+    if problemas:
+        raise ValueError(f"Problemas em '{COORDINATE_MAP_FILE}': " + "; ".join(problemas))
+    outras = [f"'{nome}': {coords}" for nome, coords in data.items()
+              if nome not in necessarios and not _coordenada_valida(coords)]
+    if outras:
+        logging.warning(f"Coordenadas mal formatadas em '{COORDINATE_MAP_FILE}' (falharão se usadas): " + "; ".join(outras))
+    logging.info(f"Mapa de coordenadas validado: {len(data)} nomes carregados.")
+
 # --- 3. Wrapper de Clique com Histórico ---
-def safe_click(coords, log_message=""):
-    """Realiza um clique seguro e registra no log e no histórico de screenshots."""
+@rastreado(alvo="coords")
+def safe_click(coords, log_message="", region_estabilidade=None):
+    """
+    Realiza um clique seguro e registra no log e no histórico de screenshots.
+    
+    'region_estabilidade' limita a região observada pelo pacing por estabilidade
+    (ver PACING_MODE); None usa PACING_REGION.
+    """
     if isinstance(coords, str):
         log_message = coords 
         coords = get_coords(coords)
@@ -70,15 +183,20 @@ def safe_click(coords, log_message=""):
     x, y = coords
     
     try:
-        pyautogui.moveTo(x, y)
-        pyautogui.click(x, y)
+        with medir("acao_sec"), pausa_pelo_helper():
+            pyautogui.moveTo(x, y)
+            pyautogui.click(x, y)
+        somar("pausa_sec", pyautogui.PAUSE * 2)
+        registrar_acao()
         logging.info(f"Clicado: '{log_message}' em ({x}, {y})")
         if ENABLE_CLICK_HISTORY:
             _capture_click_area(x, y, log_message)
+        pausar_apos_acao(region_estabilidade)
     except Exception as e:
         logging.error(f"Erro ao tentar clicar em '{log_message}' ({x}, {y}): {e}")
         raise
 
+@rastreado(alvo="name_prefix")
 def _capture_click_area(x, y, name_prefix=""):
     """Função interna para capturar screenshot ao redor do clique."""
     try:
@@ -86,21 +204,20 @@ def _capture_click_area(x, y, name_prefix=""):
         top = max(0, y - CLICK_CAPTURE_PADDING)
         width = CLICK_CAPTURE_PADDING * 2
         height = CLICK_CAPTURE_PADDING * 2
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        safe_prefix = "".join(c for c in name_prefix if c.isalnum() or c in (' ', '_')).rstrip()
-        filename = f"{timestamp}_{safe_prefix}_{x}x{y}.png"
-        filepath = os.path.join(CLICK_HISTORY_DIR, filename)
-        pyautogui.screenshot(filepath, region=(left, top, width, height))
-        logging.debug(f"Histórico de clique salvo: {filepath}")
+        # O recorte é feito agora (em memória); encode e escrita ficam com a thread do histórico
+        recorte = capturar_tela((left, top, width, height))
+        click_history_writer.enviar(recorte, name_prefix, x, y)
     except Exception as e:
         logging.warning(f"Falha ao capturar screenshot do clique: {e}")
 
 # --- 4. FUNÇÃO DE ESPERA (Sua Função Integrada) ---
+@rastreado(alvo="image_name")
 def esperar_imagem(image_name: str, 
                    timeout: int = DEFAULT_WAIT_TIMEOUT, 
                    region: tuple = None, 
                    confianca: float = DEFAULT_CONFIDENCE,
-                   grayscale: bool = DEFAULT_GRAYSCALE):
+                   grayscale: bool = DEFAULT_GRAYSCALE,
+                   modo_busca: str = DEFAULT_MATCH_MODE):
     """Aguarda até que uma imagem seja encontrada na tela, lançando TimeoutError se não encontrar."""
     caminho_imagem = os.path.join(IMAGE_DIR, image_name)
     
@@ -108,45 +225,67 @@ def esperar_imagem(image_name: str,
         logging.error(f"Arquivo de imagem não encontrado: {caminho_imagem}")
         raise FileNotFoundError(f"Arquivo de imagem não encontrado: {caminho_imagem}")
     
+    # Decodifica o template uma única vez (cache); cada tentativa só captura a tela e compara
+    template = template_cache.get(caminho_imagem, grayscale=grayscale)
+    template_reduzido = _template_reduzido(caminho_imagem, template, grayscale, modo_busca)
+    
     logging.info(f"Aguardando imagem: '{image_name}' (Timeout: {timeout}s, Confiança: {confianca})")
     
+    poller = AdaptivePoller()
     inicio = time.time()
     while time.time() - inicio < timeout:
         try:
-            # Localiza o CENTRO para ser compatível com o clique
-            localizacao = pyautogui.locateCenterOnScreen(
-                caminho_imagem, 
-                confidence=confianca, 
-                grayscale=grayscale, 
-                region=region
-            )
-            if localizacao:
-                logging.info(f"Imagem '{image_name}' encontrada em {localizacao}")
-                return localizacao # Retorna as coordenadas (Point(x, y))
-        except pyautogui.PyAutoGUIException:
-            logging.debug("PyAutoGUIException temporária (ignorado).")
-            pass 
+            frame, origem = _capturar_frame(region)
+            # Só roda o template matching se a tela mudou desde a última tentativa
+            if poller.mudou(frame):
+                encontrado = _localizar_indexado(
+                    image_name,
+                    preparar_frame(frame, grayscale), 
+                    origem,
+                    template, 
+                    confianca, 
+                    modo_busca,
+                    template_reduzido,
+                    usar_hotspots=region is None
+                )
+                if encontrado:
+                    left, top, width, height, score = encontrado
+                    # Retorna o CENTRO para ser compatível com o clique
+                    localizacao = Point(left + width // 2, top + height // 2)
+                    logging.info(f"Imagem '{image_name}' encontrada em {localizacao}")
+                    if logging.getLogger().isEnabledFor(logging.DEBUG):  # As estatísticas custam: só monta se for logar
+                        logging.debug(f"Score {score:.3f} | Polling: {poller.resumo()} | Cache de templates: {template_cache.stats()} | Hot-spots: {location_index.stats(image_name)}")
+                    return localizacao # Retorna as coordenadas (Point(x, y))
+        except CaptureError:  # Falhas do screenshot (inclusive do pyautogui) chegam como CaptureError
+            logging.debug("Falha temporária na captura (ignorado).")
+            poller.invalidar()
         except Exception as e:
-            if "confidence" in str(e):
-                 logging.warning("Erro de 'confidence'. Tentando sem. Instale 'opencv-python' para melhor performance.")
-                 confianca = 0.99
-            else:
-                 logging.error(f"Erro inesperado no locateOnScreen: {e}")
-        time.sleep(0.5)
+            logging.error(f"Erro inesperado ao localizar '{image_name}': {e}")
+            poller.invalidar()
+        poller.dormir()
     
     time.sleep(1.5)
     logging.error(f"Timeout! Imagem '{image_name}' não foi encontrada em {timeout}s.")
     raise TimeoutError(f"A imagem '{image_name}' não foi encontrada em {timeout}s.")
 
+@rastreado(alvo="image_name")
 def esperar_imagem_desaparecer(image_name: str, 
                                timeout: int = DEFAULT_WAIT_TIMEOUT, 
                                region: tuple = None, 
                                confianca: float = DEFAULT_CONFIDENCE,
                                grayscale: bool = DEFAULT_GRAYSCALE,
-                               stability_check_sec: float = DEFAULT_DISAPPEAR_STABILITY):
+                               stability_check_sec: float = DEFAULT_DISAPPEAR_STABILITY,
+                               modo_busca: str = DEFAULT_MATCH_MODE,
+                               verificacao_local: bool = DISAPPEAR_LOCAL_CHECK):
     """
     Aguarda até que uma imagem NÃO seja mais encontrada na tela por um período
     estável, lançando TimeoutError se ela persistir.
+    
+    Com 'verificacao_local' (padrão: DISAPPEAR_LOCAL_CHECK), depois que a
+    imagem é achada uma vez, cada tentativa captura só o retângulo onde ela
+    estava (+ DISAPPEAR_BOX_MARGIN px) e compara o template ali. A busca
+    ampla (tela/region) só roda quando ela some desse retângulo (pode ter
+    mudado de lugar) e mais uma vez antes de confirmar o desaparecimento.
     """
     caminho_imagem = os.path.join(IMAGE_DIR, image_name)
     
@@ -154,40 +293,88 @@ def esperar_imagem_desaparecer(image_name: str,
         logging.warning(f"Arquivo de imagem não encontrado: {caminho_imagem}. Considerando 'desaparecida'.")
         return True 
 
+    template = template_cache.get(caminho_imagem, grayscale=grayscale)
+    template_reduzido = _template_reduzido(caminho_imagem, template, grayscale, modo_busca)
+
     logging.info(f"Aguardando imagem DESAPARECER: '{image_name}' (Timeout: {timeout}s)")
     
+    buscas_amplas = 0
+
+    def busca_ampla():
+        """Procura na tela inteira (ou 'region'); retorna o box (left, top, width, height) ou None."""
+        nonlocal buscas_amplas
+        buscas_amplas += 1
+        frame, origem = _capturar_frame(region)
+        encontrado = _localizar_indexado(
+            image_name,
+            preparar_frame(frame, grayscale), 
+            origem,
+            template, 
+            confianca, 
+            modo_busca,
+            template_reduzido,
+            usar_hotspots=region is None
+        )
+        return encontrado[:4] if encontrado else None
+
+    poller = AdaptivePoller()
     inicio = time.time()
     disappeared_timestamp = None 
+    image_found = False
+    regiao_local = None  # Retângulo (com margem) onde a imagem foi vista por último
 
     while time.time() - inicio < timeout:
-        # 1. Reseta o status a cada loop
-        image_found = False 
-        
         try:
-            # 2. Tenta localizar a imagem
-            localizacao = pyautogui.locateCenterOnScreen(
-                caminho_imagem, 
-                confidence=confianca, 
-                grayscale=grayscale, 
-                region=region
-            )
-            if localizacao:
-                # 3. SÓ SETA True SE REALMENTE ACHAR
-                image_found = True
-
-        except pyautogui.PyAutoGUIException:
+            if regiao_local is None:
+                # 1. Captura a tela; se nada mudou, o resultado anterior continua válido
+                frame, origem = _capturar_frame(region)
+                if poller.mudou(frame):
+                    # 2. Tenta localizar a imagem (template já decodificado, vindo do cache)
+                    encontrado = _localizar_indexado(
+                        image_name,
+                        preparar_frame(frame, grayscale), 
+                        origem,
+                        template, 
+                        confianca, 
+                        modo_busca,
+                        template_reduzido,
+                        usar_hotspots=region is None
+                    )
+                    # 3. SÓ SETA True SE REALMENTE ACHAR
+                    image_found = encontrado is not None
+                    if image_found and verificacao_local:
+                        regiao_local = _regiao_ao_redor(encontrado[:4], region)
+                        poller.invalidar()  # As próximas capturas são do retângulo, não da tela
+            else:
+                # 1. Captura SÓ o retângulo onde a imagem estava
+                frame, origem = _capturar_frame(regiao_local)
+                if poller.mudou(frame):
+                    # 2. Compara o template direto ali (poucos pixels, sem busca)
+                    no_lugar = localizar_template(preparar_frame(frame, grayscale), template, confianca, None, origem, 'normal')
+                    if no_lugar:
+                        image_found = True
+                    elif image_found:
+                        # 3. Saiu do lugar: sumiu ou mudou de posição? Uma busca ampla decide
+                        box = busca_ampla()
+                        image_found = box is not None
+                        if box:
+                            regiao_local = _regiao_ao_redor(box, region)
+                        poller.invalidar()
+
+        except CaptureError:  # Falhas do screenshot (inclusive do pyautogui) chegam como CaptureError
             # Erro temporário de screenshot. Assume 'não encontrada' e deixa o loop tentar de novo.
-            logging.debug("PyAutoGUIException (temporário) ao localizar. Tentando de novo...")
-            # 'image_found' permanece False, o que é o correto
+            logging.debug("Falha temporária na captura ao localizar. Tentando de novo...")
+            image_found = False
+            poller.invalidar()
             
         except Exception as e:
             # CORREÇÃO: Erro inesperado (como tela minimizada). 
             # Loga o erro completo e assume 'não encontrada'.
             
             # (Adicionado exc_info=True para vermos o erro real, não só uma linha em branco)
-            logging.error(f"Erro inesperado no locateOnScreen. Assumindo que a imagem sumiu.", exc_info=True)
-            
-            # 'image_found' permanece False, o que é o correto
+            logging.error(f"Erro inesperado ao localizar '{image_name}'. Assumindo que a imagem sumiu.", exc_info=True)
+            image_found = False
+            poller.invalidar()
 
         # --- Lógica de Estabilidade (Agora funciona com erros) ---
         
@@ -195,22 +382,34 @@ def esperar_imagem_desaparecer(image_name: str,
             # IMAGEM ESTÁ VISÍVEL.
             # Reseta o timer de estabilidade.
             disappeared_timestamp = None
-            logging.debug(f"Imagem '{image_name}' ainda está visível.")
+            logging.debug("Imagem '%s' ainda está visível.", image_name)  # A cada tentativa: formatação tardia
         else:
             # IMAGEM NÃO ESTÁ VISÍVEL (ou um erro ocorreu)
             if disappeared_timestamp is None:
                 # Primeira vez que não a vemos. Inicia o timer.
-                logging.debug(f"Imagem '{image_name}' desapareceu (ou erro). Iniciando verificação de estabilidade...")
+                logging.debug("Imagem '%s' desapareceu (ou erro). Iniciando verificação de estabilidade...", image_name)
                 disappeared_timestamp = time.time()
             else:
                 # Já estamos na verificação.
                 elapsed_since_disappeared = time.time() - disappeared_timestamp
                 if elapsed_since_disappeared >= stability_check_sec:
+                    # No modo local, só o retângulo foi observado: confirma na tela/region antes
+                    box = busca_ampla() if regiao_local is not None else None
+                    if box:
+                        logging.debug("Imagem '%s' reapareceu em outra posição %s.", image_name, box)
+                        regiao_local = _regiao_ao_redor(box, region)
+                        image_found = True
+                        disappeared_timestamp = None
+                        poller.invalidar()
+                        poller.dormir()
+                        continue
                     # SUCESSO! A imagem sumiu (ou erro persistiu) pelo tempo de estabilidade.
                     logging.info(f"Imagem '{image_name}' desapareceu com sucesso (estável por {stability_check_sec}s).")
+                    if logging.getLogger().isEnabledFor(logging.DEBUG):
+                        logging.debug(f"Polling: {poller.resumo()} | Buscas amplas (modo local): {buscas_amplas}")
                     return True
         
-        time.sleep(0.5)
+        poller.dormir()
         
     # Se o loop terminar (Timeout):
     logging.error(f"Timeout! Imagem '{image_name}' AINDA ESTÁ VISÍVEL após {timeout}s.")
@@ -220,7 +419,8 @@ def imagem_esta_presente(image_name: str,
                          timeout: int = DEFAULT_WAIT_TIMEOUT, 
                          region: tuple = None, 
                          confianca: float = DEFAULT_CONFIDENCE,
-                         grayscale: bool = DEFAULT_GRAYSCALE) -> bool:
+                         grayscale: bool = DEFAULT_GRAYSCALE,
+                         modo_busca: str = DEFAULT_MATCH_MODE) -> bool:
     """
     Verifica se uma imagem está presente na tela dentro do timeout.
     
@@ -237,7 +437,8 @@ def imagem_esta_presente(image_name: str,
             timeout, 
             region, 
             confianca, 
-            grayscale
+            grayscale,
+            modo_busca
         )
         # Se chegou até aqui, a imagem foi encontrada.
         logging.info(f"Verificação (imagem_esta_presente): Imagem '{image_name}' FOI encontrada.")
@@ -258,25 +459,323 @@ def imagem_esta_presente(image_name: str,
         logging.error(f"Erro inesperado ao verificar '{image_name}': {e}", exc_info=True)
         return False
 
+def _capturar_frame(region: tuple = None):
+    """Captura a tela (ou uma região) UMA vez e retorna (frame BGR, origem (x, y))."""
+    frame = capturar_tela(region)
+    origem = (region[0], region[1]) if region else (0, 0)
+    return frame, origem
+
+def precarregar_templates(imagens: list,
+                          grayscale: bool = DEFAULT_GRAYSCALE,
+                          modo_busca: str = DEFAULT_MATCH_MODE):
+    """
+    Decodifica de antemão os templates (e as versões reduzidas do modo
+    'piramide') para o cache, lançando FileNotFoundError com TODOS os
+    arquivos ausentes de uma vez. Assim a primeira espera de cada imagem
+    não paga a leitura do disco, e um nome errado aparece já no início.
+    """
+    ausentes = [nome for nome in imagens if not os.path.exists(os.path.join(IMAGE_DIR, nome))]
+    if ausentes:
+        raise FileNotFoundError(f"Arquivos de imagem não encontrados em '{IMAGE_DIR}': {ausentes}")
+    for nome in imagens:
+        caminho_imagem = os.path.join(IMAGE_DIR, nome)
+        template = template_cache.get(caminho_imagem, grayscale=grayscale)
+        _template_reduzido(caminho_imagem, template, grayscale, modo_busca)
+    if len(imagens) > template_cache.max_size:
+        logging.warning(f"{len(imagens)} templates pré-carregados, mas o cache guarda só {template_cache.max_size} (TEMPLATE_CACHE_SIZE).")
+    logging.debug(f"Templates pré-carregados: {len(imagens)} | Cache: {template_cache.stats()}")
+
+def _regiao_ao_redor(box: tuple, limite: tuple = None) -> tuple:
+    """Box (left, top, width, height) + DISAPPEAR_BOX_MARGIN, sem sair da tela (ou de 'limite')."""
+    left, top, width, height = box
+    if limite is None:
+        limite = (0, 0) + tuple(get_backend().size())
+    x0 = max(limite[0], left - DISAPPEAR_BOX_MARGIN)
+    y0 = max(limite[1], top - DISAPPEAR_BOX_MARGIN)
+    x1 = min(limite[0] + limite[2], left + width + DISAPPEAR_BOX_MARGIN)
+    y1 = min(limite[1] + limite[3], top + height + DISAPPEAR_BOX_MARGIN)
+    return (x0, y0, x1 - x0, y1 - y0)
+
+def _template_reduzido(caminho_imagem: str, template, grayscale: bool, modo_busca: str):
+    """Para o modo 'piramide', pega do cache a versão reduzida do template (senão None)."""
+    if modo_busca != 'piramide':
+        return None
+    niveis = niveis_piramide(template)
+    if niveis == 0:
+        return None
+    return template_cache.get(caminho_imagem, grayscale=grayscale, escala=1 / (1 << niveis))
+
+def _localizar_indexado(image_name: str, frame, origem: tuple, template, confianca: float,
+                        modo_busca: str, template_reduzido, region: tuple = None,
+                        usar_hotspots: bool = True):
+    """
+    Busca o template no frame. Sem 'region' explícita, tenta primeiro as regiões
+    ao redor dos hot-spots conhecidos e só varre o frame inteiro se não achar.
+    Toda localização encontrada alimenta o índice.
+    """
+    regioes = location_index.regioes_candidatas(image_name) if (usar_hotspots and ENABLE_LOCATION_INDEX) else []
+    area_frame = frame.shape[0] * frame.shape[1]
+    area_varrida = 0
+    encontrado = None
+    
+    for regiao in regioes:
+        area_varrida += regiao[2] * regiao[3]
+        encontrado = localizar_template(frame, template, confianca, regiao, origem, modo_busca, template_reduzido)
+        if encontrado:
+            break
+    acertou_hotspot = encontrado is not None
+    
+    if not encontrado:
+        area_varrida += area_frame
+        encontrado = localizar_template(frame, template, confianca, region, origem, modo_busca, template_reduzido)
+    
+    if regioes:
+        location_index.registrar_busca(image_name, acertou_hotspot, area_varrida, area_frame)
+    if encontrado and ENABLE_LOCATION_INDEX:
+        location_index.registrar_encontro(image_name, encontrado)
+    return encontrado
+
+def _uniao_regioes(regioes: list):
+    """Retorna a menor região que cobre todas as informadas (None = tela cheia)."""
+    if not regioes or any(r is None for r in regioes):
+        return None
+    left = min(r[0] for r in regioes)
+    top = min(r[1] for r in regioes)
+    right = max(r[0] + r[2] for r in regioes)
+    bottom = max(r[1] + r[3] for r in regioes)
+    return (left, top, right - left, bottom - top)
+
+@rastreado(alvo="imagens")
+def esperar_qualquer_imagem(imagens: list, 
+                            timeout: int = DEFAULT_WAIT_TIMEOUT, 
+                            confianca: float = DEFAULT_CONFIDENCE,
+                            grayscale: bool = DEFAULT_GRAYSCALE,
+                            modo_busca: str = DEFAULT_MATCH_MODE):
+    """
+    Aguarda até que QUALQUER uma das imagens apareça na tela.
+    
+    'imagens' é uma lista de nomes de arquivo ou de dicts no formato
+    {'imagem': 'erro.png', 'region': (l, t, w, h), 'confianca': 0.8}
+    ('region' e 'confianca' são opcionais).
+    
+    Cada tentativa faz UMA captura de tela e compara todos os templates
+    contra esse mesmo frame. Se mais de uma imagem estiver visível, vence a
+    que vem primeiro na lista.
+    
+    Retorna (nome_da_imagem, Point(x, y)) ou lança TimeoutError.
+    """
+    alvos = []
+    for item in imagens:
+        if isinstance(item, str):
+            item = {'imagem': item}
+        caminho_imagem = os.path.join(IMAGE_DIR, item['imagem'])
+        if not os.path.exists(caminho_imagem):
+            logging.error(f"Arquivo de imagem não encontrado: {caminho_imagem}")
+            raise FileNotFoundError(f"Arquivo de imagem não encontrado: {caminho_imagem}")
+        template = template_cache.get(caminho_imagem, grayscale=grayscale)
+        alvos.append({
+            'imagem': item['imagem'],
+            'region': item.get('region'),
+            'confianca': item.get('confianca', confianca),
+            'template': template,
+            'template_reduzido': _template_reduzido(caminho_imagem, template, grayscale, modo_busca),
+        })
+    
+    nomes = [alvo['imagem'] for alvo in alvos]
+    regiao_captura = _uniao_regioes([alvo['region'] for alvo in alvos])
+    logging.info(f"Aguardando qualquer imagem: {nomes} (Timeout: {timeout}s)")
+    
+    poller = AdaptivePoller()
+    inicio = time.time()
+    while time.time() - inicio < timeout:
+        try:
+            frame, origem = _capturar_frame(regiao_captura)
+            if not poller.mudou(frame):
+                poller.dormir()
+                continue
+            frame = preparar_frame(frame, grayscale)
+            for alvo in alvos:
+                encontrado = _localizar_indexado(
+                    alvo['imagem'],
+                    frame, 
+                    origem,
+                    alvo['template'], 
+                    alvo['confianca'], 
+                    modo_busca,
+                    alvo['template_reduzido'],
+                    region=alvo['region'],
+                    usar_hotspots=alvo['region'] is None
+                )
+                if encontrado:
+                    left, top, width, height, score = encontrado
+                    localizacao = Point(left + width // 2, top + height // 2)
+                    logging.info(f"Imagem '{alvo['imagem']}' encontrada em {localizacao} (score {score:.3f})")
+                    return alvo['imagem'], localizacao
+        except CaptureError:  # Falhas do screenshot (inclusive do pyautogui) chegam como CaptureError
+            logging.debug("Falha temporária na captura (ignorado).")
+            poller.invalidar()
+        except Exception as e:
+            logging.error(f"Erro inesperado ao procurar {nomes}: {e}")
+            poller.invalidar()
+        poller.dormir()
+    
+    logging.error(f"Timeout! Nenhuma das imagens {nomes} foi encontrada em {timeout}s.")
+    raise TimeoutError(f"Nenhuma das imagens {nomes} foi encontrada em {timeout}s.")
+
+@rastreado(alvo="image_name")
+def localizar_todas(image_name: str, 
+                    region: tuple = None, 
+                    confianca: float = DEFAULT_CONFIDENCE,
+                    grayscale: bool = DEFAULT_GRAYSCALE,
+                    ordem: str = 'linhas') -> list:
+    """
+    Encontra TODAS as ocorrências de uma imagem (ex: cada botão 'Editar' de
+    uma grade) com UMA captura de tela. Não espera: se a tela ainda está
+    carregando, use esperar_imagem antes.
+    
+    'ordem': 'linhas' (leitura: cima->baixo, esq->dir), 'colunas' ou 'score'.
+    Sempre em resolução cheia (o 'modo_busca' piramide não se aplica aqui).
+    
+    Retorna uma lista de Point(x, y) (centros), vazia se não houver nenhuma.
+    """
+    caminho_imagem = os.path.join(IMAGE_DIR, image_name)
+    if not os.path.exists(caminho_imagem):
+        logging.error(f"Arquivo de imagem não encontrado: {caminho_imagem}")
+        raise FileNotFoundError(f"Arquivo de imagem não encontrado: {caminho_imagem}")
+    
+    template = template_cache.get(caminho_imagem, grayscale=grayscale)
+    frame, origem = _capturar_frame(region)
+    ocorrencias = localizar_todas_no_frame(preparar_frame(frame, grayscale), template, confianca, None, origem)
+    ocorrencias = ordenar_ocorrencias(ocorrencias, ordem)
+    
+    pontos = [Point(left + width // 2, top + height // 2) for left, top, width, height, _ in ocorrencias]
+    logging.info(f"localizar_todas: {len(pontos)} ocorrência(s) de '{image_name}' (Confiança: {confianca}).")
+    logging.debug(f"Ocorrências de '{image_name}': {[(p.x, p.y, round(o[4], 3)) for p, o in zip(pontos, ocorrencias)]}")
+    return pontos
+
 # --- 5. Ações Combinadas ---
 def find_and_click(image_name: str, 
                    timeout=DEFAULT_WAIT_TIMEOUT, 
                    confidence=DEFAULT_CONFIDENCE,
                    region=None,
-                   grayscale=DEFAULT_GRAYSCALE):
+                   grayscale=DEFAULT_GRAYSCALE,
+                   modo_busca=DEFAULT_MATCH_MODE):
     """Encontra uma imagem (usando esperar_imagem) e clica nela (usando safe_click)."""
     try:
-        coords = esperar_imagem(image_name, timeout, region, confidence, grayscale)
+        coords = esperar_imagem(image_name, timeout, region, confidence, grayscale, modo_busca)
         safe_click(coords, log_message=f"find_and_click: {image_name}")
         return True
     except (TimeoutError, FileNotFoundError):
         logging.warning(f"Não foi possível clicar em '{image_name}', pois não foi encontrada a tempo.")
         return False
 
-def type_text(text, interval=0.05):
-    """Digita texto de forma mais 'humana' (com intervalo)."""
-    logging.info(f"Digitando: '{text[:20]}...'")
-    pyautogui.write(text, interval=interval)
+def find_all_and_click(image_name: str, 
+                       confidence=DEFAULT_CONFIDENCE,
+                       region=None,
+                       grayscale=DEFAULT_GRAYSCALE,
+                       ordem: str = 'linhas',
+                       max_cliques: int = None,
+                       region_estabilidade=None) -> int:
+    """
+    Encontra todas as ocorrências (localizar_todas, UMA captura) e clica em
+    cada uma, na 'ordem' pedida, sem procurar de novo entre os cliques (cada
+    clique ainda passa pelo safe_click: log, histórico e pacing).
+    Só serve se os cliques não mudam a posição dos itens na tela.
+    
+    Retorna a quantidade de cliques feitos.
+    """
+    pontos = localizar_todas(image_name, region, confidence, grayscale, ordem)
+    if max_cliques is not None:
+        pontos = pontos[:max_cliques]
+    for i, ponto in enumerate(pontos, start=1):
+        safe_click(ponto, log_message=f"find_all_and_click: {image_name} ({i}/{len(pontos)})",
+                   region_estabilidade=region_estabilidade)
+    return len(pontos)
+
+@rastreado()
+def type_text(text, 
+              interval=TYPE_INTERVAL, 
+              modo: str = DEFAULT_TYPE_MODE, 
+              verificar: bool = DEFAULT_TYPE_VERIFY,
+              region_estabilidade=None):
+    """
+    Digita texto no campo com foco, usando a estratégia escolhida em 'modo':
+    
+    - 'teclas': uma tecla por vez, com 'interval' entre elas (mais 'humano');
+    - 'lote': todas as teclas de uma vez, sem intervalo por caractere;
+    - 'colar': copia para a área de transferência e cola com Ctrl+V (o mais
+      rápido, e o único que digita acentos/ç em qualquer layout de teclado).
+    
+    Com 'verificar=True', o campo é relido (Ctrl+A, Ctrl+C) e comparado com o
+    texto. Se não conferir, redigita uma vez no modo 'teclas'; se ainda assim
+    não conferir, lança ValueError. Assume que o campo contém só este texto.
+    
+    'region_estabilidade' funciona como no safe_click.
+    """
+    if modo not in ('teclas', 'lote', 'colar'):
+        raise ValueError(f"Modo de digitação desconhecido: '{modo}' (use 'teclas', 'lote' ou 'colar').")
+    
+    logging.info(f"Digitando: '{text[:20]}...' (modo: {modo})")
+    with pausa_pelo_helper():
+        with medir("acao_sec"):
+            _digitar(text, modo, interval)
+        somar("pausa_sec", pyautogui.PAUSE)
+        
+        if verificar:
+            lido = _ler_campo()
+            if lido != text:
+                logging.warning(f"Texto no campo não confere (lido: '{lido[:20]}'). Redigitando no modo 'teclas'...")
+                pyautogui.hotkey(_TECLA_CTRL, 'a')  # Seleciona tudo: o texto novo substitui o errado
+                _digitar(text, 'teclas', interval)
+                lido = _ler_campo()
+                if lido != text:
+                    logging.error(f"Falha na digitação: esperado '{text[:20]}', lido '{lido[:20]}'.")
+                    raise ValueError(f"Texto digitado não confere: esperado '{text}', lido '{lido}'.")
+            logging.debug("Texto no campo verificado com sucesso.")
+    registrar_acao()
+    pausar_apos_acao(region_estabilidade)
+
+@rastreado(alvo="keys")
+def press_key(keys, presses=1, region_estabilidade=None):
+    """
+    Equivalente ao pg.press (uma tecla ou lista de teclas), com a espera do
+    pacing feita só no fim e na 'region_estabilidade' dada (um pg.press direto
+    também espera, mas na PACING_REGION).
+    """
+    logging.debug(f"Pressionando: {keys} (x{presses})")
+    with medir("acao_sec"), pausa_pelo_helper():
+        pyautogui.press(keys, presses=presses)
+    somar("pausa_sec", pyautogui.PAUSE)
+    registrar_acao()
+    pausar_apos_acao(region_estabilidade)
+
+# Tecla de atalho para copiar/colar/selecionar (Cmd no macOS)
+_TECLA_CTRL = 'command' if sys.platform == 'darwin' else 'ctrl'
+
+def _digitar(text, modo: str, interval: float):
+    """Envia o texto para o campo com foco, conforme o modo."""
+    if modo == 'teclas':
+        pyautogui.write(text, interval=interval)
+    elif modo == 'lote':
+        pyautogui.write(text, interval=0)
+    else:
+        anterior = pyperclip.paste()
+        pyperclip.copy(text)
+        pyautogui.hotkey(_TECLA_CTRL, 'v')
+        time.sleep(TYPE_PASTE_SETTLE)  # Dá tempo ao app de ler a área de transferência
+        pyperclip.copy(anterior)
+
+def _ler_campo() -> str:
+    """Lê o conteúdo do campo com foco via área de transferência (Ctrl+A, Ctrl+C) e tira a seleção."""
+    anterior = pyperclip.paste()
+    pyperclip.copy('')
+    pyautogui.hotkey(_TECLA_CTRL, 'a')
+    pyautogui.hotkey(_TECLA_CTRL, 'c')
+    time.sleep(TYPE_PASTE_SETTLE)
+    lido = pyperclip.paste()
+    pyperclip.copy(anterior)
+    pyautogui.press('end')
+    return lido
 
 def click_relative(image_name: str, 
                             x: int, 
@@ -284,7 +783,8 @@ def click_relative(image_name: str,
                             timeout=DEFAULT_WAIT_TIMEOUT, 
                             confidence=DEFAULT_CONFIDENCE,
                             region=None,
-                            grayscale=DEFAULT_GRAYSCALE):
+                            grayscale=DEFAULT_GRAYSCALE,
+                            modo_busca=DEFAULT_MATCH_MODE):
     """
     Encontra uma imagem-âncora e clica em um ponto relativo (offset) a ela.
     
@@ -299,7 +799,8 @@ def click_relative(image_name: str,
             timeout=timeout, 
             confianca=confidence, 
             region=region, 
-            grayscale=grayscale
+            grayscale=grayscale,
+            modo_busca=modo_busca
         )
         
         # 2. Calcula as coordenadas do alvo
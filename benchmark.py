@@ -0,0 +1,317 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import itertools
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from config import (
+    DEFAULT_CONFIDENCE, BENCHMARK_RESOLUTIONS, BENCHMARK_REPEAT, BENCHMARK_RESULTS_FILE,
+    BENCHMARK_BASELINE_FILE, BENCHMARK_REGRESSION_THRESHOLD, BENCHMARK_MIN_DIFF_MS
+)
+from image_matching import TemplateCache, preparar_frame, localizar_template, fingerprint_frame, niveis_piramide
+from screen_capture import FakeBackend, set_backend, capturar_tela
+
+# Benchmark offline do caminho de busca de imagem. Não precisa de tela: gera
+# telas sintéticas (várias resoluções) com um template embutido em posição
+# conhecida (e as mesmas telas sem ele) e as serve pelo backend de captura 'fake'.
+#
+# Etapas medidas:
+# - captura:     capturar_tela() (tela cheia e região) + fingerprint do polling;
+# - match:       localizar_template() por grayscale x confiança x região x modo,
+#                com o template presente e ausente (lado a lado);
+# - espera:      esperar_imagem() de ponta a ponta: a mesma grade do 'match'
+#                (grayscale x confiança x região x modo) com a imagem já
+#                visível, a imagem aparecendo após algumas capturas, com e
+#                sem hot-spots, e a imagem que nunca aparece (espera até o
+#                timeout, com a tela parada e mudando; aqui o tempo de relógio
+#                é o timeout, e o que se compara é o tempo de CPU). Roda sem
+#                display (o pyautogui só é importado pelas ações, que o
+#                benchmark não usa).
+#
+# Uso:
+#   python benchmark.py                    -> roda e compara com a referência (se houver)
+#   python benchmark.py --salvar-baseline  -> roda e grava o resultado como referência
+#   python benchmark.py --rapido           -> só a menor resolução, menos repetições
+# Sai com código 1 se algum caso ficou mais lento que a referência.
+
+POSICAO_TEMPLATE = (0.62, 0.58)  # Posição relativa (x, y) do template na tela sintética
+TIMEOUT_ESPERA = 3  # Timeout (seg.) de cada esperar_imagem da etapa 'espera'
+TIMEOUT_AUSENTE = 1  # Timeout (seg.) das esperas por uma imagem que nunca aparece
+
+# --- 1. Telas Sintéticas ---
+def gerar_template(largura: int = 120, altura: int = 32) -> np.ndarray:
+    """Um "botão" com borda e texto, parecido com os templates capturados de verdade."""
+    botao = np.full((altura, largura, 3), (215, 120, 0), dtype=np.uint8)
+    cv2.rectangle(botao, (0, 0), (largura - 1, altura - 1), (90, 50, 0), 2)
+    cv2.putText(botao, "Confirmar", (12, altura - 11), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (255, 255, 255), 1, cv2.LINE_AA)
+    return botao
+
+def gerar_tela(largura: int, altura: int, template: np.ndarray = None, seed: int = 0) -> np.ndarray:
+    """
+    Tela clara com "janelas", barras e textos aleatórios (determinísticos pela
+    'seed'). Se 'template' vier, é colado em POSICAO_TEMPLATE.
+    """
+    rng = np.random.default_rng(seed)
+    tela = np.full((altura, largura, 3), 235, dtype=np.uint8)
+    for _ in range(largura * altura // 20000):
+        x, y = int(rng.integers(0, largura - 40)), int(rng.integers(0, altura - 20))
+        w, h = int(rng.integers(40, 320)), int(rng.integers(14, 140))
+        cor = tuple(int(c) for c in rng.integers(60, 256, 3))
+        cv2.rectangle(tela, (x, y), (x + w, y + h), cor, -1)
+        texto = "".join(chr(int(c)) for c in rng.integers(65, 91, int(rng.integers(4, 14))))
+        cv2.putText(tela, texto, (x + 4, y + 13), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (20, 20, 20), 1, cv2.LINE_AA)
+    if template is not None:
+        x, y = posicao_template(largura, altura)
+        tela[y:y + template.shape[0], x:x + template.shape[1]] = template
+    return tela
+
+def posicao_template(largura: int, altura: int) -> tuple:
+    return int(largura * POSICAO_TEMPLATE[0]), int(altura * POSICAO_TEMPLATE[1])
+
+# --- 2. Medição ---
+def cronometrar(funcao, repeticoes: int) -> dict:
+    """
+    Roda 'funcao' N vezes e retorna mediana/p90/mín em milissegundos, a
+    mediana do tempo de CPU do processo (e o último retorno).
+    """
+    tempos = []
+    tempos_cpu = []
+    retorno = None
+    for _ in range(repeticoes):
+        inicio, inicio_cpu = time.perf_counter(), time.process_time()
+        retorno = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        tempos_cpu.append((time.process_time() - inicio_cpu) * 1000)
+    tempos = np.array(tempos)
+    return {
+        "mediana_ms": round(float(np.median(tempos)), 3),
+        "p90_ms": round(float(np.percentile(tempos, 90)), 3),
+        "min_ms": round(float(tempos.min()), 3),
+        "cpu_mediana_ms": round(float(np.median(tempos_cpu)), 3),
+        "repeticoes": repeticoes,
+        "_retorno": retorno,
+    }
+
+def _caso(etapa: str, resolucao: tuple, medicao: dict, metrica: str = "mediana_ms", **parametros) -> dict:
+    """'metrica' é o campo comparado com a referência (e impresso)."""
+    retorno = medicao.pop("_retorno")
+    chave = "|".join([etapa, f"{resolucao[0]}x{resolucao[1]}"] + [f"{k}={v}" for k, v in parametros.items()])
+    caso = {"caso": chave, "etapa": etapa, "resolucao": f"{resolucao[0]}x{resolucao[1]}", **parametros, **medicao,
+            "metrica": metrica}
+    if etapa != "captura":
+        caso["encontrado"] = retorno is not None
+    sufixo = " (CPU)" if metrica == "cpu_mediana_ms" else ""
+    print(f"  {chave:<75} {medicao[metrica]:>9.3f} ms{sufixo}")
+    return caso
+
+# --- 3. Etapas ---
+def medir_captura(resolucao: tuple, regiao: tuple, repeticoes: int) -> list:
+    casos = [
+        _caso("captura", resolucao, cronometrar(lambda: capturar_tela(), repeticoes), alvo="tela_cheia"),
+        _caso("captura", resolucao, cronometrar(lambda: capturar_tela(regiao), repeticoes), alvo="regiao"),
+    ]
+    frame = capturar_tela()
+    casos.append(_caso("captura", resolucao, cronometrar(lambda: fingerprint_frame(frame), repeticoes), alvo="fingerprint"))
+    return casos
+
+def medir_match(tela: np.ndarray, tela_sem: np.ndarray, caminho_template: str,
+                resolucao: tuple, regiao: tuple, repeticoes: int) -> list:
+    cache = TemplateCache()
+    casos = []
+    for grayscale, confianca, usar_regiao, modo, presente in itertools.product(
+            (True, False), (0.8, DEFAULT_CONFIDENCE, 0.95), (False, True), ("normal", "piramide"), (True, False)):
+        frame = preparar_frame(tela if presente else tela_sem, grayscale)
+        template = cache.get(caminho_template, grayscale=grayscale)
+        niveis = niveis_piramide(template)
+        reduzido = cache.get(caminho_template, grayscale=grayscale, escala=1 / (1 << niveis)) if (modo == "piramide" and niveis) else None
+        medicao = cronometrar(
+            lambda: localizar_template(frame, template, confianca, regiao if usar_regiao else None, (0, 0), modo, reduzido),
+            repeticoes
+        )
+        casos.append(_caso("match", resolucao, medicao, grayscale=grayscale, confianca=confianca,
+                           regiao=usar_regiao, modo=modo, template="presente" if presente else "ausente"))
+    return casos
+
+def medir_espera(helpers, backend: FakeBackend, tela: np.ndarray, tela_sem: np.ndarray,
+                 nome_template: str, resolucao: tuple, regiao: tuple, repeticoes: int) -> list:
+    def esperar(aparece_apos: int, **opcoes):
+        # Reinicia a sequência: 'aparece_apos' capturas sem o template, depois com ele
+        backend.set_frames([tela_sem] * aparece_apos + [tela])
+        try:
+            return helpers.esperar_imagem(nome_template, timeout=TIMEOUT_ESPERA, **opcoes)
+        except TimeoutError:
+            return None  # Vira 'encontrado': false no resultado
+
+    # Telas sem o template; "mudando" alterna duas telas diferentes a cada captura
+    tela_sem_outra = np.ascontiguousarray(tela_sem[:, ::-1])
+    sequencias = {
+        "parada": [tela_sem],
+        "mudando": [tela_sem, tela_sem_outra] * int(TIMEOUT_AUSENTE / 0.01),
+    }
+
+    def esperar_ausente(tela_ausente: str, **opcoes):
+        backend.set_frames(sequencias[tela_ausente])
+        try:
+            return helpers.esperar_imagem(nome_template, timeout=TIMEOUT_AUSENTE, **opcoes)
+        except TimeoutError:
+            return None
+
+    casos = []
+    # Mesma grade do 'match', com a imagem já visível (sem hot-spots: mede a busca)
+    helpers.ENABLE_LOCATION_INDEX = False
+    for grayscale, confianca, usar_regiao, modo in itertools.product(
+            (True, False), (0.8, DEFAULT_CONFIDENCE, 0.95), (False, True), ("normal", "piramide")):
+        opcoes = {"grayscale": grayscale, "confianca": confianca, "region": regiao if usar_regiao else None, "modo_busca": modo}
+        casos.append(_caso("espera", resolucao, cronometrar(lambda: esperar(0, **opcoes), repeticoes),
+                           grayscale=grayscale, confianca=confianca, regiao=usar_regiao, modo=modo))
+
+    # Imagem que aparece depois de algumas capturas, com e sem hot-spots (configuração padrão)
+    for hotspot, aparece_apos, modo in itertools.product((False, True), (0, 3), ("normal", "piramide")):
+        helpers.ENABLE_LOCATION_INDEX = hotspot
+        casos.append(_caso("espera", resolucao, cronometrar(lambda: esperar(aparece_apos, modo_busca=modo), repeticoes),
+                           hotspot=hotspot, aparece_apos=aparece_apos, modo=modo))
+
+    # Imagem que nunca aparece: espera até o timeout (compara o tempo de CPU)
+    helpers.ENABLE_LOCATION_INDEX = False
+    for tela_ausente, modo in itertools.product(("parada", "mudando"), ("normal", "piramide")):
+        casos.append(_caso("espera", resolucao,
+                           cronometrar(lambda: esperar_ausente(tela_ausente, modo_busca=modo), min(repeticoes, 3)),
+                           metrica="cpu_mediana_ms", template="ausente", tela=tela_ausente, modo=modo))
+    return casos
+
+def _importar_helpers(pasta: str):
+    """Importa automation_helpers apontando imagens e hot-spots para a pasta temporária."""
+    try:
+        import automation_helpers as helpers
+        from location_index import LocationIndex
+    except Exception as e:
+        print(f"  [AVISO] Etapa 'espera' pulada: não foi possível importar automation_helpers ({e}).")
+        return None
+    helpers.IMAGE_DIR = pasta
+    helpers.location_index = LocationIndex(caminho=os.path.join(pasta, "locations.json"), semente=None)
+    return helpers
+
+# --- 4. Execução, Resultado e Comparação ---
+def executar(resolucoes: list = BENCHMARK_RESOLUTIONS, repeticoes: int = BENCHMARK_REPEAT) -> dict:
+    pasta = tempfile.mkdtemp(prefix="rpa_benchmark_")
+    backend = set_backend(FakeBackend(fonte=None))
+    helpers_originais = None
+    casos = []
+    try:
+        template = gerar_template()
+        nome_template = "benchmark_botao.png"
+        caminho_template = os.path.join(pasta, nome_template)
+        cv2.imwrite(caminho_template, template)
+
+        helpers = _importar_helpers(pasta)
+        if helpers is not None:
+            helpers_originais = helpers.ENABLE_LOCATION_INDEX
+
+        for largura, altura in resolucoes:
+            print(f"\n--- Resolução {largura}x{altura} ---")
+            tela = gerar_tela(largura, altura, template)
+            x, y = posicao_template(largura, altura)
+            regiao = (max(0, x - 150), max(0, y - 100), template.shape[1] + 300, template.shape[0] + 200)
+            backend.set_frame(tela)
+
+            casos += medir_captura((largura, altura), regiao, repeticoes)
+            tela_sem = gerar_tela(largura, altura, None)
+            casos += medir_match(tela, tela_sem, caminho_template, (largura, altura), regiao, repeticoes)
+            if helpers is not None:
+                casos += medir_espera(helpers, backend, tela, tela_sem, nome_template, (largura, altura), regiao, repeticoes)
+    finally:
+        if helpers_originais is not None:
+            helpers.ENABLE_LOCATION_INDEX = helpers_originais
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    return {
+        "meta": {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "plataforma": platform.platform(),
+            "cpu": platform.processor() or platform.machine(),
+            "repeticoes": repeticoes,
+        },
+        "casos": casos,
+    }
+
+def comparar(resultado: dict, baseline: dict,
+             limite: float = BENCHMARK_REGRESSION_THRESHOLD,
+             diferenca_minima_ms: float = BENCHMARK_MIN_DIFF_MS) -> list:
+    """
+    Compara a métrica de cada caso (a mediana, ou o tempo de CPU nas esperas
+    até o timeout) com a referência. Retorna os casos que regrediram (mais
+    lentos que 'limite' E por mais de 'diferenca_minima_ms'), os que deixaram
+    de encontrar o template e os que passaram a achá-lo numa tela sem ele.
+    """
+    referencia = {c["caso"]: c for c in baseline.get("casos", [])}
+    regressoes = []
+    for caso in resultado["casos"]:
+        antes = referencia.get(caso["caso"])
+        metrica = caso.get("metrica", "mediana_ms")
+        if antes is None or metrica not in antes:
+            continue
+        diferenca = caso[metrica] - antes[metrica]
+        variacao = diferenca / antes[metrica] if antes[metrica] else 0.0
+        caso["baseline_ms"] = antes[metrica]
+        caso["variacao"] = round(variacao, 4)
+        if variacao > limite and diferenca > diferenca_minima_ms:
+            regressoes.append({**caso, "motivo": f"{variacao:+.0%} ({antes[metrica]:.3f} -> {caso[metrica]:.3f} ms)"})
+        elif antes.get("encontrado") and caso.get("encontrado") is False:
+            regressoes.append({**caso, "motivo": "template deixou de ser encontrado"})
+        elif antes.get("encontrado") is False and caso.get("encontrado") and caso.get("template") == "ausente":
+            regressoes.append({**caso, "motivo": "template encontrado numa tela sem ele"})
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline (sem tela) da captura e da busca de imagens.")
+    parser.add_argument("--repeticoes", type=int, default=BENCHMARK_REPEAT, help="Repetições por caso.")
+    parser.add_argument("--rapido", action="store_true", help="Só a menor resolução e 3 repetições.")
+    parser.add_argument("--saida", default=BENCHMARK_RESULTS_FILE, help="Arquivo JSON com o resultado.")
+    parser.add_argument("--baseline", default=BENCHMARK_BASELINE_FILE, help="Arquivo JSON de referência.")
+    parser.add_argument("--salvar-baseline", action="store_true", help="Grava este resultado como nova referência.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s - %(message)s')
+    resolucoes = [min(BENCHMARK_RESOLUTIONS)] if args.rapido else BENCHMARK_RESOLUTIONS
+    repeticoes = 3 if args.rapido else args.repeticoes
+
+    resultado = executar(resolucoes, repeticoes)
+
+    regressoes = []
+    if os.path.exists(args.baseline) and not args.salvar_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressoes = comparar(resultado, json.load(f))
+        resultado["regressoes"] = regressoes
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.saida)), exist_ok=True)
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"\nResultado salvo em '{args.saida}' ({len(resultado['casos'])} casos).")
+
+    if args.salvar_baseline:
+        shutil.copyfile(args.saida, args.baseline)
+        print(f"Referência atualizada: '{args.baseline}'.")
+    elif not os.path.exists(args.baseline):
+        print("Nenhuma referência encontrada. Rode com --salvar-baseline para criar uma.")
+    elif regressoes:
+        print(f"\n{len(regressoes)} REGRESSÃO(ÕES) em relação à referência:")
+        for caso in regressoes:
+            print(f"  {caso['caso']}: {caso['motivo']}")
+        sys.exit(1)
+    else:
+        print("Sem regressões em relação à referência.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import os
+import time
+import queue
+import logging
+import threading
+from collections import deque
+
+import cv2
+import numpy as np
+
+from config import (
+    BLACKBOX_ENABLED, BLACKBOX_SECONDS, BLACKBOX_FPS, BLACKBOX_MAX_SIDE,
+    BLACKBOX_MAX_MB, BLACKBOX_IDLE_CAPTURE, BLACKBOX_FORMAT
+)
+
+# --- 1. Gravador Contínuo ("Caixa-Preta") ---
+class CaixaPreta:
+    """
+    Mantém em memória os últimos BLACKBOX_SECONDS seg. da tela, reduzidos.
+
+    Não faz capturas próprias no caminho da automação: capturar_tela() entrega
+    a ela os frames que os loops de espera já capturaram (no máx. BLACKBOX_FPS
+    por segundo; o resto é ignorado com uma comparação de tempo). Uma thread
+    reduz cada frame e o "cola" numa tela reduzida (capturas de região
+    atualizam só o seu pedaço), e guarda uma cópia num buffer circular.
+    Se nenhum frame chegar em BLACKBOX_IDLE_CAPTURE seg. (ex.: num fluxo só
+    de teclado, sem esperas por imagem), a própria thread captura a tela, com
+    o peek() do backend (que não avança a sequência do FakeBackend).
+    registrar_agora() grava o frame do erro na hora, antes do congelar().
+
+    A memória é limitada: o buffer guarda no máx. BLACKBOX_SECONDS x
+    BLACKBOX_FPS frames, e menos se não couberem em BLACKBOX_MAX_MB.
+    """
+    def __init__(self,
+                 segundos: float = BLACKBOX_SECONDS,
+                 fps: float = BLACKBOX_FPS,
+                 lado_maximo: int = BLACKBOX_MAX_SIDE,
+                 max_mb: float = BLACKBOX_MAX_MB,
+                 captura_ociosa: float = BLACKBOX_IDLE_CAPTURE,
+                 ativa: bool = BLACKBOX_ENABLED):
+        self.segundos = segundos
+        self.intervalo = 1.0 / fps
+        self.lado_maximo = lado_maximo
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.captura_ociosa = captura_ociosa
+        self.ativa = ativa
+        self._fila = queue.Queue(maxsize=2)
+        self._frames = None  # deque de (timestamp, tela reduzida), criado com o 1º frame
+        self._tela = None
+        self._escala = 1.0
+        self._ultimo = 0.0
+        self._thread = None
+        self._lock = threading.Lock()
+        self._lock_tela = threading.Lock()  # _acumular() roda na thread e no registrar_agora()
+
+    def _iniciar(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name="CaixaPreta", daemon=True)
+                self._thread.start()
+
+    def registrar(self, frame: np.ndarray, region: tuple = None):
+        """Oferece um frame recém-capturado (chamado pelo capturar_tela; retorna na hora)."""
+        agora = time.time()
+        if not self.ativa or agora - self._ultimo < self.intervalo:
+            return
+        self._ultimo = agora
+        self._iniciar()
+        try:
+            self._fila.put_nowait((agora, frame, region))
+        except queue.Full:
+            pass  # A thread está atrasada: perder um frame é melhor que segurar a automação
+
+    def registrar_agora(self, frame: np.ndarray, region: tuple = None):
+        """
+        Grava o frame no buffer já, na thread de quem chama (ex.: o frame do
+        erro, logo antes do congelar()). Os frames ainda na fila entram antes.
+        """
+        if not self.ativa:
+            return
+        with self._lock_tela:
+            while True:
+                try:
+                    self._acumular(*self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            self._ultimo = time.time()
+            self._acumular(self._ultimo, frame, region)
+
+    def _worker(self):
+        while True:
+            try:
+                item = self._fila.get(timeout=self.captura_ociosa or None)
+            except queue.Empty:
+                item = self._capturar()
+                if item is None:
+                    continue
+            try:
+                with self._lock_tela:
+                    self._acumular(*item)
+            except Exception as e:
+                logging.debug(f"Caixa-preta: frame ignorado ({e}).")
+
+    def _capturar(self):
+        """Captura própria quando a automação fica um tempo sem capturar a tela."""
+        if not self.ativa:
+            return None
+        from screen_capture import get_backend  # Import tardio: screen_capture importa este módulo
+        try:
+            return time.time(), get_backend().peek(), None
+        except Exception as e:
+            logging.debug(f"Caixa-preta: falha na captura própria ({e}).")
+            return None
+
+    def _criar_tela(self, frame: np.ndarray, region: tuple):
+        if region is None:
+            altura, largura = frame.shape[:2]
+        else:
+            from screen_capture import get_backend
+            largura, altura = get_backend().size()
+        self._escala = min(1.0, self.lado_maximo / max(largura, altura)) if self.lado_maximo else 1.0
+        self._tela = np.zeros((max(1, round(altura * self._escala)), max(1, round(largura * self._escala)), 3), dtype=np.uint8)
+        capacidade = max(1, min(int(self.segundos / self.intervalo) + 1, self.max_bytes // self._tela.nbytes))
+        self._frames = deque(maxlen=capacidade)
+        logging.debug(f"Caixa-preta: {capacidade} frames de {self._tela.shape[1]}x{self._tela.shape[0]} "
+                      f"(~{capacidade * self._tela.nbytes / 1024 / 1024:.0f} MB).")
+
+    def _acumular(self, instante: float, frame: np.ndarray, region: tuple):
+        if self._tela is None:
+            self._criar_tela(frame, region)
+        left, top = (int(region[0]), int(region[1])) if region else (0, 0)
+        x0, y0 = round(left * self._escala), round(top * self._escala)
+        largura = max(1, round(frame.shape[1] * self._escala))
+        altura = max(1, round(frame.shape[0] * self._escala))
+        if (largura, altura) != (frame.shape[1], frame.shape[0]):
+            frame = cv2.resize(frame, (largura, altura), interpolation=cv2.INTER_AREA)
+        # Recorta o que cair fora da tela (regiões parcialmente fora)
+        fx0, fy0 = max(0, -x0), max(0, -y0)
+        x0, y0 = max(0, x0), max(0, y0)
+        x1 = min(self._tela.shape[1], x0 + frame.shape[1] - fx0)
+        y1 = min(self._tela.shape[0], y0 + frame.shape[0] - fy0)
+        if x1 <= x0 or y1 <= y0:
+            return
+        self._tela[y0:y1, x0:x1] = frame[fy0:fy0 + y1 - y0, fx0:fx0 + x1 - x0]
+        with self._lock:
+            self._frames.append((instante, self._tela.copy()))
+
+    def congelar(self) -> list:
+        """Retorna uma cópia dos frames dos últimos BLACKBOX_SECONDS seg.: [(timestamp, frame BGR)]."""
+        with self._lock:
+            frames = list(self._frames or [])
+        limite = time.time() - self.segundos
+        return [(instante, frame) for instante, frame in frames if instante >= limite]
+
+# --- 2. Gravação da Sequência ---
+def extensao_caixa_preta(formato: str = BLACKBOX_FORMAT) -> str:
+    """'.gif' para animação; '' para uma pasta com a sequência de JPEGs."""
+    if formato == 'gif':
+        return '.gif'
+    if formato == 'jpg':
+        return ''
+    raise ValueError(f"BLACKBOX_FORMAT inválido: '{formato}' (use 'gif' ou 'jpg').")
+
+def salvar_sequencia(frames: list, caminho: str, formato: str = BLACKBOX_FORMAT):
+    """
+    Grava os frames [(timestamp, frame BGR)] como GIF animado (com o tempo real
+    entre os frames) ou como uma pasta de JPEGs numerados. Cada frame recebe
+    no canto o tempo relativo ao último ("-3.5s").
+    """
+    from screen_capture import salvar_frame
+    fim = frames[-1][0]
+    marcados = []
+    for instante, frame in frames:
+        frame = frame.copy()
+        cv2.putText(frame, f"{instante - fim:+.1f}s", (8, 24), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 3, cv2.LINE_AA)
+        cv2.putText(frame, f"{instante - fim:+.1f}s", (8, 24), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 1, cv2.LINE_AA)
+        marcados.append(frame)
+
+    if formato == 'jpg':
+        os.makedirs(caminho, exist_ok=True)
+        for i, ((instante, _), frame) in enumerate(zip(frames, marcados)):
+            salvar_frame(frame, os.path.join(caminho, f"{i:03d}_{instante - fim:+.1f}s.jpg"), [cv2.IMWRITE_JPEG_QUALITY, 80])
+        return
+
+    from PIL import Image
+    imagens = [Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)) for frame in marcados]
+    instantes = [instante for instante, _ in frames]
+    # Duração de cada frame = tempo até o próximo; o último fica 1s na tela
+    duracoes = [max(20, int((b - a) * 1000)) for a, b in zip(instantes, instantes[1:])] + [1000]
+    imagens[0].save(caminho, save_all=True, append_images=imagens[1:], duration=duracoes, loop=0, optimize=True)
+
+# Instância única alimentada pelo screen_capture.capturar_tela
+caixa_preta = CaixaPreta()
@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import argparse
+import threading
+from datetime import datetime
+
+import cv2
+
+from config import (
+    CLICK_HISTORY_DIR, CLICK_HISTORY_FORMAT, CLICK_HISTORY_QUEUE_SIZE,
+    CLICK_HISTORY_QUEUE_POLICY, CLICK_HISTORY_FLUSH_TIMEOUT,
+    CLICK_HISTORY_SEGMENT_MB, CLICK_HISTORY_MAX_MB, CLICK_HISTORY_MAX_AGE_HOURS
+)
+from screen_capture import salvar_frame
+
+SEGMENT_PREFIX = "segment_"
+SEGMENT_DATA_EXT = ".dat"
+SEGMENT_INDEX_EXT = ".idx"
+
+# --- 1. Arquivo Compacto de Histórico (Segmentos) ---
+class ClickHistoryArchive:
+    """
+    Histórico de cliques em formato append-only, em vez de um PNG por clique.
+
+    Cada segmento é um par de arquivos:
+    - segment_<timestamp>.dat: os PNGs dos recortes, concatenados;
+    - segment_<timestamp>.idx: uma linha JSON por clique (timestamp, label,
+      x, y, offset e tamanho dentro do .dat).
+
+    Quando o segmento atual passa de CLICK_HISTORY_SEGMENT_MB, um novo é
+    aberto e os segmentos mais antigos são apagados enquanto o total passar de
+    CLICK_HISTORY_MAX_MB ou forem mais velhos que CLICK_HISTORY_MAX_AGE_HOURS.
+
+    Não é thread-safe: só a thread do ClickHistoryWriter escreve aqui.
+    """
+    def __init__(self,
+                 diretorio: str = CLICK_HISTORY_DIR,
+                 segmento_mb: float = CLICK_HISTORY_SEGMENT_MB,
+                 max_mb: float = CLICK_HISTORY_MAX_MB,
+                 max_idade_horas: float = CLICK_HISTORY_MAX_AGE_HOURS):
+        self.diretorio = diretorio
+        self.segmento_bytes = int(segmento_mb * 1024 * 1024)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_idade_seg = max_idade_horas * 3600
+        self._dados = None
+        self._indice = None
+        self._offset = 0
+
+    def adicionar(self, png: bytes, timestamp: float, label: str, x: int, y: int):
+        """Acrescenta um recorte (já codificado) ao segmento atual."""
+        if self._dados is None or self._offset >= self.segmento_bytes:
+            self._novo_segmento()
+        self._dados.write(png)
+        self._dados.flush()
+        registro = {
+            "ts": timestamp, "label": label, "x": x, "y": y,
+            "offset": self._offset, "length": len(png)
+        }
+        self._indice.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        self._indice.flush()
+        self._offset += len(png)
+
+    def _novo_segmento(self):
+        self.fechar()
+        os.makedirs(self.diretorio, exist_ok=True)
+        nome = SEGMENT_PREFIX + datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        base = os.path.join(self.diretorio, nome)
+        self._dados = open(base + SEGMENT_DATA_EXT, "ab")
+        self._indice = open(base + SEGMENT_INDEX_EXT, "a", encoding="utf-8")
+        self._offset = self._dados.tell()
+        self._aplicar_orcamento(manter=nome)
+
+    def _aplicar_orcamento(self, manter: str):
+        """Apaga os segmentos mais antigos que estourem o limite de tamanho ou de idade."""
+        segmentos = listar_segmentos(self.diretorio)
+        total = sum(_tamanho_segmento(base) for base in segmentos)
+        agora = time.time()
+        for base in segmentos:
+            if os.path.basename(base) == manter:
+                break
+            velho = agora - os.path.getmtime(base + SEGMENT_DATA_EXT) > self.max_idade_seg
+            if total <= self.max_bytes and not velho:
+                break
+            total -= _tamanho_segmento(base)
+            for ext in (SEGMENT_DATA_EXT, SEGMENT_INDEX_EXT):
+                try:
+                    os.remove(base + ext)
+                except OSError as e:
+                    logging.warning(f"Falha ao remover segmento antigo do histórico '{base}{ext}': {e}")
+            logging.debug(f"Segmento antigo do histórico de cliques removido: {base}")
+
+    def fechar(self):
+        for arquivo in (self._dados, self._indice):
+            if arquivo is not None:
+                arquivo.close()
+        self._dados = None
+        self._indice = None
+        self._offset = 0
+
+def listar_segmentos(diretorio: str = CLICK_HISTORY_DIR) -> list:
+    """Caminhos-base (sem extensão) dos segmentos, do mais antigo ao mais novo."""
+    if not os.path.isdir(diretorio):
+        return []
+    nomes = sorted(
+        f[:-len(SEGMENT_DATA_EXT)] for f in os.listdir(diretorio)
+        if f.startswith(SEGMENT_PREFIX) and f.endswith(SEGMENT_DATA_EXT)
+    )
+    return [os.path.join(diretorio, n) for n in nomes]
+
+def _tamanho_segmento(base: str) -> int:
+    return sum(
+        os.path.getsize(base + ext) for ext in (SEGMENT_DATA_EXT, SEGMENT_INDEX_EXT)
+        if os.path.exists(base + ext)
+    )
+
+# --- 2. Leitura do Histórico ---
+def ler_historico(inicio: datetime = None,
+                  fim: datetime = None,
+                  label: str = None,
+                  diretorio: str = CLICK_HISTORY_DIR):
+    """
+    Percorre o histórico compactado e gera os cliques que batem com o filtro.
+
+    'inicio'/'fim' delimitam a janela de tempo e 'label' filtra por trecho do
+    texto do clique (sem diferenciar maiúsculas). Cada item é um dict com
+    'timestamp' (datetime), 'label', 'x', 'y' e 'png' (bytes da imagem).
+    """
+    ts_inicio = inicio.timestamp() if inicio else None
+    ts_fim = fim.timestamp() if fim else None
+    filtro_label = label.lower() if label else None
+
+    for base in listar_segmentos(diretorio):
+        if not os.path.exists(base + SEGMENT_INDEX_EXT):
+            continue
+        with open(base + SEGMENT_INDEX_EXT, "r", encoding="utf-8") as idx, open(base + SEGMENT_DATA_EXT, "rb") as dados:
+            for linha in idx:
+                try:
+                    registro = json.loads(linha)
+                except json.JSONDecodeError:
+                    continue  # Última linha incompleta (execução interrompida)
+                if ts_inicio is not None and registro["ts"] < ts_inicio:
+                    continue
+                if ts_fim is not None and registro["ts"] > ts_fim:
+                    continue
+                if filtro_label and filtro_label not in registro["label"].lower():
+                    continue
+                dados.seek(registro["offset"])
+                yield {
+                    "timestamp": datetime.fromtimestamp(registro["ts"]),
+                    "label": registro["label"],
+                    "x": registro["x"],
+                    "y": registro["y"],
+                    "png": dados.read(registro["length"]),
+                }
+
+def exportar_historico(destino: str, **filtros) -> int:
+    """Extrai para 'destino' (um PNG por clique) os recortes que batem com os filtros de ler_historico."""
+    os.makedirs(destino, exist_ok=True)
+    total = 0
+    for item in ler_historico(**filtros):
+        nome = f"{item['timestamp'].strftime('%Y%m%d_%H%M%S_%f')}_{_nome_seguro(item['label'])}_{item['x']}x{item['y']}.png"
+        with open(os.path.join(destino, nome), "wb") as f:
+            f.write(item["png"])
+        total += 1
+    return total
+
+def _nome_seguro(texto: str) -> str:
+    return "".join(c for c in texto if c.isalnum() or c in (' ', '_')).rstrip()
+
+# --- 3. Gravação Assíncrona ---
+class ClickHistoryWriter:
+    """
+    Gravador assíncrono do histórico de cliques.
+
+    O recorte da tela é feito na hora do clique (em memória) e entregue a esta
+    fila; uma thread em segundo plano faz o encode e a escrita em disco, então
+    o clique nunca espera pelo disco.
+
+    Quando a fila enche, a política define o comportamento:
+    - 'drop': descarta o recorte (e conta em 'descartados');
+    - 'block': o clique espera uma vaga na fila.
+
+    O formato em disco vem de CLICK_HISTORY_FORMAT: 'arquivo' (segmentos
+    compactos, ver ClickHistoryArchive) ou 'png' (um arquivo por clique).
+    """
+    def __init__(self,
+                 max_fila: int = CLICK_HISTORY_QUEUE_SIZE,
+                 politica: str = CLICK_HISTORY_QUEUE_POLICY,
+                 formato: str = CLICK_HISTORY_FORMAT):
+        if politica not in ('drop', 'block'):
+            raise ValueError(f"Política de fila inválida: '{politica}' (use 'drop' ou 'block').")
+        if formato not in ('arquivo', 'png'):
+            raise ValueError(f"Formato de histórico inválido: '{formato}' (use 'arquivo' ou 'png').")
+        self.politica = politica
+        self.formato = formato
+        self.gravados = 0
+        self.descartados = 0
+        self.falhas = 0
+        self._arquivo = ClickHistoryArchive() if formato == 'arquivo' else None
+        self._fila = queue.Queue(maxsize=max_fila)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _iniciar(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name="ClickHistoryWriter", daemon=True)
+                self._thread.start()
+
+    def enviar(self, frame, label: str, x: int, y: int):
+        """Enfileira um recorte (array BGR) do clique em (x, y)."""
+        self._iniciar()
+        item = (frame, time.time(), label, x, y)
+        if self.politica == 'block':
+            self._fila.put(item)
+            return
+        try:
+            self._fila.put_nowait(item)
+        except queue.Full:
+            self.descartados += 1
+            logging.debug(f"Fila do histórico de cliques cheia. Recorte descartado: '{label}'")
+
+    def _worker(self):
+        while True:
+            frame, timestamp, label, x, y = self._fila.get()
+            try:
+                self._gravar(frame, timestamp, label, x, y)
+                self.gravados += 1
+            except Exception as e:
+                self.falhas += 1
+                logging.warning(f"Falha ao gravar histórico do clique '{label}': {e}")
+            finally:
+                self._fila.task_done()
+
+    def _gravar(self, frame, timestamp: float, label: str, x: int, y: int):
+        if self._arquivo is not None:
+            ok, png = cv2.imencode(".png", frame)
+            if not ok:
+                raise IOError("Falha ao codificar o recorte em PNG.")
+            self._arquivo.adicionar(png.tobytes(), timestamp, label, x, y)
+            logging.debug(f"Histórico de clique arquivado: '{label}' em ({x}, {y})")
+            return
+        nome = f"{datetime.fromtimestamp(timestamp).strftime('%Y%m%d_%H%M%S')}_{_nome_seguro(label)}_{x}x{y}.png"
+        filepath = os.path.join(CLICK_HISTORY_DIR, nome)
+        salvar_frame(frame, filepath)
+        logging.debug(f"Histórico de clique salvo: {filepath}")
+
+    def flush(self, timeout: float = CLICK_HISTORY_FLUSH_TIMEOUT) -> bool:
+        """Espera (no máx. 'timeout' seg.) a fila esvaziar. Retorna True se tudo foi gravado."""
+        limite = time.time() + timeout
+        with self._fila.all_tasks_done:
+            while self._fila.unfinished_tasks:
+                restante = limite - time.time()
+                if restante <= 0:
+                    logging.warning(f"Histórico de cliques: {self._fila.unfinished_tasks} recortes não gravados (timeout do flush).")
+                    return False
+                self._fila.all_tasks_done.wait(restante)
+        if self.descartados:
+            logging.info(f"Histórico de cliques: {self.gravados} gravados, {self.descartados} descartados (fila cheia).")
+        return True
+
+# Instância única usada pelo safe_click
+click_history_writer = ClickHistoryWriter()
+atexit.register(click_history_writer.flush)
+
+def flush_click_history(timeout: float = CLICK_HISTORY_FLUSH_TIMEOUT) -> bool:
+    """Garante que os recortes pendentes do histórico de cliques foram gravados."""
+    return click_history_writer.flush(timeout)
+
+# --- 4. Ferramenta de Linha de Comando (extração de recortes) ---
+def main():
+    parser = argparse.ArgumentParser(description="Extrai recortes do histórico de cliques compactado.")
+    parser.add_argument("destino", help="Pasta onde os PNGs serão salvos.")
+    parser.add_argument("--desde", help="Início da janela (ex: '2024-05-01 14:00').")
+    parser.add_argument("--ate", help="Fim da janela (ex: '2024-05-01 14:30').")
+    parser.add_argument("--label", help="Trecho do texto do clique (ex: 'salvar').")
+    args = parser.parse_args()
+
+    total = exportar_historico(
+        args.destino,
+        inicio=datetime.fromisoformat(args.desde) if args.desde else None,
+        fim=datetime.fromisoformat(args.ate) if args.ate else None,
+        label=args.label,
+    )
+    print(f"{total} recortes extraídos para: {args.destino}")
+
+if __name__ == "__main__":
+    main()
@@ -5,29 +5,155 @@ import logging
 GLOBAL_PAUSE = 0.4
 ENABLE_FAILSAFE = True
 
+# --- Execução Paralela (definido pelo parallel_runner.py em cada worker) ---
+WORKER_ID = os.getenv('RPA_WORKER_ID') # None = execução normal (um único processo)
+WORKER_DISPLAY = os.getenv('RPA_DISPLAY') # Display X do worker (ex: ':101')
+WORKER_SUFFIX = f'worker_{WORKER_ID}' if WORKER_ID else ''
+
 # --- Configurações de Paths (Caminhos) ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 IMAGE_DIR = os.path.join(BASE_DIR, 'images')
 LOG_DIR = os.path.join(BASE_DIR, 'logs')
-CLICK_HISTORY_DIR = os.path.join(BASE_DIR, 'click_history')
-ERROR_DIR = os.path.join(BASE_DIR, 'error_screenshots')
+CLICK_HISTORY_DIR = os.path.join(BASE_DIR, 'click_history', WORKER_SUFFIX) if WORKER_ID else os.path.join(BASE_DIR, 'click_history')
+ERROR_DIR = os.path.join(BASE_DIR, 'error_screenshots', WORKER_SUFFIX) if WORKER_ID else os.path.join(BASE_DIR, 'error_screenshots')
 COORDINATE_MAP_FILE = os.path.join(BASE_DIR, 'coordinates.json')
 
 # --- Configuração de Logging (Sua "Base de Logging") ---
-LOG_FILE_NAME = 'automation.log'
+LOG_FILE_NAME = f'automation_{WORKER_SUFFIX}.log' if WORKER_ID else 'automation.log'
 LOG_FILE = os.path.join(LOG_DIR, LOG_FILE_NAME)
 LOG_LEVEL = logging.INFO # Mude para logging.DEBUG para logs mais detalhados
+LOG_ROTATION = 'tamanho' # 'tamanho' (LOG_MAX_MB), 'tempo' (LOG_ROTATION_WHEN) ou None (arquivo cresce sem limite)
+LOG_MAX_MB = 20 # Tamanho máx. do arquivo de log antes de rotacionar
+LOG_ROTATION_WHEN = 'midnight' # Na rotação por tempo: 'midnight', 'H' (a cada hora)...
+LOG_BACKUP_COUNT = 5 # Arquivos antigos mantidos (automation.log.1, .2...)
+LOG_DEBUG_MAX_PER_SEC = 2 # Máx. de mensagens DEBUG por seg. vindas da mesma linha de código (0 = sem limite)
+LOG_RING_BUFFER_SIZE = 200 # Últimos registros mantidos em memória (usados nas notificações de erro)
 
 # --- Configurações do Histórico de Cliques ---
 ENABLE_CLICK_HISTORY = True
 CLICK_CAPTURE_PADDING = 50 
+CLICK_HISTORY_QUEUE_SIZE = 256 # Recortes aguardando gravação em segundo plano
+CLICK_HISTORY_QUEUE_POLICY = 'drop' # Fila cheia: 'drop' (descarta o recorte) ou 'block' (clique espera)
+CLICK_HISTORY_FLUSH_TIMEOUT = 10 # Máx. de seg. esperando a fila esvaziar no fim da execução
+CLICK_HISTORY_FORMAT = 'arquivo' # 'arquivo' (segmentos compactos + índice) ou 'png' (um arquivo por clique)
+CLICK_HISTORY_SEGMENT_MB = 8 # Tamanho de cada segmento antes de abrir o próximo
+CLICK_HISTORY_MAX_MB = 200 # Orçamento total do histórico; os segmentos mais antigos são apagados
+CLICK_HISTORY_MAX_AGE_HOURS = 72 # Segmentos mais velhos que isso também são apagados
+
+# --- Configurações das Evidências de Erro (salvar_screenshot_erro) ---
+ERROR_SCREENSHOT_FORMAT = 'jpg' # 'png' (sem perdas, bem maior), 'jpg' ou 'webp'
+ERROR_SCREENSHOT_QUALITY = 85 # Qualidade (0-100) para 'jpg' e 'webp'
+ERROR_SCREENSHOT_MAX_SIDE = 1920 # Lado maior (px) da imagem gravada; None = tamanho original
+ERROR_EVIDENCE_TIMEOUT = 10 # Máx. de seg. esperando as evidências serem gravadas (envio ao Telegram / saída)
+
+# --- Configurações da Caixa-Preta (últimos segundos de tela antes do erro) ---
+BLACKBOX_ENABLED = True # Guarda em memória os frames que a automação já captura
+BLACKBOX_SECONDS = 10 # Quantos seg. antes do erro são mantidos
+BLACKBOX_FPS = 2 # Máx. de frames guardados por segundo (os demais são ignorados)
+BLACKBOX_MAX_SIDE = 960 # Lado maior (px) dos frames guardados
+BLACKBOX_MAX_MB = 48 # Teto de memória do buffer (reduz a quantidade de frames se preciso)
+BLACKBOX_IDLE_CAPTURE = 1.0 # Seg. sem nenhuma captura até a caixa-preta capturar sozinha (fluxos só de teclado); 0 = nunca
+BLACKBOX_FORMAT = 'gif' # 'gif' (animação) ou 'jpg' (pasta com a sequência de frames)
 
 # --- Configurações de Notificação ---
 TELEGRAM_ENABLED = True # Mude para False para desabilitar globalmente
 TELEGRAM_NOTIFICATION_TITLE = "Alerta de Automação RPA" # Título da notificação
+TELEGRAM_API_BASE = 'https://api.telegram.org' # Endereço da API (TELEGRAM_API_BASE no .env tem prioridade; útil p/ servidor local de testes)
+TELEGRAM_QUEUE_SIZE = 20 # Notificações aguardando envio em segundo plano
+TELEGRAM_TIMEOUT = (3.05, 15) # Timeout (conexão, leitura) em seg. de cada chamada à API
+TELEGRAM_MAX_RETRIES = 3 # Tentativas por chamada (erros de rede, 5xx e 429)
+TELEGRAM_BACKOFF = 1.0 # Espera (seg.) antes da 2ª tentativa; dobra a cada nova tentativa
+TELEGRAM_MIN_INTERVAL = 1.0 # Intervalo mínimo entre chamadas (o Telegram limita ~1 msg/s por chat)
+TELEGRAM_IMAGE_MAX_SIDE = 1600 # Screenshots maiores são reduzidas antes do upload
+TELEGRAM_IMAGE_QUALITY = 85 # Qualidade JPEG das imagens enviadas
+TELEGRAM_FLUSH_TIMEOUT = 15 # Máx. de seg. esperando envios pendentes no fim da execução
 
 # --- Configurações de Reconhecimento de Imagem ---
 DEFAULT_CONFIDENCE = 0.9
 DEFAULT_WAIT_TIMEOUT = 30
 DEFAULT_GRAYSCALE = True
-DEFAULT_DISAPPEAR_STABILITY = 0.5 # <-- ADICIONE ESTA LINHA (Tempo em seg. para confirmar que a imagem sumiu)
\ No newline at end of file
+DEFAULT_DISAPPEAR_STABILITY = 0.5 # <-- ADICIONE ESTA LINHA (Tempo em seg. para confirmar que a imagem sumiu)
+DISAPPEAR_LOCAL_CHECK = True # Ao esperar sumir, observa só o retângulo onde a imagem foi vista (busca ampla só se ela sair dali)
+DISAPPEAR_BOX_MARGIN = 8 # Margem (px) ao redor desse retângulo (tolera pequenos deslocamentos)
+TEMPLATE_CACHE_SIZE = 64 # Máx. de templates decodificados mantidos em memória (LRU)
+
+# --- Configurações do Polling (Loops de Espera) ---
+POLL_MIN_INTERVAL = 0.05 # Intervalo (seg.) logo após uma ação ou mudança na tela
+POLL_MAX_INTERVAL = 0.5 # Intervalo máximo enquanto a tela está parada
+POLL_BACKOFF = 1.5 # Fator de crescimento do intervalo enquanto nada muda
+POLL_FAST_WINDOW = 1.0 # Seg. após clique/digitação em que o polling fica no intervalo mínimo
+
+# --- Configurações da Busca de Imagem (Template Matching) ---
+DEFAULT_MATCH_MODE = 'normal' # 'normal' ou 'piramide' (coarse-to-fine, recomendado em telas 2K/4K)
+PYRAMID_MAX_LEVELS = 2 # Máx. de reduções pela metade (2 = busca grossa em 1/4 da resolução)
+PYRAMID_MIN_TEMPLATE_SIDE = 12 # Menor lado (px) que o template pode ter na escala reduzida
+PYRAMID_COARSE_SLACK = 0.15 # Tolerância extra de confiança na busca grossa
+PYRAMID_CANDIDATES = 16 # Máx. de picos da busca grossa confirmados em resolução cheia
+PYRAMID_CONFIRM_MARGIN = 4 # Margem (px) da janela de confirmação em resolução cheia
+PYRAMID_FALLBACK_EVERY = 5 # Sem candidato confirmado, busca cheia só a cada N tentativas do mesmo template
+FIND_ALL_MAX_RESULTS = 200 # Máx. de ocorrências retornadas por localizar_todas (as de maior score)
+FIND_ALL_OVERLAP = 0.3 # Sobreposição (IoU) acima da qual duas ocorrências contam como a mesma
+
+# --- Configurações do Índice de Localizações (Hot-spots) ---
+ENABLE_LOCATION_INDEX = True # Procura primeiro onde o template já apareceu antes
+LOCATION_INDEX_BASE_FILE = os.path.join(BASE_DIR, 'locations.json') # Fica ao lado do coordinates.json
+LOCATION_INDEX_FILE = os.path.join(BASE_DIR, f'locations_{WORKER_SUFFIX}.json') if WORKER_ID else LOCATION_INDEX_BASE_FILE # Cada worker grava o seu (começando do base)
+HOTSPOT_PADDING = 40 # Margem (px) ao redor do hot-spot na busca rápida
+HOTSPOT_MAX_PER_TEMPLATE = 3 # Máx. de hot-spots guardados por template
+HOTSPOT_SAVE_INTERVAL = 5 # Intervalo mínimo (seg.) entre gravações do índice em disco
+
+# --- Configurações de Captura de Tela ---
+CAPTURE_BACKEND = 'pyautogui' # 'pyautogui', 'mss' (rápido, requer 'pip install mss') ou 'fake' (testes sem tela)
+FAKE_CAPTURE_SOURCE = None # Para o backend 'fake': arquivo ou pasta de imagens servidas como "tela"
+
+# --- Configurações de Digitação (type_text) ---
+DEFAULT_TYPE_MODE = 'teclas' # 'teclas' (uma por vez), 'lote' (sem intervalo) ou 'colar' (área de transferência)
+TYPE_INTERVAL = 0.05 # Intervalo entre teclas no modo 'teclas'
+DEFAULT_TYPE_VERIFY = False # Relê o campo (Ctrl+A, Ctrl+C) após digitar e confere o texto
+TYPE_PASTE_SETTLE = 0.05 # Seg. aguardando o app ler a área de transferência (modos 'colar'/verificação)
+
+# --- Configurações de Ritmo (Pacing) das Ações ---
+PACING_MODE = 'fixo' # 'fixo' (GLOBAL_PAUSE após cada ação) ou 'estabilidade' (espera só até a tela parar de mudar)
+PACING_STABLE_WINDOW = 0.15 # Seg. sem mudança na tela para considerá-la pronta
+PACING_MAX_WAIT = 3.0 # Limite (seg.) de espera por estabilidade após uma ação
+PACING_MIN_WAIT = 0.05 # Espera mínima após a ação, antes de começar a comparar
+PACING_SAMPLE_INTERVAL = 0.03 # Intervalo entre capturas durante a espera
+PACING_REGION = None # Região (left, top, width, height) observada por padrão; None = tela cheia
+
+# --- Configurações do Fluxo Declarativo (workflow.py) ---
+WORKFLOW_OVERLAP_WAITS = True # Começa a espera do próximo passo enquanto a ação atual estabiliza (só com PACING_MODE='estabilidade')
+
+# --- Configurações da Planilha de Entrada ---
+ROW_SOURCE_CHUNK_SIZE = 500 # Linhas lidas e normalizadas por bloco (streaming)
+
+# --- Configurações do Diário de Progresso (Retomada) ---
+PROGRESS_JOURNAL_FILE = os.path.join(LOG_DIR, f'progress_journal_{WORKER_SUFFIX}.jsonl' if WORKER_ID else 'progress_journal.jsonl')
+JOURNAL_MAX_ATTEMPTS = 3 # Tentativas por linha (somando execuções) antes de desistir dela
+JOURNAL_FSYNC_EVERY = 20 # fsync a cada N registros...
+JOURNAL_FSYNC_INTERVAL = 5 # ...ou a cada N segundos, o que vier primeiro
+
+# --- Configurações da Execução Paralela (parallel_runner.py) ---
+PARALLEL_WORKERS = 4 # Nº de workers, cada um com seu próprio display virtual
+XVFB_FIRST_DISPLAY = 101 # Displays usados: :101, :102, ... (um display já em uso é pulado)
+XVFB_RESOLUTION = '1920x1080x24' # Resolução/profundidade de cada Xvfb
+PARALLEL_REPORT_FILE = os.path.join(LOG_DIR, 'parallel_report.json') # Relatório consolidado
+
+# --- Configurações de Rastreamento (Tracing) ---
+TRACE_ENABLED = False # Grava um span por chamada dos helpers (tempo de captura, matching, pausas...)
+TRACE_FILE = os.path.join(LOG_DIR, f'trace_{WORKER_SUFFIX}.jsonl' if WORKER_ID else 'trace.jsonl')
+TRACE_CHROME_EXPORT = True # No fim da execução, converte o trace para o formato Chrome (chrome://tracing)
+
+# --- Configurações do Relatório de Performance (PerformanceTimer) ---
+PERF_HISTORY_FILE = os.path.join(BASE_DIR, f'performance_history_{WORKER_SUFFIX}.jsonl' if WORKER_ID else 'performance_history.jsonl') # Fora de logs/: sobrevive ao clear.py
+PERF_ETA_WINDOW = 20 # Últimas N iterações usadas para estimar o tempo restante (ETA)
+PERF_BASELINE_RUNS = 10 # Nº de execuções anteriores usadas como referência
+PERF_MIN_LAPS = 5 # Execuções com menos iterações não entram na referência (nem são avaliadas)
+PERF_REGRESSION_THRESHOLD = 0.2 # Alerta se a mediana por iteração piorar mais que 20% em relação à referência
+
+# --- Configurações do Benchmark (benchmark.py) ---
+BENCHMARK_RESOLUTIONS = [(1280, 720), (1920, 1080), (2560, 1440)] # Telas sintéticas geradas
+BENCHMARK_REPEAT = 10 # Repetições por caso (o resultado usa a mediana)
+BENCHMARK_RESULTS_FILE = os.path.join(LOG_DIR, 'benchmark_results.json') # Resultado da última rodada
+BENCHMARK_BASELINE_FILE = os.path.join(BASE_DIR, 'benchmark_baseline.json') # Referência salva com --salvar-baseline
+BENCHMARK_REGRESSION_THRESHOLD = 0.25 # Caso 25% mais lento que a referência = regressão
+BENCHMARK_MIN_DIFF_MS = 0.5 # Diferenças menores que isso (ms) são ruído e nunca contam como regressão
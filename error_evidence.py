@@ -0,0 +1,106 @@
+import time
+import queue
+import atexit
+import logging
+import threading
+
+import cv2
+
+from config import (
+    ERROR_SCREENSHOT_FORMAT, ERROR_SCREENSHOT_QUALITY, ERROR_SCREENSHOT_MAX_SIDE,
+    ERROR_EVIDENCE_TIMEOUT
+)
+from screen_capture import salvar_frame
+
+# Parâmetros do cv2.imencode por formato ('qualidade' vai de 0 a 100)
+_PARAMS_FORMATO = {
+    'png': lambda qualidade: [cv2.IMWRITE_PNG_COMPRESSION, 3],
+    'jpg': lambda qualidade: [cv2.IMWRITE_JPEG_QUALITY, qualidade],
+    'webp': lambda qualidade: [cv2.IMWRITE_WEBP_QUALITY, qualidade],
+}
+
+def extensao_evidencia(formato: str = ERROR_SCREENSHOT_FORMAT) -> str:
+    """Extensão dos arquivos de evidência ('.png', '.jpg' ou '.webp')."""
+    if formato not in _PARAMS_FORMATO:
+        raise ValueError(f"Formato de evidência inválido: '{formato}' (use {list(_PARAMS_FORMATO)}).")
+    return f".{formato}"
+
+class GravadorEvidencias:
+    """
+    Grava as evidências de erro (screenshots) em segundo plano.
+
+    Quem chama entrega o frame já capturado (array BGR) e o caminho final;
+    a redução (ERROR_SCREENSHOT_MAX_SIDE), o encode e a escrita acontecem
+    nesta thread. enviar_tarefa() aceita outras gravações (ex.: a sequência
+    da caixa-preta). aguardar(caminhos) bloqueia só até aqueles arquivos
+    existirem (usado pelo Telegram antes de ler as imagens).
+    """
+    def __init__(self,
+                 formato: str = ERROR_SCREENSHOT_FORMAT,
+                 qualidade: int = ERROR_SCREENSHOT_QUALITY,
+                 lado_maximo: int = ERROR_SCREENSHOT_MAX_SIDE):
+        extensao_evidencia(formato)  # Valida o formato já na criação
+        self.formato = formato
+        self.params = _PARAMS_FORMATO[formato](qualidade)
+        self.lado_maximo = lado_maximo
+        self._fila = queue.Queue()
+        self._pendentes = set()
+        self._condicao = threading.Condition()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _iniciar(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name="GravadorEvidencias", daemon=True)
+                self._thread.start()
+
+    def enviar(self, frame, caminho: str, descricao: str = "Screenshot de erro"):
+        """Enfileira a gravação de 'frame' em 'caminho' (retorna na hora)."""
+        self.enviar_tarefa(lambda: self._gravar_frame(frame, caminho), caminho, descricao)
+
+    def enviar_tarefa(self, gravar, caminho: str, descricao: str):
+        """Enfileira uma gravação qualquer: 'gravar()' deve criar 'caminho'."""
+        self._iniciar()
+        with self._condicao:
+            self._pendentes.add(caminho)
+        self._fila.put((gravar, caminho, descricao))
+
+    def _gravar_frame(self, frame, caminho: str):
+        if self.lado_maximo:
+            escala = self.lado_maximo / max(frame.shape[:2])
+            if escala < 1:
+                frame = cv2.resize(frame, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+        salvar_frame(frame, caminho, self.params)
+
+    def _worker(self):
+        while True:
+            gravar, caminho, descricao = self._fila.get()
+            try:
+                gravar()
+                logging.info(f"{descricao} salvo como '{caminho}'.")
+            except Exception as e:
+                logging.error(f"Falha ao salvar {descricao.lower()} '{caminho}': {e}")
+            finally:
+                with self._condicao:
+                    self._pendentes.discard(caminho)
+                    self._condicao.notify_all()
+                self._fila.task_done()
+
+    def aguardar(self, caminhos: list = None, timeout: float = ERROR_EVIDENCE_TIMEOUT) -> bool:
+        """Espera até os 'caminhos' (padrão: todos os pendentes) serem gravados. True se deu tempo."""
+        limite = time.time() + timeout
+        with self._condicao:
+            while True:
+                faltando = self._pendentes if caminhos is None else self._pendentes.intersection(caminhos)
+                if not faltando:
+                    return True
+                restante = limite - time.time()
+                if restante <= 0:
+                    logging.warning(f"Evidências ainda não gravadas (timeout): {sorted(faltando)}")
+                    return False
+                self._condicao.wait(restante)
+
+# Instância única usada por reporting.salvar_screenshot_erro
+gravador_evidencias = GravadorEvidencias()
+atexit.register(gravador_evidencias.aguardar)
@@ -1,6 +1,5 @@
 import tkinter as tk
 from tkinter import simpledialog
-import pyautogui
 import os
 
 # Tenta carregar o path do config, mas define um fallback
@@ -12,6 +11,18 @@ except ImportError:
     if not os.path.exists(IMAGE_DIR):
         os.makedirs(IMAGE_DIR)
 
+# Usa o mesmo backend de captura da automação; sem ele, cai no pyautogui
+try:
+    from screen_capture import capturar_tela, salvar_frame
+except ImportError:
+    import pyautogui
+
+    def capturar_tela(region=None):
+        return pyautogui.screenshot(region=region)
+
+    def salvar_frame(frame, caminho):
+        frame.save(caminho)
+
 class RegionSelector:
     def __init__(self, root):
         self.root = root
@@ -75,7 +86,7 @@ class RegionSelector:
                 file_name += ".png"
             file_path = os.path.join(IMAGE_DIR, file_name)
             try:
-                pyautogui.screenshot(file_path, region=region)
+                salvar_frame(capturar_tela(region), file_path)
                 print(f"Sucesso! Imagem salva em: {file_path}")
             except Exception as e:
                 print(f"Erro ao salvar screenshot: {e}")
@@ -0,0 +1,367 @@
+import os
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from config import (
+    TEMPLATE_CACHE_SIZE, DEFAULT_MATCH_MODE, PYRAMID_MAX_LEVELS, 
+    PYRAMID_MIN_TEMPLATE_SIDE, PYRAMID_COARSE_SLACK, PYRAMID_CANDIDATES, 
+    PYRAMID_CONFIRM_MARGIN, PYRAMID_FALLBACK_EVERY, FIND_ALL_MAX_RESULTS, FIND_ALL_OVERLAP
+)
+from tracing import medir, maximo, somar
+
+# --- 1. Cache de Templates ---
+class TemplateCache:
+    """
+    Cache LRU de templates já decodificados.
+
+    Cada PNG é lido do disco, decodificado e convertido (cinza/escala) UMA vez
+    por execução. A chave é (caminho, grayscale, escala) e o mtime do arquivo
+    é conferido a cada consulta: se o template for recapturado durante a
+    execução, a entrada antiga é descartada e o arquivo é lido de novo.
+    """
+    def __init__(self, max_size: int = TEMPLATE_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, caminho: str, grayscale: bool = True, escala: float = 1.0) -> np.ndarray:
+        """Retorna o template como array NumPy (BGR ou cinza), decodificando só se necessário."""
+        caminho = os.path.abspath(caminho)
+        mtime = os.path.getmtime(caminho)  # Lança FileNotFoundError se não existir
+        chave = (caminho, bool(grayscale), float(escala))
+
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None and item[0] == mtime:
+                self._itens.move_to_end(chave)
+                self.hits += 1
+                return item[1]
+            self.misses += 1
+
+        imagem = _decodificar_imagem(caminho, grayscale)
+        if escala != 1.0:
+            largura = max(1, int(round(imagem.shape[1] * escala)))
+            altura = max(1, int(round(imagem.shape[0] * escala)))
+            imagem = cv2.resize(imagem, (largura, altura), interpolation=cv2.INTER_AREA)
+        imagem.setflags(write=False)  # Compartilhado entre chamadas: ninguém pode alterar
+
+        with self._lock:
+            self._itens[chave] = (mtime, imagem)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_size:
+                chave_antiga, _ = self._itens.popitem(last=False)
+                logging.debug(f"Template removido do cache (LRU): {chave_antiga[0]}")
+        logging.debug(f"Template carregado no cache: {caminho} (cinza={grayscale}, escala={escala})")
+        return imagem
+
+    def stats(self) -> dict:
+        """Retorna os contadores do cache (para log/diagnóstico)."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._itens),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+    def clear(self):
+        """Esvazia o cache e zera os contadores."""
+        with self._lock:
+            self._itens.clear()
+            self.hits = 0
+            self.misses = 0
+
+def _decodificar_imagem(caminho: str, grayscale: bool) -> np.ndarray:
+    """Lê a imagem do disco no formato usado pelo OpenCV (aceita caminhos com acento no Windows)."""
+    dados = np.fromfile(caminho, dtype=np.uint8)
+    flag = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+    imagem = cv2.imdecode(dados, flag)
+    if imagem is None:
+        raise IOError(f"Não foi possível decodificar a imagem: {caminho}")
+    return imagem
+
+# Instância única usada por todos os helpers de espera/clique
+template_cache = TemplateCache()
+
+# --- 2. Comparação em um Frame já Capturado ---
+def preparar_frame(frame: np.ndarray, grayscale: bool) -> np.ndarray:
+    """Converte o frame capturado (BGR) para o mesmo formato dos templates do cache."""
+    if grayscale and frame.ndim == 3:
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if not grayscale and frame.ndim == 2:
+        return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    return frame
+
+def localizar_no_frame(frame: np.ndarray,
+                       template: np.ndarray,
+                       confianca: float,
+                       region: tuple = None,
+                       origem: tuple = (0, 0)):
+    """
+    Procura o template dentro de um frame já capturado (sem nova captura de tela).
+
+    'frame' e 'template' devem estar no mesmo formato (ver preparar_frame).
+    'origem' é a posição (x, y) do canto superior esquerdo do frame na tela, e
+    'region' (left, top, width, height) está em coordenadas de TELA.
+
+    Retorna (left, top, width, height, score) em coordenadas de tela, ou None.
+    """
+    recorte, x0, y0 = _recortar(frame, region, origem)
+
+    altura, largura = template.shape[:2]
+    if recorte.shape[0] < altura or recorte.shape[1] < largura:
+        return None
+
+    resultado = cv2.matchTemplate(recorte, template, cv2.TM_CCOEFF_NORMED)
+    _, score, _, (mx, my) = cv2.minMaxLoc(resultado)
+    maximo("melhor_score", float(score))
+    if score < confianca:
+        return None
+    return (x0 + mx, y0 + my, largura, altura, float(score))
+
+def _recortar(frame: np.ndarray, region: tuple, origem: tuple):
+    """Recorta 'region' (coordenadas de tela) do frame. Retorna (recorte, x_tela, y_tela)."""
+    ox, oy = origem
+    if not region:
+        return frame, ox, oy
+    left, top, width, height = region
+    x0 = max(0, left - ox)
+    y0 = max(0, top - oy)
+    x1 = min(frame.shape[1], left - ox + width)
+    y1 = min(frame.shape[0], top - oy + height)
+    return frame[y0:y1, x0:x1], ox + x0, oy + y0
+
+# --- 3. Fingerprint Barato do Frame ---
+def fingerprint_frame(frame: np.ndarray) -> int:
+    """
+    Gera a 'impressão digital' do frame: um CRC32 de TODOS os pixels, em
+    resolução cheia. Dois frames com o mesmo fingerprint são tratados como
+    "tela não mudou". É sem perdas de propósito: um ícone de 24x24 ou um "OK"
+    pequeno que aparece precisa mudar o fingerprint (uma versão reduzida e
+    quantizada deixava passar essas mudanças). Custa poucos ms numa tela
+    1920x1080, bem menos que um template matching (e uma colisão rara é
+    coberta pela comparação forçada do AdaptivePoller).
+    """
+    return zlib.crc32(np.ascontiguousarray(frame).data)
+
+# --- 4. Busca em Pirâmide (Coarse-to-Fine) ---
+def niveis_piramide(template: np.ndarray, max_niveis: int = PYRAMID_MAX_LEVELS) -> int:
+    """Quantas vezes o template pode ser reduzido pela metade sem ficar pequeno demais."""
+    menor_lado = min(template.shape[:2])
+    niveis = 0
+    while niveis < max_niveis and (menor_lado >> (niveis + 1)) >= PYRAMID_MIN_TEMPLATE_SIDE:
+        niveis += 1
+    return niveis
+
+def localizar_piramide(frame: np.ndarray,
+                       template: np.ndarray,
+                       confianca: float,
+                       region: tuple = None,
+                       origem: tuple = (0, 0),
+                       template_reduzido: np.ndarray = None):
+    """
+    Busca coarse-to-fine: procura primeiro numa versão reduzida (1/2^n) do frame
+    e do template e só confirma o candidato em resolução cheia, numa janela
+    pequena ao redor dele. Mesmo retorno de localizar_no_frame.
+
+    Candidatos = picos locais da busca grossa (um por vizinhança de meio
+    template) acima de um piso que já desconta a perda da redução
+    (_perda_reducao), do maior para o menor, até PYRAMID_CANDIDATES. Se há
+    picos acima do piso mas nenhum se confirma, pode fazer uma busca normal
+    em resolução cheia: um template fora da grade da redução pode ficar longe
+    do topo da lista, e sem isso a espera numa tela parada nunca o acharia.
+    Como esse também é o caso comum de um template que ainda não apareceu
+    (a busca grossa sempre tem picos parecidos numa tela cheia), a busca
+    cheia é feita só na 1ª tentativa e depois uma a cada
+    PYRAMID_FALLBACK_EVERY, por template. Sem nenhum pico acima do piso, o
+    template não está lá.
+
+    'template_reduzido' pode vir pronto do TemplateCache (escala 1/2^n, ver
+    niveis_piramide); se não vier, é calculado aqui.
+    """
+    niveis = niveis_piramide(template)
+    if niveis == 0:
+        # Template pequeno demais para reduzir: busca normal
+        return localizar_no_frame(frame, template, confianca, region, origem)
+
+    fator = 1 << niveis
+    recorte, x_tela, y_tela = _recortar(frame, region, origem)
+    altura, largura = template.shape[:2]
+    if recorte.shape[0] < altura or recorte.shape[1] < largura:
+        return None
+
+    if template_reduzido is None:
+        template_reduzido = cv2.resize(template, None, fx=1 / fator, fy=1 / fator, interpolation=cv2.INTER_AREA)
+    frame_reduzido = cv2.resize(recorte, None, fx=1 / fator, fy=1 / fator, interpolation=cv2.INTER_AREA)
+    if (frame_reduzido.shape[0] < template_reduzido.shape[0] 
+            or frame_reduzido.shape[1] < template_reduzido.shape[1]):
+        return localizar_no_frame(frame, template, confianca, region, origem)
+
+    resultado = cv2.matchTemplate(frame_reduzido, template_reduzido, cv2.TM_CCOEFF_NORMED)
+    limiar_grosso = confianca - _perda_reducao(template, template_reduzido, fator) - PYRAMID_COARSE_SLACK
+    margem = fator * 2 + PYRAMID_CONFIRM_MARGIN
+    th, tw = template_reduzido.shape[:2]
+
+    # Picos locais acima do piso (o melhor em escala reduzida nem sempre é o
+    # melhor em resolução cheia)
+    vizinhanca = np.ones((max(1, th // 2) | 1, max(1, tw // 2) | 1), dtype=np.uint8)
+    picos = (resultado >= limiar_grosso) & (resultado >= cv2.dilate(resultado, vizinhanca))
+    ys, xs = np.nonzero(picos)
+    if ys.size == 0:
+        return None
+    ordem = np.argsort(-resultado[ys, xs], kind="stable")[:PYRAMID_CANDIDATES]
+
+    for cx, cy in zip(xs[ordem], ys[ordem]):
+        janela = (
+            x_tela + cx * fator - margem, 
+            y_tela + cy * fator - margem, 
+            largura + 2 * margem, 
+            altura + 2 * margem
+        )
+        encontrado = localizar_no_frame(recorte, template, confianca, janela, (x_tela, y_tela))
+        if encontrado:
+            return encontrado
+    if not _vez_do_fallback(template):
+        return None
+    somar("piramide_fallbacks")
+    return localizar_no_frame(recorte, template, confianca, None, (x_tela, y_tela))
+
+# Tentativas sem confirmação desde a última busca cheia, por template (id do array do TemplateCache)
+_tentativas_sem_fallback = {}
+
+def _vez_do_fallback(template: np.ndarray) -> bool:
+    """True na 1ª tentativa sem confirmação de um template e depois a cada PYRAMID_FALLBACK_EVERY."""
+    chave = id(template)
+    tentativas = _tentativas_sem_fallback.get(chave, 0)
+    if len(_tentativas_sem_fallback) > TEMPLATE_CACHE_SIZE * 4:
+        _tentativas_sem_fallback.clear()  # Ids de templates que já saíram do cache
+    _tentativas_sem_fallback[chave] = (tentativas + 1) % max(1, PYRAMID_FALLBACK_EVERY)
+    return tentativas == 0
+
+def _perda_reducao(template: np.ndarray, template_reduzido: np.ndarray, fator: int) -> float:
+    """
+    Quanto o score do template cai na escala reduzida quando ele não está
+    alinhado à grade da redução (deslocado meio 'fator' na tela). Templates
+    com texto fino ou bordas de 1px perdem muito; sem esse desconto, a busca
+    grossa descartaria o candidato certo.
+    """
+    meio = fator // 2
+    altura, largura = template_reduzido.shape[:2]
+    pior = 1.0
+    for dx, dy in ((meio, 0), (0, meio), (meio, meio)):
+        deslocado = cv2.resize(template[dy:, dx:], None, fx=1 / fator, fy=1 / fator, interpolation=cv2.INTER_AREA)
+        h, w = min(altura, deslocado.shape[0]) - 1, min(largura, deslocado.shape[1]) - 1
+        if h < 1 or w < 1:
+            continue
+        score = float(cv2.matchTemplate(deslocado, template_reduzido[:h, :w], cv2.TM_CCOEFF_NORMED).max())
+        if np.isfinite(score):
+            pior = min(pior, score)
+    return max(0.0, 1.0 - pior)
+
+def localizar_template(frame: np.ndarray,
+                       template: np.ndarray,
+                       confianca: float,
+                       region: tuple = None,
+                       origem: tuple = (0, 0),
+                       modo: str = DEFAULT_MATCH_MODE,
+                       template_reduzido: np.ndarray = None):
+    """Ponto único de busca usado pelos helpers: escolhe a estratégia pelo 'modo'."""
+    if modo not in ('normal', 'piramide'):
+        raise ValueError(f"Modo de busca desconhecido: '{modo}' (use 'normal' ou 'piramide').")
+    with medir("match_sec"):
+        if modo == 'piramide':
+            return localizar_piramide(frame, template, confianca, region, origem, template_reduzido)
+        return localizar_no_frame(frame, template, confianca, region, origem)
+
+# --- 5. Todas as Ocorrências (localizar_todas) ---
+def localizar_todas_no_frame(frame: np.ndarray,
+                             template: np.ndarray,
+                             confianca: float,
+                             region: tuple = None,
+                             origem: tuple = (0, 0),
+                             max_resultados: int = FIND_ALL_MAX_RESULTS,
+                             sobreposicao: float = FIND_ALL_OVERLAP) -> list:
+    """
+    Procura TODAS as ocorrências do template num frame já capturado.
+
+    Um único matchTemplate; os candidatos são os máximos locais acima de
+    'confianca' (cv2.dilate numa vizinhança de meio template), e as
+    sobreposições restantes são eliminadas por NMS feito com NumPy
+    (ocorrências com IoU > 'sobreposicao' em relação a uma de score maior
+    são descartadas). Mesmas coordenadas do localizar_no_frame.
+
+    Retorna [(left, top, width, height, score)], do maior score para o menor.
+    """
+    recorte, x0, y0 = _recortar(frame, region, origem)
+    altura, largura = template.shape[:2]
+    if recorte.shape[0] < altura or recorte.shape[1] < largura:
+        return []
+
+    with medir("match_sec"):
+        resultado = cv2.matchTemplate(recorte, template, cv2.TM_CCOEFF_NORMED)
+        vizinhanca = np.ones((max(1, altura // 2) | 1, max(1, largura // 2) | 1), dtype=np.uint8)
+        picos = (resultado >= confianca) & (resultado >= cv2.dilate(resultado, vizinhanca))
+        ys, xs = np.nonzero(picos)
+        scores = resultado[ys, xs]
+        ordem = np.argsort(-scores, kind="stable")
+        manter = _nms(xs[ordem], ys[ordem], largura, altura, sobreposicao)[:max_resultados]
+        indices = ordem[manter]
+    if indices.size:
+        maximo("melhor_score", float(scores[indices[0]]))
+    return [(int(x0 + xs[i]), int(y0 + ys[i]), largura, altura, float(scores[i])) for i in indices]
+
+def _nms(xs: np.ndarray, ys: np.ndarray, largura: int, altura: int, sobreposicao: float) -> np.ndarray:
+    """
+    NMS guloso para caixas do mesmo tamanho, já ordenadas por score. Cada
+    iteração mantém uma caixa e descarta, de uma vez (NumPy), todas as que se
+    sobrepõem demais a ela. Retorna os índices mantidos.
+    """
+    area = largura * altura
+    restantes = np.arange(xs.size)
+    mantidos = []
+    while restantes.size:
+        i = restantes[0]
+        mantidos.append(i)
+        outros = restantes[1:]
+        intersecao = (np.maximum(0, largura - np.abs(xs[outros] - xs[i])) *
+                      np.maximum(0, altura - np.abs(ys[outros] - ys[i])))
+        iou = intersecao / (2 * area - intersecao)
+        restantes = outros[iou <= sobreposicao]
+    return np.asarray(mantidos, dtype=np.intp)
+
+def ordenar_ocorrencias(ocorrencias: list, ordem: str = 'linhas', tolerancia: int = None) -> list:
+    """
+    Ordena as ocorrências (left, top, width, height, score):
+    - 'linhas': de cima para baixo e, na mesma linha, da esquerda para a direita;
+    - 'colunas': da esquerda para a direita e, na mesma coluna, de cima para baixo;
+    - 'score': do maior score para o menor.
+    Ocorrências cujo centro difere menos que 'tolerancia' px (padrão: metade
+    da altura/largura do template) contam como a mesma linha/coluna.
+    """
+    if ordem not in ('linhas', 'colunas', 'score'):
+        raise ValueError(f"Ordem desconhecida: '{ordem}' (use 'linhas', 'colunas' ou 'score').")
+    if len(ocorrencias) < 2:
+        return list(ocorrencias)
+    caixas = np.asarray([o[:5] for o in ocorrencias], dtype=np.float64)
+    if ordem == 'score':
+        return [ocorrencias[i] for i in np.argsort(-caixas[:, 4], kind="stable")]
+
+    cx = caixas[:, 0] + caixas[:, 2] / 2
+    cy = caixas[:, 1] + caixas[:, 3] / 2
+    principal, secundario = (cy, cx) if ordem == 'linhas' else (cx, cy)
+    if tolerancia is None:
+        tolerancia = caixas[0, 3 if ordem == 'linhas' else 2] / 2
+    # Agrupa pela coordenada principal: nova linha/coluna quando o salto passa da tolerância
+    por_principal = np.argsort(principal, kind="stable")
+    grupo = np.empty(len(ocorrencias), dtype=np.intp)
+    grupo[por_principal] = np.concatenate(([0], np.cumsum(np.diff(principal[por_principal]) > tolerancia)))
+    return [ocorrencias[i] for i in np.lexsort((secundario, grupo))]
@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import atexit
+import logging
+import tempfile
+import threading
+
+from config import (
+    LOCATION_INDEX_FILE, LOCATION_INDEX_BASE_FILE, HOTSPOT_PADDING, HOTSPOT_MAX_PER_TEMPLATE,
+    HOTSPOT_SAVE_INTERVAL
+)
+
+class LocationIndex:
+    """
+    Índice persistente de "hot-spots": onde cada template já foi encontrado
+    e quantas vezes. Os helpers de espera procuram primeiro numa região com
+    margem ao redor desses pontos e só varrem a tela inteira quando erram.
+
+    Fica salvo em JSON ao lado do coordinates.json (ver LOCATION_INDEX_FILE).
+    Nos workers do parallel_runner cada um tem o seu arquivo; se ele ainda
+    não existe, o worker começa com os hot-spots do índice base ('semente').
+    A gravação em disco é agrupada (no máx. uma a cada HOTSPOT_SAVE_INTERVAL
+    segundos) e feita também na saída do programa.
+    """
+    def __init__(self,
+                 caminho: str = LOCATION_INDEX_FILE,
+                 padding: int = HOTSPOT_PADDING,
+                 max_por_template: int = HOTSPOT_MAX_PER_TEMPLATE,
+                 semente: str = LOCATION_INDEX_BASE_FILE):
+        self.caminho = caminho
+        self.padding = padding
+        self.max_por_template = max_por_template
+        self._lock = threading.Lock()
+        self._dados = self._carregar(self.caminho if os.path.exists(self.caminho) or not semente else semente)
+        self._sujo = False
+        self._ultimo_save = time.time()
+
+    def _carregar(self, caminho: str) -> dict:
+        if not os.path.exists(caminho):
+            return {}
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logging.warning(f"Índice de localizações ilegível ({caminho}): {e}. Começando vazio.")
+            return {}
+
+    def _entrada(self, nome: str) -> dict:
+        return self._dados.setdefault(nome, {
+            "hotspots": [], "buscas": 0, "acertos_hotspot": 0,
+            "area_varrida": 0, "area_tela_cheia": 0
+        })
+
+    def regioes_candidatas(self, nome: str) -> list:
+        """Regiões (left, top, width, height) com margem ao redor dos hot-spots, do mais usado ao menos."""
+        with self._lock:
+            entrada = self._dados.get(nome)
+            if not entrada:
+                return []
+            hotspots = sorted(entrada["hotspots"], key=lambda h: h["hits"], reverse=True)
+        p = self.padding
+        return [(h["left"] - p, h["top"] - p, h["width"] + 2 * p, h["height"] + 2 * p) for h in hotspots]
+
+    def registrar_encontro(self, nome: str, box: tuple):
+        """Registra que o template foi encontrado em box = (left, top, width, height)."""
+        left, top, width, height = (int(v) for v in box[:4])
+        with self._lock:
+            hotspots = self._entrada(nome)["hotspots"]
+            for h in hotspots:
+                # Mesmo hot-spot se o canto estiver dentro da margem de tolerância
+                if abs(h["left"] - left) <= self.padding and abs(h["top"] - top) <= self.padding:
+                    h.update(left=left, top=top, width=width, height=height)
+                    h["hits"] += 1
+                    h["last_seen"] = time.time()
+                    break
+            else:
+                hotspots.append({
+                    "left": left, "top": top, "width": width, "height": height,
+                    "hits": 1, "last_seen": time.time()
+                })
+                if len(hotspots) > self.max_por_template:
+                    # Descarta o menos usado (e, no empate, o mais antigo)
+                    hotspots.remove(min(hotspots, key=lambda h: (h["hits"], h["last_seen"])))
+            self._sujo = True
+        self._salvar_se_necessario()
+
+    def registrar_busca(self, nome: str, acertou_hotspot: bool, area_varrida: int, area_tela_cheia: int):
+        """Contabiliza uma busca sem 'region' explícita (para as estatísticas de economia)."""
+        with self._lock:
+            entrada = self._entrada(nome)
+            entrada["buscas"] += 1
+            entrada["acertos_hotspot"] += int(acertou_hotspot)
+            entrada["area_varrida"] += int(area_varrida)
+            entrada["area_tela_cheia"] += int(area_tela_cheia)
+            self._sujo = True
+
+    def stats(self, nome: str = None) -> dict:
+        """Taxa de acerto nos hot-spots e fração da área de varredura economizada."""
+        with self._lock:
+            entradas = [self._dados[nome]] if nome in self._dados else ([] if nome else list(self._dados.values()))
+            buscas = sum(e["buscas"] for e in entradas)
+            acertos = sum(e["acertos_hotspot"] for e in entradas)
+            varrida = sum(e["area_varrida"] for e in entradas)
+            cheia = sum(e["area_tela_cheia"] for e in entradas)
+        return {
+            "buscas": buscas,
+            "acertos_hotspot": acertos,
+            "hit_rate": (acertos / buscas) if buscas else 0.0,
+            "area_economizada": (1 - varrida / cheia) if cheia else 0.0,
+        }
+
+    def _salvar_se_necessario(self):
+        if time.time() - self._ultimo_save >= HOTSPOT_SAVE_INTERVAL:
+            self.salvar()
+
+    def salvar(self):
+        """
+        Grava o índice em disco (escrita atômica: arquivo temporário + rename).
+        O temporário tem nome único, então dois processos gravando o mesmo
+        arquivo não se atrapalham (o último rename vence).
+        """
+        with self._lock:
+            if not self._sujo:
+                return
+            conteudo = json.dumps(self._dados, indent=4)
+            self._sujo = False
+            self._ultimo_save = time.time()
+        temporario = None
+        try:
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=os.path.dirname(os.path.abspath(self.caminho)),
+                                             prefix=f"{os.path.basename(self.caminho)}.", suffix=".tmp",
+                                             delete=False) as f:
+                temporario = f.name
+                f.write(conteudo)
+            os.replace(temporario, self.caminho)
+        except OSError as e:
+            logging.warning(f"Falha ao salvar o índice de localizações: {e}")
+            try:
+                if temporario:
+                    os.remove(temporario)
+            except OSError:
+                pass
+
+# Instância única usada pelos helpers de espera
+location_index = LocationIndex()
+atexit.register(location_index.salvar)
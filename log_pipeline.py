@@ -0,0 +1,197 @@
+import os
+import queue
+import atexit
+import logging
+import threading
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+from config import (
+    LOG_FILE, LOG_LEVEL, LOG_ROTATION, LOG_MAX_MB, LOG_ROTATION_WHEN,
+    LOG_BACKUP_COUNT, LOG_DEBUG_MAX_PER_SEC, LOG_RING_BUFFER_SIZE
+)
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# --- 1. Amostragem de Mensagens DEBUG ---
+class AmostragemDebug(logging.Filter):
+    """
+    Limita as mensagens DEBUG a 'max_por_segundo' por linha de código.
+
+    Os loops de espera logam em DEBUG a cada tentativa; sem limite, o
+    LOG_LEVEL=DEBUG inunda o arquivo e atrasa o polling. As mensagens que
+    passam do limite são descartadas e contadas; a próxima que passar
+    informa quantas foram suprimidas (o FormatadorLog acrescenta o aviso).
+    INFO e acima nunca são filtradas.
+
+    Use UMA instância para todos os handlers (ver _amostragem): a decisão
+    fica anotada no registro, então o 2º handler reusa a do 1º em vez de
+    contar o mesmo registro de novo. O registro em si não é alterado.
+    """
+    def __init__(self, max_por_segundo: int = LOG_DEBUG_MAX_PER_SEC):
+        super().__init__()
+        self.max_por_segundo = max_por_segundo
+        self._janelas = {}  # (arquivo, linha) -> [início da janela, emitidas, suprimidas]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno != logging.DEBUG or self.max_por_segundo <= 0:
+            return True
+        decisao = getattr(record, "amostragem_passou", None)
+        if decisao is not None:
+            return decisao
+        chave = (record.pathname, record.lineno)
+        agora = record.created
+        with self._lock:
+            janela = self._janelas.get(chave)
+            if janela is None or agora - janela[0] >= 1.0:
+                suprimidas = janela[2] if janela else 0
+                self._janelas[chave] = [agora, 1, 0]
+            elif janela[1] < self.max_por_segundo:
+                janela[1] += 1
+                suprimidas = 0
+            else:
+                janela[2] += 1
+                record.amostragem_passou = False
+                return False
+        record.amostragem_passou = True
+        record.debug_suprimidas = suprimidas
+        return True
+
+class FormatadorLog(logging.Formatter):
+    """Formatter padrão + o aviso de mensagens DEBUG suprimidas pela AmostragemDebug."""
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        texto = super().formatMessage(record)
+        suprimidas = getattr(record, "debug_suprimidas", 0)
+        if suprimidas:
+            texto += f" [+{suprimidas} mensagens desta linha suprimidas]"
+        return texto
+
+# Instância única, compartilhada por todos os handlers
+_amostragem = AmostragemDebug()
+
+# --- 2. Últimos Registros em Memória (para as notificações) ---
+class BufferCircular(logging.Handler):
+    """
+    Guarda os últimos 'capacidade' registros já formatados, em memória.
+
+    Fica direto no logger raiz (fora da fila), então um registro logado
+    logo antes da notificação de erro já está aqui, mesmo que o listener
+    ainda não o tenha escrito no arquivo.
+    """
+    def __init__(self, capacidade: int = LOG_RING_BUFFER_SIZE):
+        super().__init__()
+        self._registros = deque(maxlen=capacidade)
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self._registros.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def ultimas_linhas(self, n_linhas: int) -> str:
+        """Retorna as N últimas linhas (um registro com traceback ocupa várias)."""
+        with self.lock:
+            registros = list(self._registros)
+        linhas = []
+        for registro in reversed(registros):
+            linhas[:0] = registro.splitlines()
+            if len(linhas) >= n_linhas:
+                break
+        return "".join(f"{linha}\n" for linha in linhas[-n_linhas:])
+
+    def __len__(self):
+        return len(self._registros)
+
+# Instância única, preenchida a partir do configurar_logging()
+buffer_log = BufferCircular()
+
+def ler_final_arquivo(caminho: str, n_linhas: int, bloco: int = 8192) -> str:
+    """
+    Lê as N últimas linhas de um arquivo voltando a partir do fim, em blocos:
+    o custo depende de N, não do tamanho do arquivo.
+    """
+    with open(caminho, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        posicao = f.tell()
+        dados = b''
+        # n_linhas + 1 quebras garantem que a primeira linha pedida está completa
+        while posicao > 0 and dados.count(b'\n') <= n_linhas:
+            tamanho = min(bloco, posicao)
+            posicao -= tamanho
+            f.seek(posicao)
+            dados = f.read(tamanho) + dados
+    linhas = dados.splitlines(keepends=True)[-n_linhas:]
+    return b''.join(linhas).decode('utf-8', errors='replace')
+
+# --- 3. Configuração (QueueHandler + QueueListener) ---
+_listener = None
+_handler_fila = None
+
+def configurar_logging(caminho: str = LOG_FILE, nivel: int = LOG_LEVEL) -> QueueListener:
+    """
+    Configura o logging da automação (arquivo com rotação + console).
+
+    Quem loga só coloca o registro numa fila (QueueHandler); uma thread
+    (QueueListener) formata e escreve no arquivo e no console. Assim os loops
+    de espera não esperam pelo disco nem pelo terminal.
+
+    Rotação (LOG_ROTATION): 'tamanho' (LOG_MAX_MB por arquivo) ou 'tempo'
+    (LOG_ROTATION_WHEN), mantendo LOG_BACKUP_COUNT arquivos antigos; None
+    desliga. Os últimos registros também ficam no buffer_log (memória).
+    Chamadas repetidas não duplicam os handlers.
+    """
+    global _listener, _handler_fila
+    if _listener is not None:
+        return _listener
+
+    if LOG_ROTATION == 'tamanho':
+        arquivo = RotatingFileHandler(caminho, maxBytes=int(LOG_MAX_MB * 1024 * 1024),
+                                      backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+    elif LOG_ROTATION == 'tempo':
+        arquivo = TimedRotatingFileHandler(caminho, when=LOG_ROTATION_WHEN,
+                                           backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+    elif LOG_ROTATION is None:
+        arquivo = logging.FileHandler(caminho, encoding='utf-8')
+    else:
+        raise ValueError(f"LOG_ROTATION inválido: '{LOG_ROTATION}' (use 'tamanho', 'tempo' ou None).")
+
+    formatador = FormatadorLog(LOG_FORMAT)
+    console = logging.StreamHandler()
+    for handler in (arquivo, console):
+        handler.setFormatter(formatador)
+
+    fila = queue.SimpleQueue()
+    _handler_fila = QueueHandler(fila)
+    _handler_fila.addFilter(_amostragem)
+
+    buffer_log.setFormatter(formatador)
+    buffer_log.addFilter(_amostragem)
+
+    raiz = logging.getLogger()
+    raiz.setLevel(nivel)
+    raiz.addHandler(_handler_fila)
+    raiz.addHandler(buffer_log)
+
+    _listener = QueueListener(fila, arquivo, console, respect_handler_level=True)
+    _listener.start()
+    atexit.register(parar_logging)
+    return _listener
+
+def parar_logging():
+    """
+    Esvazia a fila (grava os registros pendentes) e para a thread do listener.
+    Depois disso, os handlers passam a escrever direto (os flushes que rodam
+    no fim do programa ainda conseguem logar).
+    """
+    global _listener, _handler_fila
+    if _listener is None:
+        return
+    _listener.stop()  # Processa tudo que já está na fila antes de parar
+    raiz = logging.getLogger()
+    raiz.removeHandler(_handler_fila)
+    for handler in _listener.handlers:
+        handler.addFilter(_amostragem)
+        raiz.addHandler(handler)
+    _listener = None
+    _handler_fila = None
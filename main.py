@@ -1,8 +1,6 @@
 import logging
 from dotenv import load_dotenv 
-import pandas as pd
 import time
-import pyautogui as pg
 
 # Funções principais da automação
 from automation_helpers import (
@@ -10,9 +8,11 @@ from automation_helpers import (
     safe_click, 
     find_and_click, 
     type_text,
+    press_key,
     esperar_imagem,
     esperar_imagem_desaparecer,
     imagem_esta_presente,
+    esperar_qualquer_imagem,
     click_relative
 )
 
@@ -20,11 +20,42 @@ from automation_helpers import (
 from reporting import (
     PerformanceTimer,
     salvar_screenshot_erro,
-    enviar_notificacao_telegram
+    salvar_caixa_preta,
+    enviar_notificacao_telegram,
+    flush_notificacoes
 )
+from click_history import flush_click_history
+from row_source import RowSource
+from progress_journal import ProgressJournal
+from workflow import Fluxo
 
 # --- Lógica de Negócio (funções aqui) ---
+# (Também usadas pelo parallel_runner.py: mantenha-as no nível do módulo)
 
+# Planilha de entrada e colunas esperadas
+ARQUIVO_ENTRADA = "./empresas.xlsx"
+COLUNAS_OBRIGATORIAS = ['numero', 'filial', 'empresa', 'regime', 'classe']
+TIPOS_COLUNAS = {'numero': str, 'filial': str}
+
+def chave_linha(linha) -> str:
+    """Identificador único da linha no diário de progresso."""
+    return f"{linha.numero}-{linha.filial}"
+
+# Passos da automação para cada linha, descritos como fluxo ({campo} = coluna
+# da linha). Também pode vir de um arquivo: Fluxo.carregar("fluxos/empresa.json")
+FLUXO = (
+    Fluxo("empresa")
+    .tecla('f7')
+    .digitar('{numero}')
+    .tecla('tab')
+    .digitar('{filial}')
+    .tecla(['enter'] * 4)
+)
+
+def processar_linha(linha):
+    """Executa a automação para UMA linha da planilha (namedtuple: linha.numero, linha.filial...)."""
+    logging.info(f"Processando empresa: {linha.empresa}.")
+    FLUXO.executar(linha)
 
 # --- Ponto de Entrada Principal ---
 if __name__ == "__main__":
@@ -35,59 +66,72 @@ if __name__ == "__main__":
     # 2. Inicia a "Base de Logging" e cria as pastas
     setup_automation()
     
+    # 2b. Pré-carrega templates e valida coordenadas de todos os passos do fluxo
+    FLUXO.preparar()
+    
     # 3. [ROI] Defina o "Custo" humano da tarefa
     # Quanto tempo (em segundos) um humano levaria para fazer UMA iteração?
     HUMAN_TIME_PER_TASK_SEC = 180 # Ex: 3 minutos
     
-    # 4. Inicializa o Timer de Performance
-    timer = PerformanceTimer(human_time_per_iteration_sec=HUMAN_TIME_PER_TASK_SEC)
+    # 4. Abre o diário de progresso (retoma de onde a última execução parou)
+    journal = ProgressJournal()
+    
+    # 5. Inicializa o Timer de Performance (o relatório inclui as execuções retomadas)
+    timer = PerformanceTimer(human_time_per_iteration_sec=HUMAN_TIME_PER_TASK_SEC, journal=journal)
 
     time.sleep(3)
     
     try:
-        # 5. Inicia o Cronômetro
+        # 6. Inicia o Cronômetro
         timer.start()
         
         # --- Início da Lógica da Automação ---
         # Aqui é onde a magica acontece!
         
-        df = pd.read_excel("./empresas.xlsx")
-        
-        logging.info(f"Iniciando processamento de {len(df)} meses.")
-        
-        if 'numero' not in df.columns or 'filial' not in df.columns:
-            print("Erro: O arquivo não contém as colunas 'numero' e 'filial'.")
-            print(f"Colunas encontradas: {list(df.columns)}")
+        # 1. Abre a planilha em modo streaming. O cabeçalho é validado antes de
+        # ler qualquer linha; as linhas vêm sob demanda, em blocos.
+        try:
+            linhas = RowSource(
+                ARQUIVO_ENTRADA,
+                colunas_obrigatorias=COLUNAS_OBRIGATORIAS,
+                tipos=TIPOS_COLUNAS
+            )
+        except ValueError as e:
+            print(f"Erro: {e}")
             
             time.sleep(2)
         else:
-            # 2. Itera sobre cada linha do DataFrame
-            # A função iterrows() retorna o índice da linha e a linha (como um objeto)
-            for indice, linha in df.iterrows():
-                
-                # 3. Captura o conteúdo das colunas pelo nome
-                numero = linha['numero']
-                filial = linha['filial']
-                empresa = linha['empresa']
-                regime = linha['regime']
-                classe = linha['classe']
-                logging.info(f"Processando empresa: {empresa}.")
-                
-                pg.press('f7')
-                type_text(str(numero))
-                pg.press('tab')
-                type_text(str(filial))
-                pg.press(['enter'] * 4)
-                
-                input("Aperte Enter para continuar...")
+            logging.info(f"Iniciando processamento de ~{linhas.total_estimado or '?'} meses.")
+            if linhas.total_estimado:
+                # ETA no log: desconta as linhas já concluídas em execuções anteriores
+                timer.definir_total(max(0, linhas.total_estimado - journal.resumo()['linhas_concluidas']))
+            
+            # 2. Itera sobre cada linha (namedtuple: linha.numero, linha.filial...)
+            with linhas:
+                for linha in linhas:
+                    
+                    # 3. Pula linhas já concluídas numa execução anterior
+                    chave = chave_linha(linha)
+                    if not journal.deve_processar(chave):
+                        continue
+                    
+                    # 4. Executa a lógica de negócio, registrando o resultado no diário
+                    #    (o tempo da iteração conta daqui: sem a pausa do input() abaixo)
+                    timer.iniciar_lap()
+                    with journal.linha(chave):
+                        processar_linha(linha)
+                    timer.lap()
+                    
+                    input("Aperte Enter para continuar...")
                 
     except Exception as e:
         # 7. CAPTURA DE ERRO E NOTIFICAÇÃO
         logging.critical(f"Erro fatal não tratado na automação: {e}", exc_info=True)
         logging.info("Iniciando processo de notificação de erro...")
         
-        # 7a. Salva os screenshots de erro
+        # 7a. Salva os screenshots de erro e os últimos segundos de tela (caixa-preta)
         screenshots = salvar_screenshot_erro(motivo=str(e))
+        salvar_caixa_preta(motivo=str(e))
         
         # 7b. Envia a notificação para o Telegram
         enviar_notificacao_telegram(
@@ -97,5 +141,9 @@ if __name__ == "__main__":
 
     finally:
         # 8. RELATÓRIO FINAL (sempre executa)
+        flush_click_history() # Grava os recortes de clique que ainda estão na fila
         timer.stop()
+        FLUXO.log_resumo() # Tempo de cada passo do fluxo
+        flush_notificacoes() # Espera (com limite) o envio das notificações pendentes
+        journal.close()
         logging.info("--- Automação Finalizada ---")
\ No newline at end of file
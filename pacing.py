@@ -0,0 +1,146 @@
+import time
+import logging
+import threading
+
+from config import (
+    GLOBAL_PAUSE, PACING_MODE, PACING_STABLE_WINDOW, PACING_MAX_WAIT,
+    PACING_MIN_WAIT, PACING_SAMPLE_INTERVAL, PACING_REGION
+)
+from image_matching import fingerprint_frame
+from screen_capture import capturar_tela, CaptureError
+from polling import registrar_acao
+from tracing import somar
+
+# Contadores para medir quanto tempo o pacing está economizando
+_stats = {"acoes": 0, "tempo_esperado": 0.0, "timeouts": 0, "fallbacks": 0}
+_local = threading.local()
+
+def pacing_ativo() -> bool:
+    """True se o ritmo é por estabilidade da tela (e pyautogui.PAUSE deve ficar em 0)."""
+    return PACING_MODE == 'estabilidade'
+
+def aguardar_estabilidade(region: tuple = None,
+                          janela: float = PACING_STABLE_WINDOW,
+                          limite: float = PACING_MAX_WAIT) -> bool:
+    """
+    Aguarda até a tela (ou 'region') ficar sem mudanças por 'janela' segundos.
+
+    Compara fingerprints baratos de capturas seguidas. Nunca espera mais que
+    'limite' segundos; se a captura falhar, cai na pausa fixa (GLOBAL_PAUSE).
+    Retorna True se a tela estabilizou, False caso contrário.
+    """
+    inicio = time.time()
+    time.sleep(PACING_MIN_WAIT)  # Dá ao app a chance de começar a reagir à ação
+    ultimo_fingerprint = None
+    estavel_desde = None
+    estabilizou = False
+
+    while True:
+        try:
+            fingerprint = fingerprint_frame(capturar_tela(region))
+        except CaptureError as e:
+            logging.debug(f"Pacing: falha na captura ({e}). Usando pausa fixa de {GLOBAL_PAUSE}s.")
+            time.sleep(max(0.0, GLOBAL_PAUSE - (time.time() - inicio)))
+            _stats["fallbacks"] += 1
+            break
+        agora = time.time()
+        if fingerprint != ultimo_fingerprint:
+            ultimo_fingerprint = fingerprint
+            estavel_desde = agora
+        elif agora - estavel_desde >= janela:
+            estabilizou = True
+            break
+        if agora - inicio >= limite:
+            logging.debug(f"Pacing: tela não estabilizou em {limite}s. Seguindo em frente.")
+            _stats["timeouts"] += 1
+            break
+        time.sleep(PACING_SAMPLE_INTERVAL)
+
+    _stats["acoes"] += 1
+    _stats["tempo_esperado"] += time.time() - inicio
+    somar("pacing_sec", time.time() - inicio)
+    return estabilizou
+
+def pausar_apos_acao(region: tuple = None):
+    """
+    Chamado pelos helpers logo após cada ação de entrada (clique, digitação, tecla).
+    No modo 'fixo' não faz nada: o pyautogui.PAUSE já dormiu o GLOBAL_PAUSE.
+    """
+    if pacing_ativo():
+        region = region if region is not None else PACING_REGION
+        adiada = getattr(_local, "adiada", None)
+        if adiada is not None:
+            adiada.pendente = True
+            adiada.region = region
+            return
+        aguardar_estabilidade(region)
+
+# --- Chamadas diretas ao pyautogui (pg.press, pg.hotkey...) ---
+class pausa_pelo_helper:
+    """
+    Marca (use com 'with') um trecho de helper que chama o pyautogui e faz a
+    própria espera depois (pausar_apos_acao). Dentro dele, o gancho abaixo não
+    espera a cada chamada. Vale só para a thread atual; pode ser aninhado.
+    """
+    def __enter__(self):
+        _local.helper = getattr(_local, "helper", 0) + 1
+        return self
+
+    def __exit__(self, *exc):
+        _local.helper -= 1
+        return False
+
+def _pausa_pyautogui(_pause=True):
+    """Substitui o pyautogui._handlePause no modo 'estabilidade' (ver instalar_pausa_pyautogui)."""
+    if not _pause or getattr(_local, "helper", 0):
+        return
+    registrar_acao()
+    pausar_apos_acao()
+
+def instalar_pausa_pyautogui(pyautogui):
+    """
+    No modo 'estabilidade', faz toda função pública do pyautogui chamada
+    direto pelo código de negócio (pg.press, pg.hotkey, pg.click...) esperar
+    a tela estabilizar no fim, como os helpers. O pyautogui chama
+    _handlePause() depois de cada uma; aqui ele passa a chamar
+    pausar_apos_acao() no lugar do sleep de PAUSE. No modo 'fixo' não faz nada
+    (o PAUSE = GLOBAL_PAUSE continua valendo para as chamadas diretas).
+    """
+    if pacing_ativo():
+        pyautogui.PAUSE = 0
+        pyautogui._handlePause = _pausa_pyautogui
+
+class adiar_pausa:
+    """
+    Dentro do bloco (use com 'with'), pausar_apos_acao() não espera: só anota
+    que há uma espera pendente e a região. Quem adiou chama aguardar() depois,
+    quando quiser (ex: o workflow.py, em paralelo com a espera do próximo passo).
+    Vale só para a thread atual.
+    """
+    def __init__(self):
+        self.pendente = False
+        self.region = None
+
+    def __enter__(self):
+        _local.adiada = self
+        return self
+
+    def __exit__(self, *exc):
+        _local.adiada = None
+        return False
+
+    def aguardar(self) -> bool:
+        """Faz a espera por estabilidade que ficou pendente (se houver)."""
+        if not self.pendente:
+            return True
+        self.pendente = False
+        return aguardar_estabilidade(self.region)
+
+def pacing_stats() -> dict:
+    """Resumo do pacing: tempo médio por ação e economia estimada em relação ao GLOBAL_PAUSE."""
+    acoes = _stats["acoes"]
+    return {
+        **_stats,
+        "media_por_acao": (_stats["tempo_esperado"] / acoes) if acoes else 0.0,
+        "economia_estimada_sec": acoes * GLOBAL_PAUSE - _stats["tempo_esperado"],
+    }
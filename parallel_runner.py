@@ -0,0 +1,269 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import select
+import argparse
+import importlib
+import subprocess
+from dotenv import load_dotenv
+
+from config import (
+    BASE_DIR, LOG_DIR, PARALLEL_WORKERS, XVFB_FIRST_DISPLAY, XVFB_RESOLUTION,
+    PARALLEL_REPORT_FILE, WORKER_ID, WORKER_DISPLAY
+)
+
+# Este arquivo tem dois papéis:
+# - Coordenador (python parallel_runner.py -n 4): sobe N displays virtuais
+#   (Xvfb), inicia um processo worker por display, espera todos e consolida
+#   logs, screenshots de erro e relatórios de performance.
+# - Worker (--worker, iniciado pelo coordenador): roda a lógica de negócio do
+#   main.py nas linhas que lhe cabem (linha i vai para o worker i % N).
+#
+# Cada worker é um processo NOVO com DISPLAY/RPA_DISPLAY/RPA_WORKER_ID já no
+# ambiente: o pyautogui se liga ao display na importação, e o config.py usa o
+# RPA_WORKER_ID para separar logs, screenshots e diário de progresso.
+#
+# Importante: mantenha o mesmo nº de workers ao retomar uma execução (o
+# diário de progresso é por worker e a divisão das linhas depende de N).
+
+# --- 1. Displays Virtuais (Xvfb) ---
+def iniciar_xvfb(numero: int, resolucao: str = XVFB_RESOLUTION, timeout: float = 10,
+                 tentativas: int = 20) -> tuple:
+    """
+    Sobe um Xvfb no primeiro display livre a partir de ':numero' e retorna
+    (processo, número do display).
+
+    A prontidão vem do próprio Xvfb (-displayfd: ele escreve o número do
+    display num pipe quando já aceita conexões). Um socket em /tmp/.X11-unix
+    não basta: pode ser de um display antigo ou de outro usuário, e aí o Xvfb
+    novo sai com "server already active" enquanto o worker usaria a tela
+    alheia. Se o Xvfb sai antes de ficar pronto, o display está em uso e o
+    próximo número é tentado.
+    """
+    if not shutil.which("Xvfb"):
+        raise RuntimeError("Xvfb não encontrado. Instale-o (ex: apt install xvfb) ou use --displays.")
+    for candidato in range(numero, numero + tentativas):
+        leitura, escrita = os.pipe()
+        try:
+            processo = subprocess.Popen(
+                ["Xvfb", f":{candidato}", "-screen", "0", resolucao, "-nolisten", "tcp", "-displayfd", str(escrita)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, pass_fds=(escrita,)
+            )
+            os.close(escrita)
+            escrita = None
+            resposta = b""
+            limite = time.time() + timeout
+            while not resposta.endswith(b"\n"):
+                restante = limite - time.time()
+                if restante <= 0:
+                    processo.terminate()
+                    raise RuntimeError(f"Xvfb :{candidato} não ficou pronto em {timeout}s.")
+                pronto, _, _ = select.select([leitura], [], [], restante)
+                if not pronto:
+                    continue
+                parte = os.read(leitura, 16)
+                if not parte:
+                    break  # Pipe fechado: o Xvfb encerrou sem ficar pronto
+                resposta += parte
+        finally:
+            os.close(leitura)
+            if escrita is not None:
+                os.close(escrita)
+
+        if resposta.strip().isdigit():
+            logging.info(f"Xvfb iniciado no display :{int(resposta)} ({resolucao}).")
+            return processo, int(resposta)
+        processo.wait()
+        logging.warning(f"Xvfb :{candidato} encerrou ao iniciar (código {processo.returncode}). "
+                        f"Display em uso? Tentando :{candidato + 1}.")
+    raise RuntimeError(f"Nenhum display livre entre :{numero} e :{numero + tentativas - 1}.")
+
+def _encerrar(processos: list):
+    for processo in processos:
+        if processo.poll() is None:
+            processo.terminate()
+    for processo in processos:
+        try:
+            processo.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+
+# --- 2. Worker (um por display, em processo próprio) ---
+def executar_worker(indice: int, total: int, modulo: str, tempo_humano: int, caminho_relatorio: str):
+    """Processa as linhas do shard 'indice' (de 'total') com a lógica de negócio de 'modulo'."""
+    # Importados aqui: só no processo worker, com o DISPLAY já definido
+    from automation_helpers import setup_automation
+    from reporting import PerformanceTimer, salvar_screenshot_erro, salvar_caixa_preta
+    from click_history import flush_click_history
+    from progress_journal import ProgressJournal
+    from row_source import RowSource
+    from config import LOG_FILE
+
+    negocio = importlib.import_module(modulo)
+    setup_automation()
+    journal = ProgressJournal()
+    timer = PerformanceTimer(human_time_per_iteration_sec=tempo_humano, journal=journal)
+    screenshots = []
+    erro = None
+
+    timer.start()
+    try:
+        with RowSource(negocio.ARQUIVO_ENTRADA, negocio.COLUNAS_OBRIGATORIAS, negocio.TIPOS_COLUNAS) as linhas:
+            if linhas.total_estimado:
+                # ETA aproximado: a fatia deste worker, menos o que já foi concluído
+                fatia = len(range(indice, linhas.total_estimado, total))
+                timer.definir_total(max(0, fatia - journal.resumo()['linhas_concluidas']))
+            for numero_linha, linha in enumerate(linhas):
+                if numero_linha % total != indice:
+                    continue
+                chave = negocio.chave_linha(linha)
+                if not journal.deve_processar(chave):
+                    continue
+                timer.iniciar_lap()
+                with journal.linha(chave):
+                    negocio.processar_linha(linha)
+                timer.lap()
+    except Exception as e:
+        logging.critical(f"Erro fatal no worker {WORKER_ID}: {e}", exc_info=True)
+        screenshots = salvar_screenshot_erro(motivo=f"worker_{WORKER_ID}_{e}")
+        salvar_caixa_preta(motivo=f"worker_{WORKER_ID}_{e}")
+        erro = str(e)
+    finally:
+        flush_click_history()
+        relatorio = timer.stop()
+        journal.close()
+
+    relatorio.update({
+        "worker": WORKER_ID, "display": WORKER_DISPLAY, "log": LOG_FILE,
+        "erro": erro, "screenshots": screenshots,
+    })
+    with open(caminho_relatorio, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=4, ensure_ascii=False, default=str)
+
+# --- 3. Coordenador ---
+def executar_paralelo(n_workers: int = PARALLEL_WORKERS,
+                      modulo: str = "main",
+                      tempo_humano: int = 0,
+                      displays: list = None) -> dict:
+    """
+    Sobe os displays (ou usa os informados em 'displays'), inicia um worker por
+    display, espera todos terminarem e retorna o relatório consolidado (também
+    salvo em PARALLEL_REPORT_FILE).
+
+    O app alvo precisa estar aberto em cada display: abra-o dentro da lógica
+    de negócio ou por um script de inicialização do display.
+    """
+    os.makedirs(LOG_DIR, exist_ok=True)
+    xvfbs = []
+    workers = []
+    inicio = time.time()
+    try:
+        if displays is None:
+            displays = []
+            numero = XVFB_FIRST_DISPLAY
+            for i in range(n_workers):
+                processo, numero = iniciar_xvfb(numero)
+                xvfbs.append(processo)
+                displays.append(f":{numero}")
+                numero += 1
+        n_workers = len(displays)
+
+        for i, display in enumerate(displays):
+            worker_id = str(i + 1)
+            caminho_relatorio = os.path.join(LOG_DIR, f"report_worker_{worker_id}.json")
+            if os.path.exists(caminho_relatorio):
+                os.remove(caminho_relatorio)
+            env = {**os.environ, "DISPLAY": display, "RPA_DISPLAY": display, "RPA_WORKER_ID": worker_id}
+            comando = [
+                sys.executable, os.path.abspath(__file__), "--worker", str(i),
+                "--total", str(n_workers), "--modulo", modulo,
+                "--tempo-humano", str(tempo_humano), "--relatorio", caminho_relatorio
+            ]
+            workers.append((worker_id, caminho_relatorio, subprocess.Popen(comando, env=env, cwd=BASE_DIR)))
+            logging.info(f"Worker {worker_id} iniciado no display {display}.")
+
+        for worker_id, _, processo in workers:
+            codigo = processo.wait()
+            logging.info(f"Worker {worker_id} finalizado (código {codigo}).")
+    finally:
+        _encerrar([p for _, _, p in workers] + xvfbs)
+
+    return _consolidar(workers, time.time() - inicio, tempo_humano)
+
+def _consolidar(workers: list, tempo_total: float, tempo_humano: int) -> dict:
+    """Junta os relatórios, logs e screenshots dos workers num relatório único."""
+    relatorios = []
+    for worker_id, caminho_relatorio, processo in workers:
+        try:
+            with open(caminho_relatorio, "r", encoding="utf-8") as f:
+                relatorios.append(json.load(f))
+        except (OSError, json.JSONDecodeError):
+            relatorios.append({"worker": worker_id, "erro": f"Sem relatório (código de saída {processo.returncode})."})
+
+    iteracoes = sum(r.get("total_iterations", 0) for r in relatorios)
+    consolidado = {
+        "workers": len(relatorios),
+        "total_time_sec": tempo_total,
+        "total_iterations": iteracoes,
+        "throughput_per_hour": (iteracoes / tempo_total * 3600) if tempo_total else 0,
+        "human_time_saved_sec": (tempo_humano * iteracoes - tempo_total) if tempo_humano and iteracoes else 0,
+        "errors": [r for r in relatorios if r.get("erro")],
+        "screenshots": [s for r in relatorios for s in r.get("screenshots", [])],
+        "por_worker": relatorios,
+    }
+    with open(PARALLEL_REPORT_FILE, "w", encoding="utf-8") as f:
+        json.dump(consolidado, f, indent=4, ensure_ascii=False, default=str)
+
+    # Log único com o conteúdo de cada worker, um bloco por worker
+    caminho_log = os.path.join(LOG_DIR, "automation_parallel_merged.log")
+    with open(caminho_log, "w", encoding="utf-8") as saida:
+        for r in relatorios:
+            saida.write(f"===== Worker {r.get('worker')} ({r.get('display', '?')}) =====\n")
+            if r.get("log") and os.path.exists(r["log"]):
+                with open(r["log"], "r", encoding="utf-8", errors="replace") as f:
+                    shutil.copyfileobj(f, saida)
+
+    logging.info("--- Relatório Consolidado (Execução Paralela) ---")
+    logging.info(f"Workers: {consolidado['workers']} | Iterações: {iteracoes} | Tempo Total: {tempo_total:.2f}s")
+    logging.info(f"Throughput: {consolidado['throughput_per_hour']:.1f} iterações/hora")
+    if consolidado["errors"]:
+        logging.error(f"{len(consolidado['errors'])} worker(s) terminaram com erro. Veja {PARALLEL_REPORT_FILE}.")
+    logging.info(f"Relatório salvo em '{PARALLEL_REPORT_FILE}'; logs unidos em '{caminho_log}'.")
+    return consolidado
+
+def main():
+    parser = argparse.ArgumentParser(description="Executa a automação em paralelo, um worker por display virtual (Xvfb).")
+    parser.add_argument("-n", "--workers", type=int, default=PARALLEL_WORKERS, help="Nº de workers/displays.")
+    parser.add_argument("--modulo", default="main", help="Módulo com ARQUIVO_ENTRADA, processar_linha etc. (padrão: main).")
+    parser.add_argument("--tempo-humano", type=int, default=0, help="Seg. que um humano levaria por iteração (ROI).")
+    parser.add_argument("--displays", help="Usa displays já existentes em vez de subir Xvfb (ex: ':1,:2').")
+    # Uso interno (processo worker)
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--total", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--relatorio", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    load_dotenv()
+    if args.worker is not None:
+        executar_worker(args.worker, args.total, args.modulo, args.tempo_humano, args.relatorio)
+        return
+
+    from log_pipeline import configurar_logging
+    os.makedirs(LOG_DIR, exist_ok=True)
+    configurar_logging(os.path.join(LOG_DIR, "automation_parallel.log"), logging.INFO)
+    displays = args.displays.split(",") if args.displays else None
+    consolidado = executar_paralelo(args.workers, args.modulo, args.tempo_humano, displays)
+
+    if consolidado["errors"]:
+        from reporting import enviar_notificacao_telegram
+        enviar_notificacao_telegram(
+            mensagem=f"Execução paralela: {len(consolidado['errors'])} worker(s) com erro.",
+            imagens=consolidado["screenshots"],
+            aguardar=True
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import time
+
+from config import POLL_MIN_INTERVAL, POLL_MAX_INTERVAL, POLL_BACKOFF, POLL_FAST_WINDOW
+from image_matching import fingerprint_frame
+from tracing import somar
+
+# Momento da última ação de entrada (clique/teclado), atualizado pelos helpers
+_ultima_acao = 0.0
+
+def registrar_acao():
+    """Marca que uma ação de entrada acabou de acontecer (a tela deve mudar em breve)."""
+    global _ultima_acao
+    _ultima_acao = time.time()
+
+def segundos_desde_ultima_acao() -> float:
+    return time.time() - _ultima_acao
+
+class AdaptivePoller:
+    """
+    Motor de polling dos loops de espera.
+
+    - mudou(frame): compara o fingerprint do frame com o anterior; o loop só
+      roda o template matching (caro) quando os pixels mudaram. Mesmo sem
+      mudança, uma comparação real é feita a cada POLL_MAX_INTERVAL seg.
+    - dormir(): intervalo curto logo após uma ação de entrada ou quando a
+      tela PASSA a mudar; enquanto ela fica parada, ou mudando sem parar (um
+      spinner, um relógio), o intervalo cresce (backoff) até POLL_MAX_INTERVAL.
+      Assim uma animação na tela não prende o loop no intervalo mínimo.
+    """
+    def __init__(self, 
+                 min_interval: float = POLL_MIN_INTERVAL, 
+                 max_interval: float = POLL_MAX_INTERVAL, 
+                 backoff: float = POLL_BACKOFF,
+                 fast_window: float = POLL_FAST_WINDOW):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.fast_window = fast_window
+        self.intervalo = min_interval
+        self.polls = 0
+        self.matches = 0
+        self._ultimo_fingerprint = None
+        self._ultima_comparacao = 0.0
+        self._mudou_antes = False
+
+    def mudou(self, frame) -> bool:
+        """Retorna True se o frame difere do último visto (o primeiro sempre 'mudou')."""
+        self.polls += 1
+        somar("polls")
+        fingerprint = fingerprint_frame(frame)
+        agora = time.time()
+        mudou = fingerprint != self._ultimo_fingerprint
+        if not mudou and agora - self._ultima_comparacao < self.max_interval:
+            self._mudou_antes = False
+            return False
+        if mudou and not self._mudou_antes:
+            self.intervalo = self.min_interval  # A tela começou a mudar: volta a olhar rápido
+        self._mudou_antes = mudou
+        self._ultimo_fingerprint = fingerprint
+        self._ultima_comparacao = agora
+        self.matches += 1
+        return True
+
+    def invalidar(self):
+        """Força o próximo frame a ser comparado (ex.: após um erro no meio da tentativa)."""
+        self._ultimo_fingerprint = None
+
+    def proximo_intervalo(self) -> float:
+        """Calcula quanto dormir antes da próxima tentativa."""
+        if segundos_desde_ultima_acao() < self.fast_window:
+            self.intervalo = self.min_interval
+            return self.intervalo
+        intervalo = self.intervalo
+        self.intervalo = min(self.intervalo * self.backoff, self.max_interval)
+        return intervalo
+
+    def dormir(self):
+        intervalo = self.proximo_intervalo()
+        somar("sleep_sec", intervalo)
+        time.sleep(intervalo)
+
+    def resumo(self) -> str:
+        return f"{self.polls} capturas, {self.matches} comparações"
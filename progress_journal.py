@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+
+from config import (
+    PROGRESS_JOURNAL_FILE, JOURNAL_MAX_ATTEMPTS, JOURNAL_FSYNC_EVERY,
+    JOURNAL_FSYNC_INTERVAL
+)
+
+class ProgressJournal:
+    """
+    Diário de progresso (append-only, JSONL) para retomar execuções longas.
+
+    Cada linha processada gera um registro com a chave, o status ('ok' ou
+    'erro'), a duração e a mensagem de erro. Cada execução é um "segmento"
+    (um registro de início marca a troca). Ao reabrir o diário:
+    - linhas já concluídas ('ok') são puladas;
+    - linhas com erro são tentadas de novo até JOURNAL_MAX_ATTEMPTS tentativas.
+
+    A escrita vai para o SO a cada registro; o fsync (garantia contra queda
+    da máquina) é feito em lotes: a cada JOURNAL_FSYNC_EVERY registros ou
+    JOURNAL_FSYNC_INTERVAL segundos, e no close().
+
+    O clear.py apaga o diário junto com os logs (ou seja, começa do zero).
+    """
+    def __init__(self,
+                 caminho: str = PROGRESS_JOURNAL_FILE,
+                 max_tentativas: int = JOURNAL_MAX_ATTEMPTS):
+        self.caminho = caminho
+        self.max_tentativas = max_tentativas
+        self.segmento = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self._status = {}      # chave -> último status
+        self._tentativas = {}  # chave -> nº de tentativas
+        self._registros = []   # Registros lidos do diário (para o resumo)
+        self._pendentes_fsync = 0
+        self._ultimo_fsync = time.time()
+
+        self._carregar()
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        self._arquivo = open(caminho, 'a', encoding='utf-8')
+        self._escrever({"evento": "inicio"})
+
+        concluidas = sum(1 for s in self._status.values() if s == 'ok')
+        if self._status:
+            logging.info(f"Diário de progresso retomado: {concluidas} linhas já concluídas, "
+                         f"{len(self._status) - concluidas} com erro (segmento {self.segmento}).")
+
+    def _carregar(self):
+        if not os.path.exists(self.caminho):
+            return
+        with open(self.caminho, 'r', encoding='utf-8') as f:
+            for linha in f:
+                try:
+                    registro = json.loads(linha)
+                except json.JSONDecodeError:
+                    continue  # Última linha incompleta (processo morto no meio da escrita)
+                self._registros.append(registro)
+                chave = registro.get("chave")
+                if chave is not None:
+                    self._status[chave] = registro["status"]
+                    self._tentativas[chave] = self._tentativas.get(chave, 0) + 1
+
+    def deve_processar(self, chave) -> bool:
+        """True se a linha ainda não foi concluída e não esgotou as tentativas."""
+        chave = str(chave)
+        if self._status.get(chave) == 'ok':
+            return False
+        if self._tentativas.get(chave, 0) >= self.max_tentativas:
+            logging.warning(f"Linha '{chave}' pulada: {self.max_tentativas} tentativas com erro.")
+            return False
+        return True
+
+    def registrar(self, chave, status: str, duracao: float, erro: str = None):
+        """Grava o resultado de uma linha ('ok' ou 'erro')."""
+        chave = str(chave)
+        self._status[chave] = status
+        self._tentativas[chave] = self._tentativas.get(chave, 0) + 1
+        self._escrever({"chave": chave, "status": status, "duracao": round(duracao, 3), "erro": erro})
+
+    @contextmanager
+    def linha(self, chave):
+        """
+        Mede e registra o processamento de uma linha. Uma exceção dentro do
+        bloco é registrada como 'erro' e propagada normalmente.
+        """
+        inicio = time.time()
+        try:
+            yield
+        except Exception as e:
+            self.registrar(chave, 'erro', time.time() - inicio, str(e))
+            raise
+        self.registrar(chave, 'ok', time.time() - inicio)
+
+    def _escrever(self, registro: dict):
+        registro = {"ts": time.time(), "segmento": self.segmento, **registro}
+        self._registros.append(registro)
+        self._arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        self._arquivo.flush()
+        self._pendentes_fsync += 1
+        if (self._pendentes_fsync >= JOURNAL_FSYNC_EVERY
+                or time.time() - self._ultimo_fsync >= JOURNAL_FSYNC_INTERVAL):
+            self._fsync()
+
+    def _fsync(self):
+        os.fsync(self._arquivo.fileno())
+        self._pendentes_fsync = 0
+        self._ultimo_fsync = time.time()
+
+    def resumo(self) -> dict:
+        """Totais de todos os segmentos (execuções) registrados no diário."""
+        segmentos = {}
+        for registro in self._registros:
+            seg = segmentos.setdefault(registro["segmento"], {
+                "inicio": registro["ts"], "fim": registro["ts"], "ok": 0, "erro": 0
+            })
+            seg["fim"] = registro["ts"]
+            if registro.get("status") in ("ok", "erro"):
+                seg[registro["status"]] += 1
+        return {
+            "segmentos": len(segmentos),
+            "linhas_concluidas": sum(1 for s in self._status.values() if s == 'ok'),
+            "linhas_com_erro": sum(1 for s in self._status.values() if s == 'erro'),
+            "iteracoes_ok": sum(s["ok"] for s in segmentos.values()),
+            "tempo_total_sec": sum(s["fim"] - s["inicio"] for s in segmentos.values()),
+            "por_segmento": segmentos,
+        }
+
+    def close(self):
+        if self._arquivo.closed:
+            return
+        self._fsync()
+        self._arquivo.close()
@@ -1,107 +1,174 @@
 import os
+import json
 import logging
 import time
-import requests
-import pyautogui as pg
+import numpy as np
+from array import array
 from datetime import datetime
-from collections import deque
 from config import (
     ERROR_DIR, LOG_FILE, TELEGRAM_ENABLED, 
-    TELEGRAM_NOTIFICATION_TITLE
+    TELEGRAM_NOTIFICATION_TITLE, PERF_HISTORY_FILE, PERF_ETA_WINDOW,
+    PERF_BASELINE_RUNS, PERF_MIN_LAPS, PERF_REGRESSION_THRESHOLD
 )
+from screen_capture import capturar_tela, get_backend
+from error_evidence import gravador_evidencias, extensao_evidencia
+from black_box import caixa_preta, extensao_caixa_preta, salvar_sequencia
+from tracing import rastreado
+from telegram_notifier import telegram_notifier
+from log_pipeline import buffer_log, ler_final_arquivo
 
 # --- 1. Funções de Leitura de Log ---
 def get_last_log_lines(n_lines=15) -> str:
-    """Lê e retorna as N últimas linhas do arquivo de log para diagnóstico."""
+    """
+    Retorna as N últimas linhas do log para diagnóstico.
+
+    Usa o buffer em memória (buffer_log) quando o logging foi configurado
+    pelo setup_automation; senão, lê só o final do arquivo de log (leitura
+    de trás para frente, sem percorrer o arquivo inteiro).
+    """
     try:
-        with open(LOG_FILE, 'r', encoding='utf-8') as f:
-            last_lines = deque(f, n_lines)
-        return "".join(last_lines)
+        if len(buffer_log):
+            return buffer_log.ultimas_linhas(n_lines)
+        return ler_final_arquivo(LOG_FILE, n_lines)
     except FileNotFoundError:
         return "Arquivo de log não encontrado."
     except Exception as e:
         return f"Erro ao ler o arquivo de log: {e}"
 
 # --- 2. Funções de Captura de Erro ---
+@rastreado(alvo="motivo")
 def salvar_screenshot_erro(motivo: str, region: tuple = None) -> list:
-    """Salva screenshots de erro e retorna uma lista com os caminhos dos arquivos."""
+    """
+    Salva screenshots de erro e retorna uma lista com os caminhos dos arquivos.
+
+    A tela é capturada UMA vez; a 'region' (se houver) é recortada desse mesmo
+    frame, então as duas imagens mostram o mesmo instante. Redução, encode e
+    escrita ficam com o gravador de evidências, em segundo plano: os caminhos
+    voltam na hora e os arquivos são gravados logo em seguida (o envio ao
+    Telegram espera por eles).
+    """
     if not os.path.exists(ERROR_DIR):
         os.makedirs(ERROR_DIR)
     
     timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
     nome_base = ''.join(c for c in motivo if c.isalnum() or c in ('_', '-')).strip()[:50]
+    extensao = extensao_evidencia()
     caminhos_salvos = []
 
     try:
-        path_full = os.path.join(ERROR_DIR, f'{timestamp}_{nome_base}_TELA_CHEIA.png')
-        pg.screenshot(path_full)
-        logging.info(f"Screenshot de erro (tela cheia) salvo como '{path_full}'.")
-        caminhos_salvos.append(path_full)
+        frame = capturar_tela()
     except Exception as e:
-        logging.error(f"Falha ao salvar screenshot de tela cheia: {e}", True)
+        logging.error(f"Falha ao capturar a tela para o screenshot de erro: {e}")
+        return caminhos_salvos
+
+    path_full = os.path.join(ERROR_DIR, f'{timestamp}_{nome_base}_TELA_CHEIA{extensao}')
+    gravador_evidencias.enviar(frame, path_full, "Screenshot de erro (tela cheia)")
+    caminhos_salvos.append(path_full)
 
     if region:
-        try:
-            path_region = os.path.join(ERROR_DIR, f'{timestamp}_{nome_base}_REGIAO.png')
-            pg.screenshot(path_region, region=region)
-            logging.info(f"Screenshot de erro (região) salvo como '{path_region}'.")
+        left, top, width, height = (int(v) for v in region)
+        recorte = frame[max(0, top):top + height, max(0, left):left + width]
+        if recorte.size:
+            path_region = os.path.join(ERROR_DIR, f'{timestamp}_{nome_base}_REGIAO{extensao}')
+            gravador_evidencias.enviar(recorte, path_region, "Screenshot de erro (região)")
             caminhos_salvos.append(path_region)
-        except Exception as e:
-            logging.error(f"Falha ao salvar screenshot da região {region}: {e}", True)
+        else:
+            logging.error(f"Região {region} fora da tela. Screenshot da região não salvo.")
             
     return caminhos_salvos
 
+def salvar_caixa_preta(motivo: str) -> str:
+    """
+    Grava os últimos segundos de tela antes do erro (caixa-preta) ao lado dos
+    screenshots de erro: um GIF ou uma pasta de frames (BLACKBOX_FORMAT).
+    A tela atual entra como último frame; os frames são congelados na hora e
+    a gravação é feita em segundo plano.
+    Retorna o caminho (ou None se a caixa-preta estiver vazia/desligada).
+    """
+    try:
+        caixa_preta.registrar_agora(get_backend().peek())
+    except Exception as e:
+        logging.debug(f"Caixa-preta: falha ao capturar o frame do erro ({e}).")
+    frames = caixa_preta.congelar()
+    if not frames:
+        logging.warning("Caixa-preta vazia (desligada ou sem capturas recentes). Nada a salvar.")
+        return None
+    if not os.path.exists(ERROR_DIR):
+        os.makedirs(ERROR_DIR)
+
+    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    nome_base = ''.join(c for c in motivo if c.isalnum() or c in ('_', '-')).strip()[:50]
+    caminho = os.path.join(ERROR_DIR, f'{timestamp}_{nome_base}_CAIXA_PRETA{extensao_caixa_preta()}')
+    duracao = frames[-1][0] - frames[0][0]
+    gravador_evidencias.enviar_tarefa(
+        lambda: salvar_sequencia(frames, caminho), caminho,
+        f"Caixa-preta ({len(frames)} frames, {duracao:.1f}s)"
+    )
+    return caminho
+
 # --- 3. Funções de Notificação (Telegram) ---
-def enviar_notificacao_telegram(mensagem: str, imagens: list = None):
-    """Envia uma notificação completa (texto, logs, imagens) para o Telegram."""
+def enviar_notificacao_telegram(mensagem: str, imagens: list = None, aguardar: bool = False) -> bool:
+    """
+    Envia uma notificação completa (texto, logs, imagens) para o Telegram.
+
+    O envio acontece em segundo plano (ver TelegramNotifier): esta função só
+    monta o texto com os últimos registros do log e o coloca na fila. Use
+    'aguardar=True' para esperar o envio (limitado por TELEGRAM_FLUSH_TIMEOUT).
+    Retorna True se a notificação foi enfileirada.
+    """
     if not TELEGRAM_ENABLED:
         logging.warning("Notificações do Telegram estão desabilitadas no config.py")
-        return
+        return False
 
     token = os.getenv('TELEGRAM_TOKEN')
     chat_id = os.getenv('TELEGRAM_CHAT_ID')
 
     if not token or not chat_id:
         logging.error("ERRO DE NOTIFICAÇÃO: Variáveis TELEGRAM_TOKEN ou TELEGRAM_CHAT_ID não definidas no .env")
-        return
+        return False
 
     logging.info("Iniciando envio de notificação para o Telegram...")
-    try:
-        log_info = get_last_log_lines()
-        texto_completo = (
-            f"🚨 *{TELEGRAM_NOTIFICATION_TITLE}* 🚨\n\n"
-            f"*{mensagem}*\n\n"
-            f"📋 *Últimos registros do log:*\n"
-            f"```\n{log_info}\n```"
-        )
-        url_msg = f"https://api.telegram.org/bot{token}/sendMessage"
-        payload_msg = {'chat_id': chat_id, 'text': texto_completo, 'parse_mode': 'Markdown'}
-        requests.post(url_msg, json=payload_msg, timeout=10)
-    except Exception as e:
-        logging.error(f"Falha ao enviar mensagem de texto ao Telegram: {e}")
-
-    if imagens:
-        for img_path in imagens:
-            if not os.path.exists(img_path):
-                logging.error(f"Imagem de erro não encontrada para envio: {img_path}")
-                continue
-            try:
-                url_img = f"https://api.telegram.org/bot{token}/sendPhoto"
-                with open(img_path, 'rb') as photo_file:
-                    files = {'photo': photo_file}
-                    payload_img = {'chat_id': chat_id, 'caption': f'Evidência do erro: {os.path.basename(img_path)}'}
-                    requests.post(url_img, files=files, data=payload_img, timeout=20)
-            except Exception as e:
-                logging.error(f"Falha ao enviar imagem '{img_path}' ao Telegram: {e}")
-    logging.info("Notificação para o Telegram finalizada.")
+    log_info = get_last_log_lines()
+    texto_completo = (
+        f"🚨 *{TELEGRAM_NOTIFICATION_TITLE}* 🚨\n\n"
+        f"*{mensagem}*\n\n"
+        f"📋 *Últimos registros do log:*\n"
+        f"```\n{log_info}\n```"
+    )
+    enfileirada = telegram_notifier.enviar(token, chat_id, texto_completo, imagens)
+    if enfileirada and aguardar:
+        telegram_notifier.flush()
+    return enfileirada
+
+def flush_notificacoes(timeout: float = None) -> bool:
+    """Espera as notificações pendentes serem enviadas (padrão: TELEGRAM_FLUSH_TIMEOUT)."""
+    return telegram_notifier.flush() if timeout is None else telegram_notifier.flush(timeout)
 
 # --- 4. Medição de Performance e ROI ---
 class PerformanceTimer:
-    """Classe para medir tempo de execução, iterações e calcular o tempo humano economizado."""
-    def __init__(self, human_time_per_iteration_sec: int = 0):
+    """
+    Classe para medir tempo de execução, iterações e calcular o tempo humano economizado.
+
+    Cada lap() guarda a duração da iteração num array compacto (float64), de
+    onde saem mediana/p90/p99, mín/máx, throughput e o ETA. No stop(), o
+    resumo da execução é acrescentado ao histórico (PERF_HISTORY_FILE) e
+    comparado com a mediana das últimas execuções: se a iteração ficou mais
+    lenta que PERF_REGRESSION_THRESHOLD, o relatório marca 'regressao'.
+    """
+    def __init__(self, human_time_per_iteration_sec: int = 0, journal=None,
+                 total_esperado: int = None, historico: str = PERF_HISTORY_FILE):
+        """
+        'journal' (ProgressJournal, opcional) inclui no relatório as execuções anteriores retomadas.
+        'total_esperado' é o nº de iterações previstas nesta execução (para o ETA; ver definir_total).
+        'historico' é o arquivo JSONL com os resumos das execuções (None desliga).
+        """
+        self.journal = journal
+        self.total_esperado = total_esperado
+        self.historico = historico
         self.start_time = None
         self.lap_start_time = None
         self.lap_count = 0
+        self.laps = array('d')
         self.total_time = 0
         self.human_time_per_iteration = human_time_per_iteration_sec
         logging.info(f"Timer de ROI inicializado (Tempo humano p/ tarefa: {human_time_per_iteration_sec}s)")
@@ -112,15 +179,59 @@ class PerformanceTimer:
         self.lap_start_time = self.start_time
         logging.info("Cronômetro de performance iniciado.")
 
-    def lap(self):
-        """Marca a conclusão de uma iteração."""
+    def definir_total(self, total_esperado: int):
+        """Informa quantas iterações esta execução deve fazer (habilita o ETA no log)."""
+        self.total_esperado = total_esperado
+
+    def iniciar_lap(self):
+        """
+        Marca o início de uma iteração. Chame logo antes do trabalho da linha
+        para que o lap() não inclua o que veio antes (pausa do operador,
+        linhas puladas); sem isso, a iteração começa no lap() anterior.
+        """
+        self.lap_start_time = time.time()
+
+    def lap(self, restantes: int = None):
+        """
+        Marca a conclusão de uma iteração (medida desde o iniciar_lap() ou o
+        lap() anterior). 'restantes' (opcional) é o nº de iterações que ainda
+        faltam; sem ele, usa o total_esperado.
+        """
         if not self.start_time:
             logging.warning("Timer.start() não foi chamado. Ignorando 'lap'.")
             return
-        lap_time = time.time() - self.lap_start_time
+        agora = time.time()
+        lap_time = agora - self.lap_start_time
+        self.laps.append(lap_time)
         self.lap_count += 1
-        logging.info(f"Iteração {self.lap_count} concluída em {lap_time:.2f}s")
-        self.lap_start_time = time.time()
+        self.lap_start_time = agora
+
+        if restantes is None and self.total_esperado:
+            restantes = max(0, self.total_esperado - self.lap_count)
+        if restantes:
+            eta = self.eta(restantes)
+            logging.info(f"Iteração {self.lap_count} concluída em {lap_time:.2f}s | "
+                         f"Faltam {restantes} (ETA: {eta / 60:.1f} min, ~{datetime.fromtimestamp(agora + eta):%H:%M})")
+        else:
+            logging.info(f"Iteração {self.lap_count} concluída em {lap_time:.2f}s")
+
+    def eta(self, restantes: int) -> float:
+        """Segundos estimados para 'restantes' iterações, pela média das últimas PERF_ETA_WINDOW."""
+        if not self.laps:
+            return 0.0
+        recentes = self.laps[-PERF_ETA_WINDOW:]
+        return restantes * sum(recentes) / len(recentes)
+
+    def estatisticas(self) -> dict:
+        """Estatísticas das iterações desta execução (segundos)."""
+        if not self.laps:
+            return {}
+        laps = np.frombuffer(self.laps, dtype=np.float64)
+        p50, p90, p99 = np.percentile(laps, [50, 90, 99])
+        return {
+            "p50_sec": float(p50), "p90_sec": float(p90), "p99_sec": float(p99),
+            "min_sec": float(laps.min()), "max_sec": float(laps.max()),
+        }
 
     def stop(self) -> dict:
         """Para o cronômetro e gera o relatório final no log."""
@@ -135,6 +246,8 @@ class PerformanceTimer:
             "total_time_sec": self.total_time,
             "total_iterations": self.lap_count,
             "avg_time_per_iteration_sec": avg_lap,
+            "throughput_per_hour": (self.lap_count / self.total_time * 3600) if self.total_time else 0,
+            **self.estatisticas(),
             "human_time_saved_sec": 0,
             "human_time_saved_hours": 0
         }
@@ -143,6 +256,10 @@ class PerformanceTimer:
         logging.info(f"Tempo Total de Execução: {self.total_time:.2f} segundos")
         logging.info(f"Total de Iterações Concluídas: {self.lap_count}")
         logging.info(f"Tempo Médio por Iteração: {avg_lap:.2f} segundos")
+        if self.laps:
+            logging.info(f"Por Iteração: mediana {report['p50_sec']:.2f}s | p90 {report['p90_sec']:.2f}s | "
+                         f"p99 {report['p99_sec']:.2f}s | mín {report['min_sec']:.2f}s | máx {report['max_sec']:.2f}s")
+            logging.info(f"Throughput: {report['throughput_per_hour']:.1f} iterações/hora")
 
         if self.human_time_per_iteration > 0 and self.lap_count > 0:
             human_total_time = self.human_time_per_iteration * self.lap_count
@@ -157,4 +274,58 @@ class PerformanceTimer:
             logging.info(f"Tempo da Automação: {self.total_time / 60:.2f} minutos")
             logging.info(f"TEMPO ECONOMIZADO NESTA EXECUÇÃO: {time_saved_sec:.2f} segundos (~{time_saved_hours:.2f} horas)")
         
-        return report
\ No newline at end of file
+        if self.journal is not None:
+            resumo = self.journal.resumo()
+            report["journal"] = resumo
+            logging.info("--- Relatório Acumulado (Todas as Execuções Retomadas) ---")
+            logging.info(f"Segmentos de execução: {resumo['segmentos']}")
+            logging.info(f"Linhas concluídas: {resumo['linhas_concluidas']} | Com erro: {resumo['linhas_com_erro']}")
+            logging.info(f"Tempo Total Acumulado: {resumo['tempo_total_sec']:.2f} segundos")
+
+        if self.historico:
+            self._comparar_com_historico(report)
+        
+        return report
+
+    # --- Histórico entre execuções ---
+    def _ler_historico(self) -> list:
+        if not os.path.exists(self.historico):
+            return []
+        execucoes = []
+        with open(self.historico, 'r', encoding='utf-8') as f:
+            for linha in f:
+                try:
+                    execucoes.append(json.loads(linha))
+                except json.JSONDecodeError:
+                    continue
+        return execucoes
+
+    def _comparar_com_historico(self, report: dict):
+        """Compara a mediana por iteração com as últimas execuções e grava esta no histórico."""
+        try:
+            anteriores = [e for e in self._ler_historico()
+                          if e.get("total_iterations", 0) >= PERF_MIN_LAPS and e.get("p50_sec")]
+            anteriores = anteriores[-PERF_BASELINE_RUNS:]
+            report["regressao"] = False
+            if anteriores and self.lap_count >= PERF_MIN_LAPS:
+                referencia = float(np.median([e["p50_sec"] for e in anteriores]))
+                variacao = report["p50_sec"] / referencia - 1 if referencia else 0.0
+                report["baseline_p50_sec"] = referencia
+                report["variacao_vs_baseline"] = variacao
+                if variacao > PERF_REGRESSION_THRESHOLD:
+                    report["regressao"] = True
+                    logging.warning(f"REGRESSÃO DE PERFORMANCE: mediana por iteração {report['p50_sec']:.2f}s, "
+                                    f"{variacao:+.0%} em relação às últimas {len(anteriores)} execuções ({referencia:.2f}s).")
+                else:
+                    logging.info(f"Mediana por iteração {variacao:+.0%} em relação às últimas {len(anteriores)} execuções.")
+
+            resumo = {"data": datetime.now().isoformat(timespec='seconds')}
+            resumo.update({k: report[k] for k in (
+                "total_time_sec", "total_iterations", "avg_time_per_iteration_sec", "throughput_per_hour",
+                "p50_sec", "p90_sec", "p99_sec", "min_sec", "max_sec", "regressao"
+            ) if k in report})
+            if self.lap_count:
+                with open(self.historico, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(resumo, ensure_ascii=False) + "\n")
+        except Exception as e:
+            logging.error(f"Falha ao atualizar o histórico de performance: {e}")
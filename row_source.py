@@ -0,0 +1,158 @@
+import os
+import csv
+import logging
+from itertools import islice
+
+import pandas as pd
+
+from config import ROW_SOURCE_CHUNK_SIZE
+
+class RowSource:
+    """
+    Fonte de linhas para o loop principal, lida sob demanda (streaming).
+
+    Aceita .xlsx/.xlsm (openpyxl em modo read-only), .csv (separador ',' ou ';'
+    detectado pelo cabeçalho) e .parquet (pyarrow, em lotes). O cabeçalho é
+    lido e validado na criação, ANTES de qualquer linha de dados: se faltar
+    uma coluna obrigatória, lança ValueError na hora.
+
+    As linhas são lidas em blocos de 'chunk_size'; cada bloco vira um
+    DataFrame pequeno, os tipos de 'tipos' (ex: {'numero': str}) são
+    normalizados de forma vetorizada e as linhas são entregues como
+    namedtuples leves (linha.numero, linha.filial...).
+
+    Uso:
+        with RowSource("empresas.xlsx", ['numero', 'filial'], {'numero': str}) as linhas:
+            for linha in linhas:
+                ...
+    """
+    def __init__(self,
+                 caminho: str,
+                 colunas_obrigatorias: list = None,
+                 tipos: dict = None,
+                 chunk_size: int = ROW_SOURCE_CHUNK_SIZE):
+        self.caminho = caminho
+        self.tipos = tipos or {}
+        self.chunk_size = chunk_size
+        self.total_estimado = None  # Nº de linhas de dados, quando o formato informa sem ler tudo
+        self._fechar = []
+
+        extensao = os.path.splitext(caminho)[1].lower()
+        if extensao in ('.xlsx', '.xlsm'):
+            self.colunas, self._linhas = self._abrir_excel()
+        elif extensao == '.csv':
+            self.colunas, self._linhas = self._abrir_csv()
+        elif extensao == '.parquet':
+            self.colunas, self._linhas = self._abrir_parquet()
+        else:
+            raise ValueError(f"Formato de entrada não suportado: '{extensao}' (use .xlsx, .csv ou .parquet).")
+
+        faltando = [c for c in (colunas_obrigatorias or []) if c not in self.colunas]
+        if faltando:
+            self.close()
+            raise ValueError(
+                f"O arquivo '{caminho}' não contém as colunas {faltando}. "
+                f"Colunas encontradas: {self.colunas}"
+            )
+        logging.info(f"Fonte de linhas aberta: '{caminho}' ({len(self.colunas)} colunas, ~{self.total_estimado or '?'} linhas).")
+
+    # --- Abertura por formato (retornam cabeçalho + iterador de tuplas) ---
+    def _abrir_excel(self):
+        from openpyxl import load_workbook
+        workbook = load_workbook(self.caminho, read_only=True, data_only=True)
+        self._fechar.append(workbook.close)
+        planilha = workbook.active
+        linhas = planilha.iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            raise ValueError(f"A planilha '{self.caminho}' está vazia.")
+        if planilha.max_row:
+            self.total_estimado = planilha.max_row - 1
+        # Ignora linhas totalmente vazias (comuns no fim de planilhas editadas à mão)
+        dados = (linha for linha in linhas if any(v is not None for v in linha))
+        return _normalizar_cabecalho(cabecalho), dados
+
+    def _abrir_csv(self):
+        arquivo = open(self.caminho, 'r', encoding='utf-8-sig', newline='')
+        self._fechar.append(arquivo.close)
+        primeira = arquivo.readline()
+        separador = ';' if primeira.count(';') > primeira.count(',') else ','
+        cabecalho = next(csv.reader([primeira], delimiter=separador), [])
+        dados = (linha for linha in csv.reader(arquivo, delimiter=separador) if any(linha))
+        return _normalizar_cabecalho(cabecalho), dados
+
+    def _abrir_parquet(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Leitura de .parquet requer 'pyarrow' (pip install pyarrow).")
+        arquivo = pq.ParquetFile(self.caminho)
+        self.total_estimado = arquivo.metadata.num_rows
+        cabecalho = list(arquivo.schema_arrow.names)
+
+        def dados():
+            for lote in arquivo.iter_batches(batch_size=self.chunk_size):
+                colunas = [lote.column(i).to_pylist() for i in range(lote.num_columns)]
+                yield from zip(*colunas)
+        return _normalizar_cabecalho(cabecalho), dados()
+
+    # --- Iteração ---
+    def __iter__(self):
+        largura = len(self.colunas)
+        while True:
+            bloco = list(islice(self._linhas, self.chunk_size))
+            if not bloco:
+                break
+            # Completa/corta linhas irregulares para o tamanho do cabeçalho
+            bloco = [tuple(linha[:largura]) + (None,) * (largura - len(linha)) for linha in bloco]
+            df = pd.DataFrame.from_records(bloco, columns=self.colunas)
+            for coluna, tipo in self.tipos.items():
+                if coluna in df.columns:
+                    df[coluna] = _converter_coluna(df[coluna], tipo)
+            yield from df.itertuples(index=False, name='Linha')
+
+    def close(self):
+        for fechar in self._fechar:
+            try:
+                fechar()
+            except Exception:
+                pass
+        self._fechar = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _normalizar_cabecalho(cabecalho) -> list:
+    return [str(c).strip() if c is not None else f"coluna_{i}" for i, c in enumerate(cabecalho)]
+
+# Número escrito com parte decimal e/ou expoente (como str(float) escreve): '123.0', '-4.50', '1e+16'
+_NUMERO_COM_DECIMAIS = r'[+-]?\d+(?:\.\d*(?:e[+-]\d+)?|e[+-]\d+)'
+
+def _converter_coluna(serie: pd.Series, tipo) -> pd.Series:
+    """
+    Normaliza o tipo de uma coluna inteira de uma vez (vetorizado).
+
+    Para str, o mesmo valor sai igual em qualquer formato de entrada: números
+    inteiros vindos do Excel/Parquet como float (123.0) e textos com cara de
+    número inteiro com decimais ('123.0', '1e+16', como no CSV) viram '123'.
+    Textos só com dígitos ficam como estão (preserva zeros à esquerda, ex:
+    '0012'), assim como qualquer outro texto (ex: '12E3', '12.5').
+    """
+    if tipo is str:
+        texto = serie.astype(object).where(serie.notna(), '').astype(str).str.strip()
+        if pd.api.types.is_numeric_dtype(serie):
+            numeros = serie
+        else:
+            com_decimais = texto.str.fullmatch(_NUMERO_COM_DECIMAIS)
+            numeros = pd.to_numeric(texto.where(com_decimais), errors='coerce')
+        inteiros = numeros.notna() & (numeros % 1 == 0)
+        texto[inteiros] = numeros[inteiros].astype('int64').astype(str)
+        return texto
+    if tipo is int:
+        return pd.to_numeric(serie, errors='raise').astype('Int64')
+    if tipo is float:
+        return pd.to_numeric(serie, errors='raise').astype(float)
+    raise ValueError(f"Tipo de coluna não suportado: {tipo} (use str, int ou float).")
@@ -0,0 +1,237 @@
+import os
+import sys
+import glob
+import logging
+import threading
+
+import cv2
+import numpy as np
+
+from config import CAPTURE_BACKEND, FAKE_CAPTURE_SOURCE, WORKER_DISPLAY
+from tracing import medir, somar
+from black_box import caixa_preta
+
+class CaptureError(Exception):
+    """Falha (normalmente temporária) ao capturar a tela, independente do backend."""
+
+# --- 1. Backends de Captura ---
+class CaptureBackend:
+    """
+    Interface comum dos backends. grab() retorna SEMPRE um array NumPy BGR
+    (uint8, HxWx3), o mesmo formato dos templates do OpenCV, sem passar por PNG.
+    'region' é (left, top, width, height) em coordenadas de tela; None = tela principal.
+    """
+    nome = "base"
+
+    def grab(self, region: tuple = None) -> np.ndarray:
+        raise NotImplementedError
+
+    def size(self) -> tuple:
+        """Retorna (largura, altura) da tela principal."""
+        frame = self.grab()
+        return frame.shape[1], frame.shape[0]
+
+    def peek(self, region: tuple = None) -> np.ndarray:
+        """
+        Captura para quem só observa a tela (ex.: a caixa-preta), sem efeito
+        na automação. Nos backends reais é o próprio grab().
+        """
+        return self.grab(region)
+
+    def close(self):
+        pass
+
+class PyAutoGUIBackend(CaptureBackend):
+    """Backend original (pyautogui/pyscreeze). Funciona em qualquer lugar, mas é o mais lento."""
+    nome = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+
+    def grab(self, region: tuple = None) -> np.ndarray:
+        try:
+            screenshot = self._pyautogui.screenshot(region=region)
+        except Exception as e:
+            raise CaptureError(f"Falha no screenshot do pyautogui: {e}") from e
+        return cv2.cvtColor(np.asarray(screenshot), cv2.COLOR_RGB2BGR)
+
+    def size(self) -> tuple:
+        return tuple(self._pyautogui.size())
+
+class MSSBackend(CaptureBackend):
+    """
+    Backend rápido via 'mss' (X11 com XShm no Linux, GDI/DXGI no Windows).
+    Lê os pixels direto da memória, sem codificar PNG. Uma instância de mss
+    por thread (o objeto do mss não é thread-safe).
+
+    No Linux, 'display' (padrão: WORKER_DISPLAY, definido pelo parallel_runner)
+    escolhe o servidor X capturado; sem ele, vale a variável DISPLAY.
+    """
+    nome = "mss"
+
+    def __init__(self, display: str = WORKER_DISPLAY):
+        import mss  # Dependência opcional: o get_backend() trata o ImportError
+        self._mss = mss
+        self._kwargs = {"display": display} if (display and sys.platform.startswith("linux")) else {}
+        self._local = threading.local()
+
+    def _sct(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            sct = self._mss.mss(**self._kwargs)
+            self._local.sct = sct
+        return sct
+
+    def grab(self, region: tuple = None) -> np.ndarray:
+        sct = self._sct()
+        if region:
+            left, top, width, height = (int(v) for v in region)
+            monitor = {"left": left, "top": top, "width": width, "height": height}
+        else:
+            monitor = sct.monitors[1]  # Tela principal (mesma referência do pyautogui)
+        try:
+            shot = sct.grab(monitor)
+        except Exception as e:
+            raise CaptureError(f"Falha no screenshot do mss: {e}") from e
+        return cv2.cvtColor(np.asarray(shot), cv2.COLOR_BGRA2BGR)
+
+    def size(self) -> tuple:
+        monitor = self._sct().monitors[1]
+        return monitor["width"], monitor["height"]
+
+    def close(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is not None:
+            sct.close()
+            self._local.sct = None
+
+class FakeBackend(CaptureBackend):
+    """
+    Backend falso para testes e benchmarks sem tela: serve frames a partir de
+    arquivos de imagem. 'fonte' pode ser um arquivo ou uma pasta (os arquivos
+    são servidos em ordem alfabética, um por captura, repetindo o último).
+    set_frame()/set_frames() trocam a sequência por arrays em memória.
+    """
+    nome = "fake"
+
+    def __init__(self, fonte: str = FAKE_CAPTURE_SOURCE):
+        self._lock = threading.Lock()
+        self._frames = []
+        self._indice = 0
+        if fonte:
+            if os.path.isdir(fonte):
+                arquivos = sorted(
+                    f for f in glob.glob(os.path.join(fonte, "*"))
+                    if f.lower().endswith((".png", ".jpg", ".jpeg", ".bmp"))
+                )
+            else:
+                arquivos = [fonte]
+            self._frames = [ler_imagem(f) for f in arquivos]
+        self.grabs = 0
+
+    def set_frame(self, frame: np.ndarray):
+        """Substitui a sequência por um único frame BGR (útil para simular mudanças de tela)."""
+        self.set_frames([frame])
+
+    def set_frames(self, frames: list):
+        """Substitui a sequência por vários frames BGR, servidos em ordem (o último se repete)."""
+        with self._lock:
+            self._frames = list(frames)
+            self._indice = 0
+
+    def size(self) -> tuple:
+        """Tamanho do frame atual, sem avançar a sequência."""
+        with self._lock:
+            if not self._frames:
+                raise CaptureError("FakeBackend sem frames (defina FAKE_CAPTURE_SOURCE ou use set_frame).")
+            frame = self._frames[min(self._indice, len(self._frames) - 1)]
+        return frame.shape[1], frame.shape[0]
+
+    def grab(self, region: tuple = None) -> np.ndarray:
+        return self._servir(region, avancar=True)
+
+    def peek(self, region: tuple = None) -> np.ndarray:
+        """Frame atual, sem avançar a sequência nem contar em 'grabs'."""
+        return self._servir(region, avancar=False)
+
+    def _servir(self, region: tuple, avancar: bool) -> np.ndarray:
+        with self._lock:
+            if not self._frames:
+                raise CaptureError("FakeBackend sem frames (defina FAKE_CAPTURE_SOURCE ou use set_frame).")
+            frame = self._frames[min(self._indice, len(self._frames) - 1)]
+            if avancar:
+                self._indice += 1
+                self.grabs += 1
+        if region:
+            left, top, width, height = (int(v) for v in region)
+            # Fora da tela vira preto, como numa captura real parcial
+            saida = np.zeros((height, width, 3), dtype=np.uint8)
+            x0, y0 = max(0, left), max(0, top)
+            x1 = min(frame.shape[1], left + width)
+            y1 = min(frame.shape[0], top + height)
+            if x1 > x0 and y1 > y0:
+                saida[y0 - top:y1 - top, x0 - left:x1 - left] = frame[y0:y1, x0:x1]
+            return saida
+        return frame.copy()
+
+# --- 2. Seleção do Backend (config.CAPTURE_BACKEND) ---
+_BACKENDS = {
+    "pyautogui": PyAutoGUIBackend,
+    "mss": MSSBackend,
+    "fake": FakeBackend,
+}
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend() -> CaptureBackend:
+    """Retorna o backend configurado (criado na primeira chamada)."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _criar_backend(CAPTURE_BACKEND)
+        return _backend
+
+def set_backend(backend):
+    """Troca o backend em uso. Aceita uma instância ou o nome ('pyautogui', 'mss', 'fake')."""
+    global _backend
+    with _backend_lock:
+        if _backend is not None:
+            _backend.close()
+        _backend = _criar_backend(backend) if isinstance(backend, str) else backend
+        return _backend
+
+def _criar_backend(nome: str) -> CaptureBackend:
+    if nome not in _BACKENDS:
+        raise ValueError(f"Backend de captura desconhecido: '{nome}' (opções: {list(_BACKENDS)}).")
+    try:
+        backend = _BACKENDS[nome]()
+    except ImportError:
+        logging.warning(f"Backend de captura '{nome}' indisponível (instale 'mss'). Usando 'pyautogui'.")
+        backend = PyAutoGUIBackend()
+    logging.debug(f"Backend de captura em uso: {backend.nome}")
+    return backend
+
+# --- 3. Atalhos usados pelos helpers ---
+def capturar_tela(region: tuple = None) -> np.ndarray:
+    """Captura a tela (ou uma região) como array BGR usando o backend configurado."""
+    with medir("captura_sec"):
+        frame = get_backend().grab(region)
+    somar("capturas")
+    caixa_preta.registrar(frame, region)  # Reaproveita o frame na caixa-preta (retorna na hora)
+    return frame
+
+def ler_imagem(caminho: str) -> np.ndarray:
+    """Lê uma imagem do disco como BGR (aceita caminhos com acento no Windows)."""
+    imagem = cv2.imdecode(np.fromfile(caminho, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if imagem is None:
+        raise IOError(f"Não foi possível ler a imagem: {caminho}")
+    return imagem
+
+def salvar_frame(frame: np.ndarray, caminho: str, params: list = None):
+    """Codifica e grava um frame BGR no formato da extensão do arquivo (.png, .jpg...)."""
+    extensao = os.path.splitext(caminho)[1] or ".png"
+    ok, dados = cv2.imencode(extensao, frame, params or [])
+    if not ok:
+        raise IOError(f"Falha ao codificar a imagem: {caminho}")
+    dados.tofile(caminho)
@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+
+import cv2
+import requests
+
+from config import (
+    TELEGRAM_API_BASE, TELEGRAM_QUEUE_SIZE, TELEGRAM_TIMEOUT, TELEGRAM_MAX_RETRIES,
+    TELEGRAM_BACKOFF, TELEGRAM_MIN_INTERVAL, TELEGRAM_IMAGE_MAX_SIDE,
+    TELEGRAM_IMAGE_QUALITY, TELEGRAM_FLUSH_TIMEOUT
+)
+from screen_capture import ler_imagem
+from error_evidence import gravador_evidencias
+
+# Limites da API do Telegram
+_MAX_TEXTO = 4096
+_MAX_LEGENDA = 1024
+_MAX_ALBUM = 10
+
+class TelegramError(Exception):
+    """Falha definitiva numa chamada à API do Telegram (após as tentativas)."""
+
+class TelegramNotifier:
+    """
+    Envia notificações ao Telegram em segundo plano.
+
+    enviar() só coloca a notificação numa fila e retorna na hora: quem falhou
+    (o loop da automação) não espera a rede. Uma thread faz o envio:
+    - uma única requests.Session (conexão reaproveitada entre as chamadas);
+    - texto com sendMessage; imagens num álbum só (sendMediaGroup, até 10 por
+      chamada), reduzidas para TELEGRAM_IMAGE_MAX_SIDE e enviadas como JPEG;
+    - no máx. uma chamada a cada TELEGRAM_MIN_INTERVAL seg.; erros de rede,
+      5xx e 429 (respeitando o 'retry_after') são tentados de novo com backoff.
+
+    flush() espera os envios pendentes por no máx. 'timeout' seg. (também
+    chamado na saída do programa). 'api_base' permite apontar para um servidor
+    local nos testes; sem ele, vale a variável de ambiente TELEGRAM_API_BASE
+    (lida no envio, depois do load_dotenv) ou o TELEGRAM_API_BASE do config.
+    """
+    def __init__(self,
+                 api_base: str = None,
+                 max_fila: int = TELEGRAM_QUEUE_SIZE,
+                 timeout: tuple = TELEGRAM_TIMEOUT,
+                 max_tentativas: int = TELEGRAM_MAX_RETRIES,
+                 intervalo_minimo: float = TELEGRAM_MIN_INTERVAL):
+        self.api_base = api_base
+        self.timeout = timeout
+        self.max_tentativas = max_tentativas
+        self.intervalo_minimo = intervalo_minimo
+        self.enviados = 0
+        self.descartados = 0
+        self.falhas = 0
+        self._fila = queue.Queue(maxsize=max_fila)
+        self._session = None
+        self._ultima_chamada = 0.0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _iniciar(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name="TelegramNotifier", daemon=True)
+                self._thread.start()
+
+    def enviar(self, token: str, chat_id: str, texto: str, imagens: list = None,
+               parse_mode: str = "Markdown") -> bool:
+        """Enfileira uma notificação (texto + caminhos de imagens). Retorna False se a fila estava cheia."""
+        self._iniciar()
+        try:
+            self._fila.put_nowait((token, chat_id, texto, list(imagens or []), parse_mode))
+            return True
+        except queue.Full:
+            self.descartados += 1
+            logging.error("Fila de notificações do Telegram cheia. Notificação descartada.")
+            return False
+
+    def _worker(self):
+        while True:
+            token, chat_id, texto, imagens, parse_mode = self._fila.get()
+            try:
+                self._entregar(token, chat_id, texto, imagens, parse_mode)
+                self.enviados += 1
+                logging.info("Notificação para o Telegram finalizada.")
+            except Exception as e:
+                self.falhas += 1
+                logging.error(f"Falha ao enviar notificação ao Telegram: {e}")
+            finally:
+                self._fila.task_done()
+
+    # --- Envio ---
+    def _entregar(self, token: str, chat_id: str, texto: str, imagens: list, parse_mode: str):
+        payload = {"chat_id": chat_id, "text": texto[:_MAX_TEXTO]}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+        try:
+            self._chamar(token, "sendMessage", json=payload)
+        except TelegramError as e:
+            # Logs com '_' ou '*' soltos quebram o Markdown: reenvia como texto puro
+            if parse_mode and "parse" in str(e).lower():
+                payload.pop("parse_mode")
+                self._chamar(token, "sendMessage", json=payload)
+            else:
+                raise
+
+        fotos = []
+        gravador_evidencias.aguardar(imagens)  # Screenshots de erro ainda podem estar sendo gravados
+        for caminho in imagens:
+            if not os.path.exists(caminho):
+                logging.error(f"Imagem de erro não encontrada para envio: {caminho}")
+                continue
+            try:
+                fotos.append((os.path.basename(caminho), self._preparar_imagem(caminho)))
+            except Exception as e:
+                logging.error(f"Falha ao preparar a imagem '{caminho}' para o Telegram: {e}")
+
+        for inicio in range(0, len(fotos), _MAX_ALBUM):
+            lote = fotos[inicio:inicio + _MAX_ALBUM]
+            legenda = f"Evidência do erro: {', '.join(nome for nome, _ in lote)}"[:_MAX_LEGENDA]
+            if len(lote) == 1:
+                nome, dados = lote[0]
+                self._chamar(token, "sendPhoto", data={"chat_id": chat_id, "caption": legenda},
+                             files={"photo": (nome, dados, "image/jpeg")})
+                continue
+            midia = [{"type": "photo", "media": f"attach://foto{i}"} for i in range(len(lote))]
+            midia[0]["caption"] = legenda
+            self._chamar(token, "sendMediaGroup",
+                         data={"chat_id": chat_id, "media": json.dumps(midia, ensure_ascii=False)},
+                         files={f"foto{i}": (nome, dados, "image/jpeg") for i, (nome, dados) in enumerate(lote)})
+
+    def _preparar_imagem(self, caminho: str) -> bytes:
+        """Lê a imagem, reduz para TELEGRAM_IMAGE_MAX_SIDE (lado maior) e codifica em JPEG."""
+        imagem = ler_imagem(caminho)
+        altura, largura = imagem.shape[:2]
+        escala = TELEGRAM_IMAGE_MAX_SIDE / max(altura, largura)
+        if escala < 1:
+            imagem = cv2.resize(imagem, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+        ok, dados = cv2.imencode(".jpg", imagem, [cv2.IMWRITE_JPEG_QUALITY, TELEGRAM_IMAGE_QUALITY])
+        if not ok:
+            raise IOError(f"Falha ao codificar a imagem em JPEG: {caminho}")
+        return dados.tobytes()
+
+    def _chamar(self, token: str, metodo: str, **kwargs) -> dict:
+        """POST na API com limite de ritmo e novas tentativas (rede, 5xx e 429)."""
+        if self._session is None:
+            self._session = requests.Session()
+        api_base = self.api_base or os.getenv('TELEGRAM_API_BASE') or TELEGRAM_API_BASE
+        url = f"{api_base.rstrip('/')}/bot{token}/{metodo}"
+        espera = TELEGRAM_BACKOFF
+        for tentativa in range(1, self.max_tentativas + 1):
+            self._respeitar_intervalo()
+            try:
+                resposta = self._session.post(url, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                erro = f"{type(e).__name__}: {e}"
+            else:
+                if resposta.ok:
+                    return resposta.json()
+                descricao = _descricao(resposta)
+                if resposta.status_code == 429:
+                    espera = max(espera, _retry_after(resposta))
+                elif resposta.status_code < 500:
+                    raise TelegramError(f"{metodo}: HTTP {resposta.status_code} - {descricao}")
+                erro = f"HTTP {resposta.status_code} - {descricao}"
+            if tentativa == self.max_tentativas:
+                break
+            logging.warning(f"Telegram ({metodo}): {erro}. Nova tentativa em {espera:.1f}s ({tentativa}/{self.max_tentativas}).")
+            time.sleep(espera)
+            espera *= 2
+        raise TelegramError(f"{metodo}: {erro} (após {self.max_tentativas} tentativas)")
+
+    def _respeitar_intervalo(self):
+        restante = self._ultima_chamada + self.intervalo_minimo - time.time()
+        if restante > 0:
+            time.sleep(restante)
+        self._ultima_chamada = time.time()
+
+    def flush(self, timeout: float = TELEGRAM_FLUSH_TIMEOUT) -> bool:
+        """Espera (no máx. 'timeout' seg.) os envios pendentes. Retorna True se a fila esvaziou."""
+        limite = time.time() + timeout
+        with self._fila.all_tasks_done:
+            while self._fila.unfinished_tasks:
+                restante = limite - time.time()
+                if restante <= 0:
+                    logging.warning(f"Telegram: {self._fila.unfinished_tasks} notificação(ões) não enviadas (timeout do flush).")
+                    return False
+                self._fila.all_tasks_done.wait(restante)
+        return True
+
+def _descricao(resposta) -> str:
+    try:
+        return resposta.json().get("description", "")
+    except ValueError:
+        return resposta.text[:200]
+
+def _retry_after(resposta) -> float:
+    """Segundos pedidos pelo Telegram num 429 (campo parameters.retry_after)."""
+    try:
+        return float(resposta.json().get("parameters", {}).get("retry_after", 0))
+    except (ValueError, AttributeError):
+        return 0.0
+
+# Instância única usada por reporting.enviar_notificacao_telegram
+telegram_notifier = TelegramNotifier()
+atexit.register(telegram_notifier.flush)
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import atexit
+import inspect
+import logging
+import argparse
+import functools
+import itertools
+import threading
+
+from config import TRACE_ENABLED, TRACE_FILE, TRACE_CHROME_EXPORT
+
+# --- 1. Spans ---
+# Um span mede UMA chamada de helper (esperar_imagem, safe_click...). Enquanto
+# ele está aberto, os módulos de baixo (captura, matching, polling, pacing)
+# somam nele o tempo gasto em cada etapa:
+#   polls, capturas, captura_sec, match_sec, melhor_score, sleep_sec,
+#   pacing_sec, acao_sec (pyautogui, já incluindo o GLOBAL_PAUSE) e pausa_sec
+#   (a parte de acao_sec que foi GLOBAL_PAUSE).
+# As métricas são inclusivas: um span filho (ex: _capture_click_area dentro do
+# safe_click) também soma no pai, como a própria duração.
+#
+# Com TRACE_ENABLED = False, tudo aqui vira no-op (uma checagem de variável).
+
+_ativo = TRACE_ENABLED
+_ids = itertools.count(1)
+_local = threading.local()
+_lock = threading.Lock()
+_arquivo = None
+
+class Span:
+    __slots__ = ("nome", "id", "pai", "inicio", "_t0", "atributos", "metricas")
+
+    def __init__(self, nome: str, pai, atributos: dict):
+        self.nome = nome
+        self.id = next(_ids)
+        self.pai = pai
+        self.inicio = time.time()
+        self._t0 = time.perf_counter()
+        self.atributos = atributos
+        self.metricas = {}
+
+def _pilha() -> list:
+    pilha = getattr(_local, "pilha", None)
+    if pilha is None:
+        pilha = _local.pilha = []
+    return pilha
+
+class span:
+    """
+    Abre um span (use com 'with'). Ex:
+        with span("login", usuario="x"):
+            ...
+    Uma exceção dentro do bloco é registrada no span e propagada.
+    """
+    __slots__ = ("_span", "_nome", "_atributos")
+
+    def __init__(self, nome: str, **atributos):
+        self._nome = nome
+        self._atributos = atributos
+        self._span = None
+
+    def __enter__(self):
+        if _ativo:
+            pilha = _pilha()
+            self._span = Span(self._nome, pilha[-1].id if pilha else None, self._atributos)
+            pilha.append(self._span)
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        s = self._span
+        if s is None:
+            return False
+        pilha = _pilha()
+        if pilha and pilha[-1] is s:
+            pilha.pop()
+        registro = {
+            "nome": s.nome, "id": s.id, "pai": s.pai, "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+            "inicio": s.inicio, "duracao": time.perf_counter() - s._t0,
+            "status": "erro" if tipo else "ok",
+        }
+        if tipo:
+            registro["erro"] = f"{tipo.__name__}: {valor}"[:200]
+        registro.update(s.atributos)
+        registro.update({k: round(v, 6) if isinstance(v, float) else v for k, v in s.metricas.items()})
+        _gravar(registro)
+        return False
+
+def rastreado(nome: str = None, alvo: str = None):
+    """
+    Decorador: cada chamada da função vira um span. 'alvo' é o nome de um
+    parâmetro cujo valor vai para o span (ex: 'image_name'); não use em
+    parâmetros com dados sensíveis (o texto do type_text, por exemplo).
+    """
+    def decorador(func):
+        nome_span = nome or func.__name__
+        assinatura = inspect.signature(func) if alvo else None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _ativo:
+                return func(*args, **kwargs)
+            atributos = {}
+            if assinatura is not None:
+                valor = assinatura.bind_partial(*args, **kwargs).arguments.get(alvo)
+                atributos["alvo"] = str(valor)[:80]
+            with span(nome_span, **atributos):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorador
+
+# --- 2. Métricas (chamadas pelos módulos de captura, matching, polling...) ---
+def somar(campo: str, valor=1):
+    """Soma 'valor' na métrica 'campo' de todos os spans abertos nesta thread."""
+    if not _ativo:
+        return
+    for s in _pilha():
+        s.metricas[campo] = s.metricas.get(campo, 0) + valor
+
+def maximo(campo: str, valor: float):
+    """Guarda o maior 'valor' visto na métrica 'campo' (ex: melhor_score)."""
+    if not _ativo:
+        return
+    for s in _pilha():
+        if valor > s.metricas.get(campo, float("-inf")):
+            s.metricas[campo] = valor
+
+class medir:
+    """Soma em 'campo' o tempo (seg.) gasto dentro do bloco: with medir('match_sec'): ..."""
+    __slots__ = ("_campo", "_t0")
+
+    def __init__(self, campo: str):
+        self._campo = campo
+        self._t0 = None
+
+    def __enter__(self):
+        if _ativo:
+            self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self._t0 is not None:
+            somar(self._campo, time.perf_counter() - self._t0)
+        return False
+
+# --- 3. Gravação (JSONL) e Exportação (Chrome Trace) ---
+def ativar(caminho: str = TRACE_FILE):
+    """Liga o tracing em tempo de execução (além do TRACE_ENABLED do config)."""
+    global _ativo, _arquivo
+    with _lock:
+        if _arquivo is not None and _arquivo.name != caminho:
+            _arquivo.close()
+            _arquivo = None
+        if _arquivo is None:
+            os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+            _arquivo = open(caminho, "a", encoding="utf-8")
+        _ativo = True
+
+def desativar():
+    """Desliga o tracing e fecha o arquivo (os spans já gravados ficam no JSONL)."""
+    global _ativo, _arquivo
+    with _lock:
+        _ativo = False
+        if _arquivo is not None:
+            _arquivo.close()
+            _arquivo = None
+
+def _gravar(registro: dict):
+    global _arquivo
+    linha = json.dumps(registro, ensure_ascii=False, default=str) + "\n"
+    with _lock:
+        if _arquivo is None:
+            os.makedirs(os.path.dirname(os.path.abspath(TRACE_FILE)), exist_ok=True)
+            _arquivo = open(TRACE_FILE, "a", encoding="utf-8")
+        _arquivo.write(linha)
+
+def exportar_chrome(origens: list = None, destino: str = None) -> str:
+    """
+    Converte um ou mais traces JSONL (ex: um por worker) para o formato Chrome
+    Trace (abra em chrome://tracing ou https://ui.perfetto.dev). Cada processo
+    vira uma linha do tempo; as métricas do span aparecem em 'args'.
+    Retorna o caminho do arquivo gerado.
+    """
+    origens = origens or [TRACE_FILE]
+    destino = destino or os.path.splitext(origens[0])[0] + ".chrome.json"
+    with _lock:
+        if _arquivo is not None:
+            _arquivo.flush()
+
+    eventos = []
+    threads = {}
+    campos_fixos = {"nome", "id", "pai", "pid", "thread", "inicio", "duracao"}
+    for origem in origens:
+        with open(origem, "r", encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    r = json.loads(linha)
+                except json.JSONDecodeError:
+                    continue
+                tid = threads.setdefault((r["pid"], r["thread"]), len(threads) + 1)
+                eventos.append({
+                    "name": r["nome"], "cat": "rpa", "ph": "X",
+                    "ts": r["inicio"] * 1e6, "dur": r["duracao"] * 1e6,
+                    "pid": r["pid"], "tid": tid,
+                    "args": {k: v for k, v in r.items() if k not in campos_fixos},
+                })
+    # Nomes legíveis para as threads na linha do tempo
+    for (pid, nome_thread), tid in threads.items():
+        eventos.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": nome_thread}})
+
+    with open(destino, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": eventos, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    return destino
+
+def _finalizar():
+    global _arquivo
+    with _lock:
+        if _arquivo is None:
+            return
+        caminho = _arquivo.name
+        _arquivo.close()
+        _arquivo = None
+    if TRACE_CHROME_EXPORT and os.path.exists(caminho):
+        try:
+            destino = exportar_chrome([caminho])
+            logging.info(f"Trace exportado para o formato Chrome: '{destino}'.")
+        except Exception as e:
+            logging.warning(f"Falha ao exportar o trace para o formato Chrome: {e}")
+
+atexit.register(_finalizar)
+
+def main():
+    parser = argparse.ArgumentParser(description="Converte traces JSONL da automação para o formato Chrome Trace.")
+    parser.add_argument("origens", nargs="*", default=[TRACE_FILE], help="Arquivos .jsonl (padrão: TRACE_FILE).")
+    parser.add_argument("-o", "--destino", help="Arquivo .json de saída.")
+    args = parser.parse_args()
+    print(exportar_chrome(args.origens, args.destino))
+
+if __name__ == "__main__":
+    main()
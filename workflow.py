@@ -0,0 +1,322 @@
+import os
+import json
+import time
+import logging
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from config import DEFAULT_GRAYSCALE, DEFAULT_MATCH_MODE, WORKFLOW_OVERLAP_WAITS
+from automation_helpers import (
+    safe_click, type_text, press_key, esperar_imagem, esperar_imagem_desaparecer,
+    esperar_qualquer_imagem, find_all_and_click, validar_coordenadas, precarregar_templates
+)
+from pacing import pacing_ativo, adiar_pausa
+from tracing import span
+
+# Fluxo declarativo: a sequência de passos da lógica de negócio descrita como
+# dados (JSON/YAML ou o construtor em Python), executada com os helpers de
+# sempre. Como o fluxo inteiro é conhecido antes de começar, ele:
+# - valida os passos e pré-carrega templates e coordenadas no preparar();
+# - começa a espera do passo seguinte enquanto a ação atual ainda estabiliza
+#   (só com PACING_MODE='estabilidade'; ver WORKFLOW_OVERLAP_WAITS);
+# - cronometra cada passo (resumo() / log_resumo(), e um span por passo).
+#
+# Ex. (JSON; em YAML é a mesma estrutura):
+#   {"nome": "cadastro", "passos": [
+#       {"acao": "tecla", "teclas": "f7"},
+#       {"acao": "digitar", "texto": "{numero}"},
+#       {"acao": "esperar", "imagem": "tela_ok.png", "timeout": 10},
+#       {"acao": "clicar", "alvo": "botao_salvar"}
+#   ]}
+# Textos com {campo} são preenchidos com as colunas da linha da planilha.
+
+class FluxoError(Exception):
+    """Falha num passo do fluxo (a mensagem diz qual; a causa original fica em __cause__)."""
+
+# acao -> (parâmetros obrigatórios, parâmetros opcionais)
+_PARAMS_IMAGEM = {"timeout", "region", "confianca", "grayscale", "modo_busca"}
+_ACOES = {
+    "clicar":           ({"alvo"}, {"region_estabilidade"}),
+    "clicar_imagem":    ({"imagem"}, _PARAMS_IMAGEM | {"deslocamento", "region_estabilidade"}),
+    "clicar_todas":     ({"imagem"}, {"region", "confianca", "grayscale", "ordem", "max_cliques", "region_estabilidade"}),
+    "digitar":          ({"texto"}, {"modo", "verificar", "intervalo", "region_estabilidade"}),
+    "tecla":            ({"teclas"}, {"vezes", "region_estabilidade"}),
+    "esperar":          ({"imagem"}, _PARAMS_IMAGEM),
+    "esperar_sumir":    ({"imagem"}, _PARAMS_IMAGEM | {"estabilidade"}),
+    "esperar_qualquer": ({"imagens"}, {"timeout", "confianca", "grayscale", "modo_busca"}),
+    "pausa":            ({"segundos"}, set()),
+}
+_COMUNS = {"acao", "nome", "opcional"}
+_ESPERAS = {"esperar", "esperar_sumir", "esperar_qualquer"}
+
+class Fluxo:
+    """
+    Sequência de passos executada para cada linha da planilha.
+
+    Monte com o construtor (cada método acrescenta um passo e retorna o
+    próprio fluxo) ou carregue de um arquivo com Fluxo.carregar():
+        fluxo = Fluxo("cadastro").tecla("f7").digitar("{numero}").tecla("tab")
+        fluxo.executar(linha)
+
+    Todo passo aceita 'nome' (para o log e o resumo) e 'opcional=True' (uma
+    falha é logada e o fluxo segue). Uma falha num passo obrigatório vira
+    FluxoError.
+    """
+    def __init__(self, nome: str = "fluxo", passos: list = None, antecipar_esperas: bool = WORKFLOW_OVERLAP_WAITS):
+        self.nome = nome
+        self.passos = []
+        self.antecipar_esperas = antecipar_esperas
+        self._preparado = False
+        self._tempos = {}  # nome do passo -> array('d') com as durações
+        self._executor = None
+        for passo in passos or []:
+            self.adicionar(**passo)
+
+    # --- Construção ---
+    @classmethod
+    def carregar(cls, caminho: str) -> "Fluxo":
+        """Lê um fluxo de um arquivo .json ou .yaml/.yml ({'nome': ..., 'passos': [...]})."""
+        with open(caminho, 'r', encoding='utf-8') as f:
+            if caminho.lower().endswith(('.yaml', '.yml')):
+                try:
+                    import yaml
+                except ImportError:
+                    raise ImportError("Fluxos em YAML precisam do PyYAML ('pip install pyyaml'); ou use JSON.")
+                dados = yaml.safe_load(f)
+            else:
+                dados = json.load(f)
+        if isinstance(dados, list):
+            dados = {"passos": dados}
+        nome = dados.get("nome") or os.path.splitext(os.path.basename(caminho))[0]
+        return cls(nome, dados.get("passos", []))
+
+    def adicionar(self, acao: str, **params) -> "Fluxo":
+        """Acrescenta um passo, validando a ação e os parâmetros."""
+        if acao not in _ACOES:
+            raise ValueError(f"Fluxo '{self.nome}': ação desconhecida '{acao}' (opções: {list(_ACOES)}).")
+        obrigatorios, opcionais = _ACOES[acao]
+        faltando = obrigatorios - set(params)
+        sobrando = set(params) - obrigatorios - opcionais - _COMUNS
+        if faltando or sobrando:
+            raise ValueError(f"Fluxo '{self.nome}', passo {len(self.passos) + 1} ('{acao}'): "
+                             f"faltando {sorted(faltando)}, desconhecidos {sorted(sobrando)}.")
+        params.setdefault("nome", f"{len(self.passos) + 1:02d}_{acao}")
+        # JSON/YAML não têm tupla: regiões e deslocamentos chegam como listas
+        for chave in ("region", "region_estabilidade", "deslocamento"):
+            if isinstance(params.get(chave), list):
+                params[chave] = tuple(params[chave])
+        if "imagens" in params:
+            params["imagens"] = [
+                {**item, "region": tuple(item["region"])} if isinstance(item, dict) and isinstance(item.get("region"), list) else item
+                for item in params["imagens"]
+            ]
+        self.passos.append({"acao": acao, **params})
+        self._preparado = False
+        return self
+
+    def clicar(self, alvo, **params) -> "Fluxo":
+        """Clica numa coordenada do mapa (nome) ou em (x, y)."""
+        return self.adicionar("clicar", alvo=alvo, **params)
+
+    def clicar_imagem(self, imagem: str, **params) -> "Fluxo":
+        """Espera a imagem e clica no centro dela (+ 'deslocamento' (x, y), se houver)."""
+        return self.adicionar("clicar_imagem", imagem=imagem, **params)
+
+    def clicar_todas(self, imagem: str, **params) -> "Fluxo":
+        """Clica em todas as ocorrências da imagem (uma captura; 'ordem' = 'linhas', 'colunas' ou 'score')."""
+        return self.adicionar("clicar_todas", imagem=imagem, **params)
+
+    def digitar(self, texto: str, **params) -> "Fluxo":
+        return self.adicionar("digitar", texto=texto, **params)
+
+    def tecla(self, teclas, **params) -> "Fluxo":
+        return self.adicionar("tecla", teclas=teclas, **params)
+
+    def esperar(self, imagem: str, **params) -> "Fluxo":
+        return self.adicionar("esperar", imagem=imagem, **params)
+
+    def esperar_sumir(self, imagem: str, **params) -> "Fluxo":
+        return self.adicionar("esperar_sumir", imagem=imagem, **params)
+
+    def esperar_qualquer(self, imagens: list, **params) -> "Fluxo":
+        return self.adicionar("esperar_qualquer", imagens=imagens, **params)
+
+    def pausa(self, segundos: float, **params) -> "Fluxo":
+        return self.adicionar("pausa", segundos=segundos, **params)
+
+    # --- Preparação (uma vez, antes da primeira linha) ---
+    def preparar(self):
+        """
+        Pré-carrega os templates de todos os passos (no modo de cada um) e
+        valida as coordenadas nomeadas. Erros aparecem aqui, todos juntos,
+        e não no meio da planilha. Passos com {campo} ficam de fora.
+        """
+        if self._preparado:
+            return
+        templates = {}  # (grayscale, modo_busca) -> nomes
+        coordenadas = []
+        for passo in self.passos:
+            chave = (passo.get("grayscale", DEFAULT_GRAYSCALE), passo.get("modo_busca", DEFAULT_MATCH_MODE))
+            imagens = [passo["imagem"]] if "imagem" in passo else [
+                item if isinstance(item, str) else item["imagem"] for item in passo.get("imagens", [])
+            ]
+            templates.setdefault(chave, []).extend(nome for nome in imagens if not _tem_campos(nome))
+            if passo["acao"] == "clicar" and isinstance(passo["alvo"], str) and not _tem_campos(passo["alvo"]):
+                coordenadas.append(passo["alvo"])
+
+        inicio = time.perf_counter()
+        for (grayscale, modo_busca), nomes in templates.items():
+            precarregar_templates(sorted(set(nomes)), grayscale=grayscale, modo_busca=modo_busca)
+        if coordenadas:
+            validar_coordenadas(sorted(set(coordenadas)))
+        self._preparado = True
+        logging.info(f"Fluxo '{self.nome}' preparado: {len(self.passos)} passos, "
+                     f"{sum(len(set(n)) for n in templates.values())} templates e {len(set(coordenadas))} coordenadas "
+                     f"em {time.perf_counter() - inicio:.2f}s.")
+
+    # --- Execução ---
+    def executar(self, linha=None):
+        """
+        Executa os passos para uma linha (namedtuple, dict ou None). Com
+        antecipação ligada, a espera que vem logo depois de uma ação roda numa
+        thread enquanto a ação estabiliza; o passo seguinte só começa quando
+        as duas terminam.
+        """
+        self.preparar()
+        valores = _valores_linha(linha)
+        antecipar = self.antecipar_esperas and pacing_ativo()
+        antecipado = None  # Future da espera do próximo passo, já em andamento
+
+        for i, passo in enumerate(self.passos):
+            params = _preencher(passo, valores)
+            try:
+                if antecipado is not None:
+                    futuro, antecipado = antecipado, None
+                    futuro.result()
+                    continue
+                proximo = self.passos[i + 1] if i + 1 < len(self.passos) else None
+                if antecipar and passo["acao"] not in _ESPERAS and proximo and proximo["acao"] in _ESPERAS:
+                    antecipado = self._executar_antecipando(params, _preencher(proximo, valores))
+                else:
+                    self._cronometrar(params)
+            except Exception as e:
+                if passo.get("opcional"):
+                    logging.warning(f"Fluxo '{self.nome}': passo opcional '{passo['nome']}' falhou ({e}). Seguindo.")
+                    continue
+                raise FluxoError(f"Fluxo '{self.nome}': falha no passo '{passo['nome']}' ({passo['acao']}): {e}") from e
+
+    def _executar_antecipando(self, params: dict, proximo: dict):
+        """Executa a ação sem a espera por estabilidade, dispara a espera do próximo passo e só então estabiliza."""
+        inicio = time.perf_counter()
+        with span(f"passo:{params['nome']}", fluxo=self.nome):
+            with adiar_pausa() as pausa:
+                self._executar_passo(params)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="FluxoEspera")
+            futuro = self._executor.submit(self._cronometrar, proximo)
+            pausa.aguardar()
+        self._registrar_tempo(params["nome"], time.perf_counter() - inicio)
+        return futuro
+
+    def _cronometrar(self, params: dict):
+        inicio = time.perf_counter()
+        with span(f"passo:{params['nome']}", fluxo=self.nome):
+            resultado = self._executar_passo(params)
+        self._registrar_tempo(params["nome"], time.perf_counter() - inicio)
+        return resultado
+
+    def _executar_passo(self, p: dict):
+        acao = p["acao"]
+        logging.debug(f"Fluxo '{self.nome}': passo '{p['nome']}'")
+        opcoes_imagem = {k: p[k] for k in _PARAMS_IMAGEM if k in p}
+        if acao == "clicar":
+            alvo = p["alvo"] if isinstance(p["alvo"], str) else tuple(p["alvo"])
+            return safe_click(alvo, region_estabilidade=p.get("region_estabilidade"))
+        if acao == "clicar_imagem":
+            ponto = esperar_imagem(p["imagem"], **opcoes_imagem)
+            dx, dy = p.get("deslocamento", (0, 0))
+            return safe_click((ponto.x + dx, ponto.y + dy), log_message=f"{self.nome}: {p['imagem']}",
+                              region_estabilidade=p.get("region_estabilidade"))
+        if acao == "clicar_todas":
+            opcoes = {k: p[k] for k in ("region", "grayscale", "ordem", "max_cliques", "region_estabilidade") if k in p}
+            if "confianca" in p:
+                opcoes["confidence"] = p["confianca"]
+            return find_all_and_click(p["imagem"], **opcoes)
+        if acao == "digitar":
+            opcoes = {"interval": p["intervalo"]} if "intervalo" in p else {}
+            opcoes.update({k: p[k] for k in ("modo", "verificar") if k in p})
+            return type_text(str(p["texto"]), region_estabilidade=p.get("region_estabilidade"), **opcoes)
+        if acao == "tecla":
+            return press_key(p["teclas"], presses=p.get("vezes", 1), region_estabilidade=p.get("region_estabilidade"))
+        if acao == "esperar":
+            return esperar_imagem(p["imagem"], **opcoes_imagem)
+        if acao == "esperar_sumir":
+            if "estabilidade" in p:
+                opcoes_imagem["stability_check_sec"] = p["estabilidade"]
+            return esperar_imagem_desaparecer(p["imagem"], **opcoes_imagem)
+        if acao == "esperar_qualquer":
+            opcoes = {k: p[k] for k in ("timeout", "confianca", "grayscale", "modo_busca") if k in p}
+            return esperar_qualquer_imagem(p["imagens"], **opcoes)
+        if acao == "pausa":
+            time.sleep(p["segundos"])
+
+    # --- Tempos por Passo ---
+    def _registrar_tempo(self, nome: str, duracao: float):
+        self._tempos.setdefault(nome, array('d')).append(duracao)
+
+    def resumo(self) -> dict:
+        """Tempos por passo: {nome: {'n', 'p50_sec', 'p90_sec', 'max_sec', 'total_sec'}}, na ordem do fluxo."""
+        resumo = {}
+        for passo in self.passos:
+            tempos = self._tempos.get(passo["nome"])
+            if not tempos:
+                continue
+            valores = np.frombuffer(tempos, dtype=np.float64)
+            p50, p90 = np.percentile(valores, [50, 90])
+            resumo[passo["nome"]] = {
+                "n": len(valores), "p50_sec": float(p50), "p90_sec": float(p90),
+                "max_sec": float(valores.max()), "total_sec": float(valores.sum()),
+            }
+        return resumo
+
+    def log_resumo(self):
+        """Loga a tabela de tempos por passo (os mais custosos primeiro)."""
+        resumo = self.resumo()
+        if not resumo:
+            return
+        total = sum(r["total_sec"] for r in resumo.values()) or 1.0
+        logging.info(f"--- Tempos por passo do fluxo '{self.nome}' ---")
+        for nome, r in sorted(resumo.items(), key=lambda item: -item[1]["total_sec"]):
+            logging.info(f"  {nome:<28} n={r['n']:<5} p50={r['p50_sec']:.3f}s p90={r['p90_sec']:.3f}s "
+                         f"max={r['max_sec']:.3f}s ({r['total_sec'] / total:.0%} do tempo)")
+
+def _tem_campos(valor) -> bool:
+    return isinstance(valor, str) and "{" in valor
+
+def _valores_linha(linha) -> dict:
+    if linha is None:
+        return {}
+    if isinstance(linha, dict):
+        return linha
+    return linha._asdict()  # namedtuple do RowSource
+
+def _preencher(passo: dict, valores: dict) -> dict:
+    """Substitui {campo} nos textos do passo pelos valores da linha."""
+    if not valores:
+        return passo
+    return {chave: _preencher_valor(valor, valores) if chave not in ("acao", "nome") else valor
+            for chave, valor in passo.items()}
+
+def _preencher_valor(valor, valores: dict):
+    if isinstance(valor, str) and "{" in valor:
+        try:
+            return valor.format_map(valores)
+        except KeyError as e:
+            raise FluxoError(f"Campo {e} usado no fluxo não existe na linha (colunas: {list(valores)}).") from None
+    if isinstance(valor, list):
+        return [_preencher_valor(v, valores) for v in valor]
+    if isinstance(valor, dict):
+        return {k: _preencher_valor(v, valores) for k, v in valor.items()}
+    return valor